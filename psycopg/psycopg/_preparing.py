@@ -5,14 +5,19 @@ Support for prepared statements
 # Copyright (C) 2020-2021 The Psycopg Team
 
 from enum import IntEnum, auto
-from typing import Optional, Sequence, Tuple, TYPE_CHECKING, Union
+from typing import Callable, Optional, Sequence, Tuple, TYPE_CHECKING, Union
 from collections import OrderedDict
 
 from .pq import ExecStatus
+from .abc import PQGen
 from ._queries import PostgresQuery
+from .generators import execute
 
 if TYPE_CHECKING:
-    from .pq.abc import PGresult
+    from .pq.abc import PGconn, PGresult
+
+# The identity of a prepared statement: query and parameters types
+Key = Tuple[bytes, Tuple[int, ...]]
 
 
 class Prepare(IntEnum):
@@ -35,13 +40,15 @@ class PrepareManager:
         # Note: with this implementation we keep the tally of up to 100
         # queries, but most likely we will prepare way less than that. We might
         # change that if we think it would be better.
-        self._prepared: OrderedDict[
-            Tuple[bytes, Tuple[int, ...]], Union[int, bytes]
-        ] = OrderedDict()
+        self._prepared: OrderedDict[Key, Union[int, bytes]] = OrderedDict()
 
         # Counter to generate prepared statements names
         self._prepared_idx = 0
 
+        # Function called every time a prepared statement is used, for
+        # instance to keep statistics across connections.
+        self.on_prepared: Optional[Callable[[Key], None]] = None
+
     def get(
         self, query: PostgresQuery, prepare: Optional[bool] = None
     ) -> Tuple[Prepare, bytes]:
@@ -56,17 +63,52 @@ class PrepareManager:
         value: Union[bytes, int] = self._prepared.get(key, 0)
         if isinstance(value, bytes):
             # The query was already prepared in this session
+            if self.on_prepared:
+                self.on_prepared(key)
             return Prepare.YES, value
 
         if value >= self.prepare_threshold or prepare:
             # The query has been executed enough times and needs to be prepared
-            name = f"_pg3_{self._prepared_idx}".encode()
-            self._prepared_idx += 1
-            return Prepare.SHOULD, name
+            if self.on_prepared:
+                self.on_prepared(key)
+            return Prepare.SHOULD, self._next_name()
         else:
             # The query is not to be prepared yet
             return Prepare.NO, b""
 
+    def _next_name(self) -> bytes:
+        name = f"_pg3_{self._prepared_idx}".encode()
+        self._prepared_idx += 1
+        return name
+
+    def prepare_gen(
+        self, pgconn: "PGconn", keys: Sequence[Key]
+    ) -> PQGen[None]:
+        """
+        Generator to prepare the statements *keys* on the connection.
+
+        The statements failing to prepare (for instance because they refer to
+        objects not available on this connection) are ignored.
+        """
+        if self.prepare_threshold is None:
+            return
+
+        for key in keys[: self.prepared_max]:
+            if isinstance(self._prepared.get(key), bytes):
+                continue
+
+            name = self._next_name()
+            pgconn.send_prepare(name, key[0], param_types=key[1])
+            (result,) = yield from execute(pgconn)
+            if result.status == ExecStatus.COMMAND_OK:
+                self._prepared[key] = name
+
+    def clear(self) -> None:
+        """
+        Forget the prepared statements, for instance after they were deallocated.
+        """
+        self._prepared.clear()
+
     def maintain(
         self,
         query: PostgresQuery,
@@ -189,6 +189,38 @@ WHERE t.oid = %(name)s::regtype
         registry._by_range_subtype[self.subtype_oid] = self
 
 
+class MultirangeInfo(TypeInfo):
+    """Manage information about a multirange type."""
+
+    __module__ = "psycopg.types.multirange"
+
+    def __init__(
+        self,
+        name: str,
+        oid: int,
+        array_oid: int,
+        range_oid: int,
+        subtype_oid: int,
+    ):
+        super().__init__(name, oid, array_oid)
+        self.range_oid = range_oid
+        self.subtype_oid = subtype_oid
+
+    # Note: multiranges are only available from PostgreSQL 14
+    _info_query = """\
+SELECT t.typname AS name, t.oid AS oid, t.typarray AS array_oid,
+    r.rngtypid AS range_oid, r.rngsubtype AS subtype_oid
+FROM pg_type t
+JOIN pg_range r ON t.oid = r.rngmultitypid
+WHERE t.oid = %(name)s::regtype
+"""
+
+    def _added(self, registry: "TypesRegistry") -> None:
+        """Method called by the *registry* when the object is added there."""
+        # Map multiranges subtypes to info
+        registry._by_multirange_subtype[self.subtype_oid] = self
+
+
 class CompositeInfo(TypeInfo):
     """Manage information about a composite type."""
 
@@ -245,6 +277,7 @@ class TypesRegistry:
         self._by_oid: Dict[int, TypeInfo]
         self._by_name: Dict[str, TypeInfo]
         self._by_range_subtype: Dict[int, TypeInfo]
+        self._by_multirange_subtype: Dict[int, TypeInfo]
 
         # Make a shallow copy: it will become a proper copy if the registry
         # is edited.
@@ -252,6 +285,7 @@ class TypesRegistry:
             self._by_oid = template._by_oid
             self._by_name = template._by_name
             self._by_range_subtype = template._by_range_subtype
+            self._by_multirange_subtype = template._by_multirange_subtype
             self._own_state = False
             template._own_state = False
         else:
@@ -261,6 +295,7 @@ class TypesRegistry:
         self._by_oid = {}
         self._by_name = {}
         self._by_range_subtype = {}
+        self._by_multirange_subtype = {}
         self._own_state = True
 
     def add(self, info: TypeInfo) -> None:
@@ -349,10 +384,23 @@ class TypesRegistry:
             return None
         return self._by_range_subtype.get(info.oid)
 
+    def get_multirange(self, key: Union[str, int]) -> Optional[TypeInfo]:
+        """
+        Return info about a multirange by its element name or oid
+
+        Return None if the element or its multirange are not found.
+        """
+        try:
+            info = self[key]
+        except KeyError:
+            return None
+        return self._by_multirange_subtype.get(info.oid)
+
     def _ensure_own_state(self) -> None:
         # Time to write! so, copy.
         if not self._own_state:
             self._by_oid = self._by_oid.copy()
             self._by_name = self._by_name.copy()
             self._by_range_subtype = self._by_range_subtype.copy()
+            self._by_multirange_subtype = self._by_multirange_subtype.copy()
             self._own_state = True
@@ -4,12 +4,13 @@ psycopg connection objects
 
 # Copyright (C) 2020-2021 The Psycopg Team
 
+import re
 import logging
 import warnings
 import threading
 from types import TracebackType
 from typing import Any, Callable, cast, Dict, Generic, Iterator, List
-from typing import NamedTuple, Optional, Type, TypeVar, Union
+from typing import NamedTuple, Optional, Sequence, Type, TypeVar, Union
 from typing import overload, TYPE_CHECKING
 from weakref import ref, ReferenceType
 from functools import partial
@@ -76,6 +77,35 @@ Notify.__module__ = "psycopg"
 NoticeHandler = Callable[[e.Diagnostic], None]
 NotifyHandler = Callable[[Notify], None]
 
+# Tags of the commands which don't leave a trace in the session after the end
+# of the transaction they run into. Any other command is assumed to change it.
+SAFE_TAGS = frozenset(
+    [
+        b"",
+        b"SELECT",
+        b"INSERT",
+        b"UPDATE",
+        b"DELETE",
+        b"MERGE",
+        b"COPY",
+        b"FETCH",
+        b"MOVE",
+        b"SHOW",
+        b"EXPLAIN",
+        b"BEGIN",
+        b"START TRANSACTION",
+        b"COMMIT",
+        b"ROLLBACK",
+        b"SAVEPOINT",
+        b"RELEASE",
+    ]
+)
+
+# Functions changing the session, which can be called in a SELECT.
+SESSION_FUNCS = re.compile(
+    rb"\b(?:set_config|pg_(?:try_)?advisory_lock(?:_shared)?)\s*\(", re.I
+)
+
 
 class BaseConnection(Generic[Row]):
     """
@@ -127,11 +157,39 @@ class BaseConnection(Generic[Row]):
         # Time after which the connection should be closed
         self._expire_at: float
 
+        # Time the connection was last known to work, set by the pool
+        self._checked_at: float
+
+        # Process in which the connection was created by the pool
+        self._pool_pid: int
+
+        # If not None, set to True when a command possibly changing the state
+        # of the session is executed (see SAFE_TAGS). Used by the pool to
+        # skip resetting a connection if it's not needed.
+        self._session_changed: Optional[bool] = None
+
         self._isolation_level: Optional[IsolationLevel] = None
         self._read_only: Optional[bool] = None
         self._deferrable: Optional[bool] = None
         self._begin_statement = b""
 
+    def _track_session(
+        self, query: bytes, results: Sequence["PGresult"]
+    ) -> None:
+        """Take note if the *query* might have changed the session."""
+        for res in results:
+            tag = (res.command_status or b"").rstrip(b" 0123456789")
+            if tag not in SAFE_TAGS:
+                self._session_changed = True
+                return
+            # CREATE TABLE AS and SELECT INTO don't return rows
+            if tag == b"SELECT" and res.status != ExecStatus.TUPLES_OK:
+                self._session_changed = True
+                return
+
+        if SESSION_FUNCS.search(query):
+            self._session_changed = True
+
     def __del__(self) -> None:
         # If fails on connection we might not have this attribute yet
         if not hasattr(self, "pgconn"):
@@ -741,6 +799,7 @@ class Connection(BaseConnection[Row]):
         self,
         savepoint_name: Optional[str] = None,
         force_rollback: bool = False,
+        snapshot: Optional[str] = None,
     ) -> Iterator[Transaction]:
         """
         Start a context block with a new transaction or nested transaction.
@@ -749,9 +808,12 @@ class Connection(BaseConnection[Row]):
             transaction. If `!None`, one will be chosen automatically.
         :param force_rollback: Roll back the transaction at the end of the
             block even if there were no error (e.g. to try a no-op process).
+        :param snapshot: The identifier of a snapshot, obtained by
+            `Transaction.export_snapshot()` on another connection, to import
+            in the transaction. Only valid for the outer transaction.
         :rtype: Transaction
         """
-        with Transaction(self, savepoint_name, force_rollback) as tx:
+        with Transaction(self, savepoint_name, force_rollback, snapshot) as tx:
             yield tx
 
     def notifies(self) -> Iterator[Notify]:
@@ -248,13 +248,14 @@ class AsyncConnection(BaseConnection[Row]):
         self,
         savepoint_name: Optional[str] = None,
         force_rollback: bool = False,
+        snapshot: Optional[str] = None,
     ) -> AsyncIterator[AsyncTransaction]:
         """
         Start a context block with a new transaction or nested transaction.
 
         :rtype: AsyncTransaction
         """
-        tx = AsyncTransaction(self, savepoint_name, force_rollback)
+        tx = AsyncTransaction(self, savepoint_name, force_rollback, snapshot)
         async with tx:
             yield tx
 
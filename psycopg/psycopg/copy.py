@@ -5,14 +5,16 @@ psycopg copy support
 # Copyright (C) 2020-2021 The Psycopg Team
 
 import re
-import queue
 import struct
 import asyncio
 import threading
 from abc import ABC, abstractmethod
+from time import monotonic
 from types import TracebackType
 from typing import TYPE_CHECKING, AsyncIterator, Iterator, Generic, Union
-from typing import Any, Dict, List, Match, Optional, Sequence, Type, Tuple
+from typing import Any, Deque, Dict, List, Match, Optional, Sequence, Type
+from typing import Tuple
+from collections import Counter, deque
 
 from . import pq
 from . import errors as e
@@ -21,9 +23,10 @@ from .abc import ConnectionType, PQGen, Transformer
 from .adapt import PyFormat
 from ._compat import create_task
 from ._cmodule import _psycopg
-from .generators import copy_from, copy_to, copy_end
+from .generators import copy_from, copy_from_many, copy_to, copy_end
 
 if TYPE_CHECKING:
+    from typing import Counter as TCounter
     from .pq.abc import PGresult
     from .cursor import BaseCursor, Cursor
     from .cursor_async import AsyncCursor
@@ -49,9 +52,24 @@ class BaseCopy(Generic[ConnectionType]):
     formatting the data in copy format and adding it to the queue.
     """
 
-    # Max size of the write queue of buffers. More than that copy will block
-    # Each buffer around Formatter.BUFFER_SIZE size
-    QUEUE_SIZE = 1024
+    # Max size, in bytes, of the data in the write queue. More than that copy
+    # will block, waiting for the worker to send the data to the server.
+    QUEUE_SIZE = 32 * 1024 * 1024
+
+    # Max size of the data sent to the server in a single operation. The
+    # worker merges the buffers found in the queue up to this size.
+    SEND_SIZE = 1024 * 1024
+
+    # Default max number of rows returned by read_rows_batch()
+    ROWS_BATCH_SIZE = 1024
+
+    # Stats keys
+    _WRITE_BYTES = "write_bytes"
+    _WRITE_WAIT_MS = "write_wait_ms"
+    _SEND_NUM = "send_num"
+    _SEND_BYTES = "send_bytes"
+    _SEND_MS = "send_ms"
+    _SEND_WAIT_MS = "send_wait_ms"
 
     formatter: "Formatter"
 
@@ -73,6 +91,12 @@ class BaseCopy(Generic[ConnectionType]):
 
         self._finished = False
 
+        # Buffers to send to the server. None marks the end of the data.
+        self._queue: Deque[Optional[bytes]] = deque()
+        self._queue_bytes = 0
+        self._worker_error: Optional[BaseException] = None
+        self._stats: "TCounter[str]" = Counter()
+
     def __repr__(self) -> str:
         cls = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
         info = pq.misc.connection_summary(self._pgconn)
@@ -106,6 +130,56 @@ class BaseCopy(Generic[ConnectionType]):
                 oids, self.formatter.format
             )
 
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Return the statistics about the data written by the copy operation.
+
+        The statistics allow to understand if the bottleneck of a :sql:`COPY
+        FROM` operation is the production of the data or the network.
+        """
+        return dict(self._stats)
+
+    # Write queue management. The caller must hold the queue lock.
+
+    def _queue_put(self, data: Optional[bytes]) -> None:
+        self._queue.append(data)
+        if data:
+            self._queue_bytes += len(data)
+            self._stats[self._WRITE_BYTES] += len(data)
+
+    def _queue_get(self) -> Tuple[bytes, bool]:
+        """
+        Take the buffers from the queue, up to SEND_SIZE bytes.
+
+        Return the data, merged, and True if the end of data was found.
+        """
+        q = self._queue
+        chunks: List[bytes] = []
+        size = 0
+        end = False
+        while q:
+            data = q[0]
+            if data is None:
+                q.popleft()
+                end = True
+                break
+            if chunks and size + len(data) > self.SEND_SIZE:
+                break
+            q.popleft()
+            chunks.append(data)
+            size += len(data)
+
+        self._queue_bytes -= size
+        if len(chunks) == 1:
+            return chunks[0], end
+        else:
+            return b"".join(chunks), end
+
+    def _record_send(self, size: int, t0: float, t1: float) -> None:
+        self._stats[self._SEND_NUM] += 1
+        self._stats[self._SEND_BYTES] += size
+        self._stats[self._SEND_MS] += int(1000.0 * (t1 - t0))
+
     # High level copy protocol generators (state change of the Copy object)
 
     def _read_gen(self) -> PQGen[memoryview]:
@@ -136,6 +210,28 @@ class BaseCopy(Generic[ConnectionType]):
 
         return row
 
+    def _read_rows_gen(self, max_rows: int) -> PQGen[List[Tuple[Any, ...]]]:
+        if self._finished:
+            return []
+
+        if max_rows < 1:
+            raise ValueError("max_rows must be at least 1")
+
+        data, res = yield from copy_from_many(self._pgconn, max_rows)
+        if res:
+            self._finished = True
+            nrows = res.command_tuples
+            self.cursor._rowcount = nrows if nrows is not None else -1
+
+        rows = self.formatter.parse_rows(data)
+        if len(rows) < len(data):
+            # Found the end of data marker: get the final result to finish
+            # the copy operation
+            yield from self._read_gen()
+            self._finished = True
+
+        return rows
+
     def _end_copy_gen(self, exc: Optional[BaseException]) -> PQGen[None]:
         bmsg: Optional[bytes]
         if exc:
@@ -158,9 +254,7 @@ class Copy(BaseCopy["Connection[Any]"]):
 
     def __init__(self, cursor: "Cursor[Any]"):
         super().__init__(cursor)
-        self._queue: queue.Queue[Optional[bytes]] = queue.Queue(
-            maxsize=self.QUEUE_SIZE
-        )
+        self._queue_cond = threading.Condition()
         self._worker: Optional[threading.Thread] = None
 
     def __enter__(self) -> "Copy":
@@ -193,18 +287,21 @@ class Copy(BaseCopy["Connection[Any]"]):
         """
         return self.connection.wait(self._read_gen())
 
-    def rows(self) -> Iterator[Tuple[Any, ...]]:
+    def rows(self, batch_size: int = 0) -> Iterator[Tuple[Any, ...]]:
         """
         Iterate on the result of a :sql:`COPY TO` operation record by record.
 
+        The records are read and parsed in batches of up to *batch_size*
+        records (by default `ROWS_BATCH_SIZE`), see `read_rows_batch()`.
+
         Note that the records returned will be tuples of unparsed strings or
         bytes, unless data types are specified using `set_types()`.
         """
         while True:
-            record = self.read_row()
-            if record is None:
+            records = self.read_rows_batch(batch_size)
+            if not records:
                 break
-            yield record
+            yield from records
 
     def read_row(self) -> Optional[Tuple[Any, ...]]:
         """
@@ -217,6 +314,22 @@ class Copy(BaseCopy["Connection[Any]"]):
         """
         return self.connection.wait(self._read_row_gen())
 
+    def read_rows_batch(self, max_rows: int = 0) -> List[Tuple[Any, ...]]:
+        """
+        Read several parsed rows of data after a :sql:`COPY TO` operation.
+
+        Wait until at least a row is available, then return the rows which can
+        be read without waiting for more data from the server, up to
+        *max_rows* (by default `ROWS_BATCH_SIZE`). Return an empty list when
+        the data is finished.
+
+        Note that the records returned will be tuples of unparsed strings or
+        bytes, unless data types are specified using `set_types()`.
+        """
+        return self.connection.wait(
+            self._read_rows_gen(max_rows or self.ROWS_BATCH_SIZE)
+        )
+
     def write(self, buffer: Union[str, bytes]) -> None:
         """
         Write a block of data to a table after a :sql:`COPY FROM` operation.
@@ -243,7 +356,17 @@ class Copy(BaseCopy["Connection[Any]"]):
         if self._pgresult.status == ExecStatus.COPY_OUT:
             return
 
-        self._write_end()
+        try:
+            self._write_end()
+        except BaseException as ex:
+            # Terminate the operation anyway, to leave the connection usable,
+            # then report the error which stopped the data.
+            try:
+                self.connection.wait(self._end_copy_gen(exc or ex))
+            except e.Error:
+                pass
+            raise
+
         self.connection.wait(self._end_copy_gen(exc))
 
     # Concurrent copy support
@@ -255,32 +378,73 @@ class Copy(BaseCopy["Connection[Any]"]):
 
         The function is designed to be run in a separate thread.
         """
-        while 1:
-            data = self._queue.get(block=True, timeout=24 * 60 * 60)
-            if not data:
-                break
-            self.connection.wait(copy_to(self._pgconn, data))
-
-    def _write(self, data: bytes) -> None:
-        if not data:
+        try:
+            end = False
+            while not end:
+                with self._queue_cond:
+                    if not self._queue:
+                        t0 = monotonic()
+                        while not self._queue:
+                            self._queue_cond.wait()
+                        self._stats[self._SEND_WAIT_MS] += int(
+                            1000.0 * (monotonic() - t0)
+                        )
+                    data, end = self._queue_get()
+                    self._queue_cond.notify()
+
+                if data:
+                    t0 = monotonic()
+                    self.connection.wait(copy_to(self._pgconn, data))
+                    self._record_send(len(data), t0, monotonic())
+
+        except BaseException as ex:
+            with self._queue_cond:
+                self._worker_error = ex
+                self._queue_cond.notify()
+
+    def _write(self, data: Optional[bytes]) -> None:
+        if not data and data is not None:
             return
 
         if not self._worker:
+            if data is None:
+                return
+
             # warning: reference loop, broken by _write_end
             self._worker = threading.Thread(target=self.worker)
             self._worker.daemon = True
             self._worker.start()
 
-        self._queue.put(data)
+        with self._queue_cond:
+            if self._queue_bytes >= self.QUEUE_SIZE:
+                t0 = monotonic()
+                while (
+                    self._queue_bytes >= self.QUEUE_SIZE
+                    and not self._worker_error
+                ):
+                    self._queue_cond.wait()
+                self._stats[self._WRITE_WAIT_MS] += int(
+                    1000.0 * (monotonic() - t0)
+                )
+
+            if self._worker_error:
+                raise self._worker_error
+
+            self._queue_put(data)
+            self._queue_cond.notify()
 
     def _write_end(self) -> None:
         data = self.formatter.end()
-        self._write(data)
-        self._queue.put(None)
+        try:
+            self._write(data)
+            self._write(None)
+        finally:
+            if self._worker:
+                self._worker.join()
+                self._worker = None  # break the loop
 
-        if self._worker:
-            self._worker.join()
-            self._worker = None  # break the loop
+        if self._worker_error:
+            raise self._worker_error
 
 
 class AsyncCopy(BaseCopy["AsyncConnection[Any]"]):
@@ -290,9 +454,7 @@ class AsyncCopy(BaseCopy["AsyncConnection[Any]"]):
 
     def __init__(self, cursor: "AsyncCursor[Any]"):
         super().__init__(cursor)
-        self._queue: asyncio.Queue[Optional[bytes]] = asyncio.Queue(
-            maxsize=self.QUEUE_SIZE
-        )
+        self._queue_cond = asyncio.Condition()
         self._worker: Optional[asyncio.Future[None]] = None
 
     async def __aenter__(self) -> "AsyncCopy":
@@ -317,16 +479,26 @@ class AsyncCopy(BaseCopy["AsyncConnection[Any]"]):
     async def read(self) -> memoryview:
         return await self.connection.wait(self._read_gen())
 
-    async def rows(self) -> AsyncIterator[Tuple[Any, ...]]:
+    async def rows(
+        self, batch_size: int = 0
+    ) -> AsyncIterator[Tuple[Any, ...]]:
         while True:
-            record = await self.read_row()
-            if record is None:
+            records = await self.read_rows_batch(batch_size)
+            if not records:
                 break
-            yield record
+            for record in records:
+                yield record
 
     async def read_row(self) -> Optional[Tuple[Any, ...]]:
         return await self.connection.wait(self._read_row_gen())
 
+    async def read_rows_batch(
+        self, max_rows: int = 0
+    ) -> List[Tuple[Any, ...]]:
+        return await self.connection.wait(
+            self._read_rows_gen(max_rows or self.ROWS_BATCH_SIZE)
+        )
+
     async def write(self, buffer: Union[str, bytes]) -> None:
         data = self.formatter.write(buffer)
         await self._write(data)
@@ -340,7 +512,17 @@ class AsyncCopy(BaseCopy["AsyncConnection[Any]"]):
         if self._pgresult.status == ExecStatus.COPY_OUT:
             return
 
-        await self._write_end()
+        try:
+            await self._write_end()
+        except BaseException as ex:
+            # Terminate the operation anyway, to leave the connection usable,
+            # then report the error which stopped the data.
+            try:
+                await self.connection.wait(self._end_copy_gen(exc or ex))
+            except e.Error:
+                pass
+            raise
+
         await self.connection.wait(self._end_copy_gen(exc))
 
     # Concurrent copy support
@@ -350,31 +532,71 @@ class AsyncCopy(BaseCopy["AsyncConnection[Any]"]):
 
         Terminate reading when the queue receives a None.
 
-        The function is designed to be run in a separate thread.
+        The function is designed to be run in a separate task.
         """
-        while 1:
-            data = await self._queue.get()
-            if not data:
-                break
-            await self.connection.wait(copy_to(self._pgconn, data))
-
-    async def _write(self, data: bytes) -> None:
-        if not data:
+        try:
+            end = False
+            while not end:
+                async with self._queue_cond:
+                    if not self._queue:
+                        t0 = monotonic()
+                        while not self._queue:
+                            await self._queue_cond.wait()
+                        self._stats[self._SEND_WAIT_MS] += int(
+                            1000.0 * (monotonic() - t0)
+                        )
+                    data, end = self._queue_get()
+                    self._queue_cond.notify()
+
+                if data:
+                    t0 = monotonic()
+                    await self.connection.wait(copy_to(self._pgconn, data))
+                    self._record_send(len(data), t0, monotonic())
+
+        except BaseException as ex:
+            async with self._queue_cond:
+                self._worker_error = ex
+                self._queue_cond.notify()
+
+    async def _write(self, data: Optional[bytes]) -> None:
+        if not data and data is not None:
             return
 
         if not self._worker:
+            if data is None:
+                return
             self._worker = create_task(self.worker())
 
-        await self._queue.put(data)
+        async with self._queue_cond:
+            if self._queue_bytes >= self.QUEUE_SIZE:
+                t0 = monotonic()
+                while (
+                    self._queue_bytes >= self.QUEUE_SIZE
+                    and not self._worker_error
+                ):
+                    await self._queue_cond.wait()
+                self._stats[self._WRITE_WAIT_MS] += int(
+                    1000.0 * (monotonic() - t0)
+                )
+
+            if self._worker_error:
+                raise self._worker_error
+
+            self._queue_put(data)
+            self._queue_cond.notify()
 
     async def _write_end(self) -> None:
         data = self.formatter.end()
-        await self._write(data)
-        await self._queue.put(None)
+        try:
+            await self._write(data)
+            await self._write(None)
+        finally:
+            if self._worker:
+                await asyncio.gather(self._worker)
+                self._worker = None  # break reference loops if any
 
-        if self._worker:
-            await asyncio.gather(self._worker)
-            self._worker = None  # break reference loops if any
+        if self._worker_error:
+            raise self._worker_error
 
 
 class Formatter(ABC):
@@ -396,6 +618,10 @@ class Formatter(ABC):
     def parse_row(self, data: bytes) -> Optional[Tuple[Any, ...]]:
         ...
 
+    @abstractmethod
+    def parse_rows(self, data: List[memoryview]) -> List[Tuple[Any, ...]]:
+        ...
+
     @abstractmethod
     def write(self, buffer: Union[str, bytes]) -> bytes:
         ...
@@ -423,6 +649,9 @@ class TextFormatter(Formatter):
         else:
             return None
 
+    def parse_rows(self, data: List[memoryview]) -> List[Tuple[Any, ...]]:
+        return parse_rows_text(data, self.transformer)
+
     def write(self, buffer: Union[str, bytes]) -> bytes:
         data = self._ensure_bytes(buffer)
         self._signature_sent = True
@@ -477,6 +706,25 @@ class BinaryFormatter(Formatter):
 
         return parse_row_binary(data, self.transformer)
 
+    def parse_rows(self, data: List[memoryview]) -> List[Tuple[Any, ...]]:
+        if not data:
+            return []
+
+        if not self._signature_sent:
+            first = data[0]
+            if first[: len(_binary_signature)] != _binary_signature:
+                raise e.DataError(
+                    "binary copy doesn't start with the expected signature"
+                )
+            self._signature_sent = True
+            data = data[:]
+            data[0] = first[len(_binary_signature) :]
+
+        if data[-1] == _binary_trailer:
+            data = data[:-1]
+
+        return parse_rows_binary(data, self.transformer)
+
     def write(self, buffer: Union[str, bytes]) -> bytes:
         data = self._ensure_bytes(buffer)
         self._signature_sent = True
@@ -582,6 +830,18 @@ def _parse_row_text(data: bytes, tx: Transformer) -> Tuple[Any, ...]:
     return tx.load_sequence(row)
 
 
+def _parse_rows_text(
+    data: Sequence[bytes], tx: Transformer
+) -> List[Tuple[Any, ...]]:
+    return [_parse_row_text(d, tx) for d in data]
+
+
+def _parse_rows_binary(
+    data: Sequence[bytes], tx: Transformer
+) -> List[Tuple[Any, ...]]:
+    return [_parse_row_binary(d, tx) for d in data]
+
+
 def _parse_row_binary(data: bytes, tx: Transformer) -> Tuple[Any, ...]:
     row: List[Optional[bytes]] = []
     nfields = _unpack_int2(data, 0)[0]
@@ -646,9 +906,13 @@ if _psycopg:
     format_row_binary = _psycopg.format_row_binary
     parse_row_text = _psycopg.parse_row_text
     parse_row_binary = _psycopg.parse_row_binary
+    parse_rows_text = _psycopg.parse_rows_text
+    parse_rows_binary = _psycopg.parse_rows_binary
 
 else:
     format_row_text = _format_row_text
     format_row_binary = _format_row_binary
     parse_row_text = _parse_row_text
     parse_row_binary = _parse_row_binary
+    parse_rows_text = _parse_rows_text
+    parse_rows_binary = _parse_rows_binary
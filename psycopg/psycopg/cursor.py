@@ -6,11 +6,14 @@ psycopg cursor objects
 
 import sys
 from types import TracebackType
-from typing import Any, Callable, Generic, Iterator, List
-from typing import Optional, NoReturn, Sequence, Type, TYPE_CHECKING, TypeVar
+from itertools import count
+from typing import Any, Callable, Generic, Iterable, Iterator, List
+from typing import Optional, NoReturn, Sequence, Tuple, Type, TYPE_CHECKING
+from typing import TypeVar, Union
 from contextlib import contextmanager
 
 from . import pq
+from . import sql
 from . import adapt
 from . import errors as e
 from . import generators
@@ -38,6 +41,10 @@ else:
     execute = generators.execute
 
 
+# Number used to generate unique names for the copy_upsert() staging tables
+_upsert_count = count(1)
+
+
 class BaseCursor(Generic[ConnectionType, Row]):
     # Slots with __weakref__ and generic bases don't work on Py 3.6
     # https://bugs.python.org/issue41451
@@ -284,6 +291,8 @@ class BaseCursor(Generic[ConnectionType, Row]):
         elif res.status in (ExecStatus.TUPLES_OK, ExecStatus.COMMAND_OK):
             # End of single row results
             status = res.status
+            if self._conn._session_changed is False and self._query:
+                self._conn._track_session(self._query.query, [res])
             while res:
                 res = yield from generators.fetch(self._conn.pgconn)
             if status != ExecStatus.TUPLES_OK:
@@ -391,6 +400,9 @@ class BaseCursor(Generic[ConnectionType, Row]):
         self._results = list(results)
         self.pgresult = results[0]
 
+        if self._conn._session_changed is False and self._query:
+            self._conn._track_session(self._query.query, results)
+
         # Note: the only reason to override format is to correclty set
         # binary loaders on server-side cursors, because send_describe_portal
         # only returns a text result.
@@ -434,6 +446,7 @@ class BaseCursor(Generic[ConnectionType, Row]):
         else:
             fmt = Format.BINARY if binary else Format.TEXT
 
+        self._query = pgq
         self._conn.pgconn.send_query_prepared(
             name,
             pgq.params,
@@ -467,6 +480,64 @@ class BaseCursor(Generic[ConnectionType, Row]):
                 f" FROM STDIN statements, got {ExecStatus(status).name}"
             )
 
+    def _copy_upsert_queries(
+        self,
+        table: Union[str, sql.Identifier],
+        key_columns: Sequence[str],
+        update_columns: Sequence[str],
+    ) -> Tuple[sql.Composed, sql.Composed, sql.Composed]:
+        """
+        Return the queries to perform `Cursor.copy_upsert()`.
+
+        Return the query to create the staging table (which also selects
+        from it, to return the types of the columns), the :sql:`COPY` to
+        populate it, and the query to merge its content into *table* (which
+        drops the staging table too).
+        """
+        if not key_columns:
+            raise e.ProgrammingError("copy_upsert() requires key columns")
+
+        if isinstance(table, str):
+            table = sql.Identifier(table)
+        # Use a different name for every operation, to avoid clashes with
+        # other staging tables, or tables created by the user, in the session.
+        staging = sql.Identifier(f"_pg3_upsert_{next(_upsert_count)}")
+        keys = [sql.Identifier(c) for c in key_columns]
+        updates = [sql.Identifier(c) for c in update_columns]
+        cols = sql.SQL(", ").join(keys + updates)
+
+        create = sql.SQL(
+            "CREATE TEMP TABLE {staging} AS SELECT {cols} FROM {table}"
+            " WITH NO DATA; SELECT * FROM {staging}"
+        ).format(staging=staging, cols=cols, table=table)
+
+        copy = sql.SQL("COPY {staging} FROM STDIN (FORMAT BINARY)").format(
+            staging=staging
+        )
+
+        action: sql.Composable
+        if updates:
+            action = sql.SQL("UPDATE SET {}").format(
+                sql.SQL(", ").join(
+                    [sql.SQL("{0} = EXCLUDED.{0}").format(c) for c in updates]
+                )
+            )
+        else:
+            action = sql.SQL("NOTHING")
+
+        merge = sql.SQL(
+            "INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging}"
+            " ON CONFLICT ({keys}) DO {action}; DROP TABLE {staging}"
+        ).format(
+            table=table,
+            cols=cols,
+            staging=staging,
+            keys=sql.SQL(", ").join(keys),
+            action=action,
+        )
+
+        return create, copy, merge
+
     def _scroll(self, value: int, mode: str) -> None:
         self._check_result()
         assert self.pgresult
@@ -667,3 +738,32 @@ class Cursor(BaseCursor["Connection[Any]", Row]):
 
         with Copy(self) as copy:
             yield copy
+
+    def copy_upsert(
+        self,
+        table: Union[str, sql.Identifier],
+        rows: Iterable[Sequence[Any]],
+        key_columns: Sequence[str],
+        update_columns: Sequence[str] = (),
+    ) -> int:
+        """
+        Insert *rows* into *table*, updating the records already existing.
+
+        Return the number of records inserted or updated.
+        """
+        create, copy_stmt, merge = self._copy_upsert_queries(
+            table, key_columns, update_columns
+        )
+        with self._conn.transaction():
+            self.execute(create, binary=False)
+            self.nextset()
+            assert self.description is not None
+            types = [col.type_code for col in self.description]
+
+            with self.copy(copy_stmt) as copy:
+                copy.set_types(types)
+                for row in rows:
+                    copy.write_row(row)
+
+            self.execute(merge, binary=False)
+            return self.rowcount
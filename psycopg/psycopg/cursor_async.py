@@ -5,9 +5,10 @@ psycopg async cursor objects
 # Copyright (C) 2020-2021 The Psycopg Team
 
 from types import TracebackType
-from typing import Any, AsyncIterator, List
-from typing import Optional, Sequence, Type, TYPE_CHECKING
+from typing import Any, AsyncIterator, Iterable, List
+from typing import Optional, Sequence, Type, TYPE_CHECKING, Union
 
+from . import sql
 from . import errors as e
 
 from .abc import Query, Params
@@ -159,3 +160,27 @@ class AsyncCursor(BaseCursor["AsyncConnection[Any]", Row]):
 
         async with AsyncCopy(self) as copy:
             yield copy
+
+    async def copy_upsert(
+        self,
+        table: Union[str, sql.Identifier],
+        rows: Iterable[Sequence[Any]],
+        key_columns: Sequence[str],
+        update_columns: Sequence[str] = (),
+    ) -> int:
+        create, copy_stmt, merge = self._copy_upsert_queries(
+            table, key_columns, update_columns
+        )
+        async with self._conn.transaction():
+            await self.execute(create, binary=False)
+            self.nextset()
+            assert self.description is not None
+            types = [col.type_code for col in self.description]
+
+            async with self.copy(copy_stmt) as copy:
+                copy.set_types(types)
+                for row in rows:
+                    await copy.write_row(row)
+
+            await self.execute(merge, binary=False)
+            return self.rowcount
@@ -16,7 +16,7 @@ when the file descriptor is ready.
 # Copyright (C) 2020-2021 The Psycopg Team
 
 import logging
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
 from . import pq
 from . import errors as e
@@ -187,6 +187,43 @@ def copy_from(pgconn: PGconn) -> PQGen[Union[memoryview, PGresult]]:
         return data
 
     # Retrieve the final result of copy
+    return (yield from _copy_from_result(pgconn))
+
+
+def copy_from_many(
+    pgconn: PGconn, max_rows: int
+) -> PQGen[Tuple[List[memoryview], Optional[PGresult]]]:
+    """
+    Read up to *max_rows* rows of data from a COPY TO operation.
+
+    Wait until at least a row is available, then return all the rows which can
+    be read without blocking. Return also the final result if the operation
+    is finished.
+    """
+    rows: List[memoryview] = []
+    while 1:
+        nbytes, data = pgconn.get_copy_data(1)
+        if nbytes > 0:
+            rows.append(data)
+            if len(rows) >= max_rows:
+                return rows, None
+
+        elif nbytes == 0:
+            if rows:
+                return rows, None
+
+            # would block
+            yield Wait.R
+            pgconn.consume_input()
+
+        else:
+            break
+
+    result = yield from _copy_from_result(pgconn)
+    return rows, result
+
+
+def _copy_from_result(pgconn: PGconn) -> PQGen[PGresult]:
     (result,) = yield from fetch_many(pgconn)
     if result.status != ExecStatus.COMMAND_OK:
         encoding = py_codecs.get(
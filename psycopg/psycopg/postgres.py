@@ -4,7 +4,7 @@ Types configuration specific to PostgreSQL.
 
 # Copyright (C) 2020-2021 The Psycopg Team
 
-from ._typeinfo import TypeInfo, RangeInfo, TypesRegistry
+from ._typeinfo import TypeInfo, RangeInfo, MultirangeInfo, TypesRegistry
 from .abc import AdaptContext
 from ._adapters_map import AdaptersMap
 
@@ -88,6 +88,24 @@ for t in [
     RangeInfo("numrange", 3906, 3907, subtype_oid=1700),
     RangeInfo("tsrange", 3908, 3909, subtype_oid=1114),
     RangeInfo("tstzrange", 3910, 3911, subtype_oid=1184),
+    MultirangeInfo(
+        "datemultirange", 4535, 6155, range_oid=3912, subtype_oid=1082
+    ),
+    MultirangeInfo(
+        "int4multirange", 4451, 6150, range_oid=3904, subtype_oid=23
+    ),
+    MultirangeInfo(
+        "int8multirange", 4536, 6157, range_oid=3926, subtype_oid=20
+    ),
+    MultirangeInfo(
+        "nummultirange", 4532, 6151, range_oid=3906, subtype_oid=1700
+    ),
+    MultirangeInfo(
+        "tsmultirange", 4533, 6152, range_oid=3908, subtype_oid=1114
+    ),
+    MultirangeInfo(
+        "tstzmultirange", 4534, 6153, range_oid=3910, subtype_oid=1184
+    ),
     # autogenerated: end
 ]:
     types.add(t)
@@ -101,7 +119,7 @@ TEXT_ARRAY_OID = types["text"].array_oid
 
 def register_default_adapters(context: AdaptContext) -> None:
 
-    from .types import array, bool, composite, datetime, json
+    from .types import array, bool, composite, datetime, json, multirange
     from .types import net, none, numeric, range, string, uuid
 
     array.register_default_adapters(context)
@@ -109,6 +127,7 @@ def register_default_adapters(context: AdaptContext) -> None:
     composite.register_default_adapters(context)
     datetime.register_default_adapters(context)
     json.register_default_adapters(context)
+    multirange.register_default_adapters(context)
     net.register_default_adapters(context)
     none.register_default_adapters(context)
     numeric.register_default_adapters(context)
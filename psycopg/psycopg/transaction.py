@@ -7,13 +7,15 @@ Transaction context managers returned by Connection.transaction()
 import logging
 
 from types import TracebackType
-from typing import Generic, Optional, Type, Union, TYPE_CHECKING
+from typing import Generic, List, Optional, Type, Union, TYPE_CHECKING
 
 from . import pq
 from . import sql
+from . import errors as e
 from .pq import TransactionStatus
 from .abc import ConnectionType, PQGen
 from .pq.abc import PGresult
+from ._enums import IsolationLevel
 
 if TYPE_CHECKING:
     from typing import Any
@@ -22,6 +24,11 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+_SNAPSHOT_LEVELS = (
+    IsolationLevel.REPEATABLE_READ,
+    IsolationLevel.SERIALIZABLE,
+)
+
 
 class Rollback(Exception):
     """
@@ -50,10 +57,12 @@ class BaseTransaction(Generic[ConnectionType]):
         connection: ConnectionType,
         savepoint_name: Optional[str] = None,
         force_rollback: bool = False,
+        snapshot: Optional[str] = None,
     ):
         self._conn = connection
         self._savepoint_name = savepoint_name or ""
         self.force_rollback = force_rollback
+        self._snapshot = snapshot
         self._entered = self._exited = False
 
     @property
@@ -101,6 +110,13 @@ class BaseTransaction(Generic[ConnectionType]):
         if self._outer_transaction:
             assert not self._conn._savepoints, self._conn._savepoints
             commands.append(self._conn._get_tx_start_command())
+            if self._snapshot:
+                commands.extend(self._import_snapshot_commands())
+
+        elif self._snapshot:
+            raise e.ProgrammingError(
+                "a snapshot can be imported only by the outer transaction"
+            )
 
         if self._savepoint_name:
             commands.append(
@@ -112,6 +128,32 @@ class BaseTransaction(Generic[ConnectionType]):
         self._conn._savepoints.append(self._savepoint_name)
         return self._conn._exec_command(b"; ".join(commands))
 
+    def _import_snapshot_commands(self) -> List[bytes]:
+        assert self._snapshot
+        commands = []
+        # Importing a snapshot requires a repeatable read transaction.
+        if self._conn.isolation_level not in _SNAPSHOT_LEVELS:
+            commands.append(b"SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        commands.append(
+            sql.SQL("SET TRANSACTION SNAPSHOT {}")
+            .format(sql.Literal(self._snapshot))
+            .as_bytes(self._conn)
+        )
+        return commands
+
+    def _export_snapshot_gen(self) -> PQGen[str]:
+        if not self._entered or self._exited:
+            raise e.ProgrammingError(
+                "a snapshot can be exported only inside the transaction block"
+            )
+
+        res = yield from self._conn._exec_command(
+            b"SELECT pg_export_snapshot()"
+        )
+        snapshot = res.get_value(0, 0)
+        assert snapshot is not None
+        return snapshot.decode()
+
     def _exit_gen(
         self,
         exc_type: Optional[Type[BaseException]],
@@ -185,6 +227,18 @@ class Transaction(BaseTransaction["Connection[Any]"]):
         """The connection the object is managing."""
         return self._conn
 
+    def export_snapshot(self) -> str:
+        """
+        Export the snapshot of the current transaction.
+
+        Return the identifier of the snapshot, which can be passed to the
+        *snapshot* parameter of `Connection.transaction()` to start
+        transactions on other connections seeing the same data. The snapshot
+        can be imported only as long as this transaction is open.
+        """
+        with self._conn.lock:
+            return self._conn.wait(self._export_snapshot_gen())
+
     def __enter__(self) -> "Transaction":
         with self._conn.lock:
             self._conn.wait(self._enter_gen())
@@ -211,6 +265,10 @@ class AsyncTransaction(BaseTransaction["AsyncConnection[Any]"]):
     def connection(self) -> "AsyncConnection[Any]":
         return self._conn
 
+    async def export_snapshot(self) -> str:
+        async with self._conn.lock:
+            return await self._conn.wait(self._export_snapshot_gen())
+
     async def __aenter__(self) -> "AsyncTransaction":
         async with self._conn.lock:
             await self._conn.wait(self._enter_gen())
@@ -19,6 +19,7 @@ from ..adapt import RecursiveDumper, RecursiveLoader, PyFormat
 from .._struct import pack_len, unpack_len
 from ..postgres import TEXT_OID, INVALID_OID
 from .._typeinfo import TypeInfo
+from .._cmodule import _psycopg
 
 _struct_head = struct.Struct("!III")  # ndims, hasnull, elem oid
 _pack_head = cast(Callable[[int, int, int], bytes], _struct_head.pack)
@@ -426,7 +427,9 @@ def register_array(
 
     adapters = context.adapters if context else postgres.adapters
 
-    base: Type[Any] = ArrayLoader
+    # The classes created here are not found by name in the C module, so pick
+    # the optimised base classes explicitly.
+    base: Type[Any] = _psycopg.ArrayLoader if _psycopg else ArrayLoader
     name = f"{info.name.title()}{base.__name__}"
     attribs = {
         "base_oid": info.oid,
@@ -435,7 +438,7 @@ def register_array(
     loader = type(name, (base,), attribs)
     adapters.register_loader(info.array_oid, loader)
 
-    base = ArrayBinaryLoader
+    base = _psycopg.ArrayBinaryLoader if _psycopg else ArrayBinaryLoader
     name = f"{info.name.title()}{base.__name__}"
     attribs = {"base_oid": info.oid}
     loader = type(name, (base,), attribs)
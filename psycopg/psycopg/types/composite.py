@@ -16,6 +16,7 @@ from ..abc import AdaptContext, Buffer
 from ..adapt import PyFormat, RecursiveDumper, RecursiveLoader
 from .._struct import pack_len, unpack_len
 from ..postgres import TEXT_OID
+from .._cmodule import _psycopg
 from .._typeinfo import CompositeInfo as CompositeInfo  # exported here
 
 _struct_oidlen = struct.Struct("!Ii")
@@ -141,19 +142,26 @@ class RecordLoader(BaseCompositeLoader):
 class RecordBinaryLoader(RecursiveLoader):
 
     format = pq.Format.BINARY
-    _types_set = False
 
-    def load(self, data: Buffer) -> Tuple[Any, ...]:
-        if not self._types_set:
-            self._config_types(data)
-            self._types_set = True
+    # The oids of the fields of the previous record loaded
+    _oids: List[int] = []
 
-        return self._tx.load_sequence(
-            tuple(
+    def load(self, data: Buffer) -> Tuple[Any, ...]:
+        oids = []
+        record: List[Optional[Buffer]] = []
+        for oid, offset, length in self._walk_record(data):
+            oids.append(oid)
+            record.append(
                 data[offset : offset + length] if length != -1 else None
-                for _, offset, length in self._walk_record(data)
             )
-        )
+
+        # Records of the same column usually have the same types: configure
+        # the loaders only if they changed.
+        if oids != self._oids:
+            self._tx.set_loader_types(oids, self.format)
+            self._oids = oids
+
+        return self._tx.load_sequence(record)
 
     def _walk_record(self, data: bytes) -> Iterator[Tuple[int, int, int]]:
         """
@@ -166,10 +174,6 @@ class RecordBinaryLoader(RecursiveLoader):
             yield oid, i + 8, length
             i += (8 + length) if length > 0 else 8
 
-    def _config_types(self, data: bytes) -> None:
-        oids = [r[0] for r in self._walk_record(data)]
-        self._tx.set_loader_types(oids, self.format)
-
 
 class CompositeLoader(RecordLoader):
 
@@ -226,9 +230,10 @@ def register_composite(
     adapters = context.adapters if context else postgres.adapters
 
     # generate and register a customized text loader
-    loader: Type[BaseCompositeLoader] = type(
+    base: Type[Any] = _psycopg.CompositeLoader if _psycopg else CompositeLoader
+    loader: Type[Any] = type(
         f"{info.name.title()}Loader",
-        (CompositeLoader,),
+        (base,),
         {
             "factory": factory,
             "fields_types": info.field_types,
@@ -237,9 +242,12 @@ def register_composite(
     adapters.register_loader(info.oid, loader)
 
     # generate and register a customized binary loader
+    base = (
+        _psycopg.CompositeBinaryLoader if _psycopg else CompositeBinaryLoader
+    )
     loader = type(
         f"{info.name.title()}BinaryLoader",
-        (CompositeBinaryLoader,),
+        (base,),
         {"factory": factory},
     )
     adapters.register_loader(info.oid, loader)
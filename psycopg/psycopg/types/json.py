@@ -6,6 +6,7 @@ Adapers for JSON types.
 
 import json
 from typing import Any, Callable, Optional, Type, Union
+from functools import lru_cache
 
 from .. import postgres
 from ..pq import Format
@@ -14,7 +15,7 @@ from ..adapt import Buffer, Dumper, Loader
 from ..errors import DataError
 
 JsonDumpsFunction = Callable[[Any], str]
-JsonLoadsFunction = Callable[[Union[str, bytes, bytearray]], Any]
+JsonLoadsFunction = Callable[[Union[str, bytes, bytearray, memoryview]], Any]
 
 
 def set_json_dumps(
@@ -68,6 +69,10 @@ def set_json_loads(
 
     By default loading JSON uses the builtin `json.loads`. You can override
     it to use a different JSON library or to use customised arguments.
+
+    If *loads* accepts a `!memoryview`, as for instance ``orjson.loads`` does,
+    the data received from the database is passed to it without copying it
+    to a `!bytes` object first.
     """
     if context is None:
         # If changing load function globally, just change the default on the
@@ -151,6 +156,19 @@ class JsonbBinaryDumper(_JsonDumper):
         return b"\x01" + dumps(obj.obj).encode()
 
 
+@lru_cache(64)
+def accepts_memoryview(loads: JsonLoadsFunction) -> bool:
+    """
+    Return `!True` if the *loads* function can parse a `!memoryview`.
+    """
+    try:
+        loads(memoryview(b"null"))
+    except Exception:
+        return False
+    else:
+        return True
+
+
 class _JsonLoader(Loader):
 
     # The globally used JSON loads() function. It can be changed globally (by
@@ -160,10 +178,11 @@ class _JsonLoader(Loader):
     def __init__(self, oid: int, context: Optional[AdaptContext] = None):
         super().__init__(oid, context)
         self.loads = self.__class__._loads
+        # json.loads() cannot work on memoryview, other functions can.
+        self._zero_copy = accepts_memoryview(self.loads)
 
     def load(self, data: Buffer) -> Any:
-        # json.loads() cannot work on memoryview.
-        if isinstance(data, memoryview):
+        if not self._zero_copy and isinstance(data, memoryview):
             data = bytes(data)
         return self.loads(data)
 
@@ -187,9 +206,11 @@ class JsonbBinaryLoader(_JsonLoader):
     def load(self, data: Buffer) -> Any:
         if data and data[0] != 1:
             raise DataError("unknown jsonb binary format: {data[0]}")
-        data = data[1:]
-        if isinstance(data, memoryview):
-            data = bytes(data)
+        if self._zero_copy:
+            # Skip the version number without copying the data
+            data = memoryview(data)[1:]
+        else:
+            data = bytes(data[1:])
         return self.loads(data)
 
 
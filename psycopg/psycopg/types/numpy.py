@@ -0,0 +1,227 @@
+# type: ignore  # numpy is optional and mypy fails if missing
+"""
+Adapters for NumPy arrays and scalars
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError(
+        "the module psycopg.types.numpy requires the package 'numpy' installed"
+    )
+
+from .. import pq
+from .. import errors as e
+from .. import postgres
+from ..abc import AdaptContext, Buffer, DumperKey
+from ..adapt import Dumper, Loader, RecursiveDumper, PyFormat
+from .._struct import unpack_len
+from .array import _pack_head, _pack_dim, _unpack_head, _unpack_dim
+from .bool import BoolDumper, BoolBinaryDumper
+from .numeric import Int2Dumper, Int4Dumper, Int8Dumper, IntNumericDumper
+from .numeric import IntNumericBinaryDumper
+from .numeric import Int2BinaryDumper, Int4BinaryDumper, Int8BinaryDumper
+from .numeric import Float4Dumper, Float4BinaryDumper
+
+# Postgres type and binary representation of the elements of the arrays, by
+# NumPy dtype kind and item size.
+_dump_types: Dict[Tuple[str, int], Tuple[str, str]] = {
+    ("b", 1): ("bool", "?"),
+    ("i", 1): ("int2", ">i2"),
+    ("i", 2): ("int2", ">i2"),
+    ("i", 4): ("int4", ">i4"),
+    ("i", 8): ("int8", ">i8"),
+    ("u", 1): ("int2", ">i2"),
+    ("u", 2): ("int4", ">i4"),
+    ("u", 4): ("int8", ">i8"),
+    ("f", 2): ("float4", ">f4"),
+    ("f", 4): ("float4", ">f4"),
+    ("f", 8): ("float8", ">f8"),
+}
+
+# Binary representation of the elements of the arrays loaded, by Postgres oid
+_load_types: Dict[int, str] = {
+    postgres.types[name].oid: dtype
+    for name, dtype in [
+        ("bool", "?"),
+        ("int2", ">i2"),
+        ("int4", ">i4"),
+        ("int8", ">i8"),
+        ("float4", ">f4"),
+        ("float8", ">f8"),
+    ]
+}
+
+
+class _BaseNdarrayDumper(RecursiveDumper):
+
+    # The Postgres type and the binary representation of the elements, set by
+    # upgrade()
+    element_oid = 0
+    _dtype: Optional["np.dtype"] = None
+
+    def get_key(self, obj: "np.ndarray", format: PyFormat) -> DumperKey:
+        if self.oid:
+            return self.cls
+        return (self.cls, obj.dtype.kind, obj.dtype.itemsize)
+
+    def upgrade(self, obj: "np.ndarray", format: PyFormat) -> "Dumper":
+        if self.oid:
+            return self
+
+        try:
+            name, dtype = _dump_types[obj.dtype.kind, obj.dtype.itemsize]
+        except KeyError:
+            raise e.ProgrammingError(
+                f"cannot adapt NumPy arrays of dtype {obj.dtype}"
+            ) from None
+
+        info = postgres.types[name]
+        dumper = type(self)(self.cls, self._tx)
+        dumper.oid = info.array_oid
+        dumper.element_oid = info.oid
+        dumper._dtype = np.dtype(dtype)
+        return dumper
+
+    def _check_dims(self, obj: "np.ndarray") -> None:
+        if not obj.ndim:
+            raise e.DataError("cannot dump NumPy arrays with no dimension")
+
+
+class NdarrayDumper(_BaseNdarrayDumper):
+    def dump(self, obj: "np.ndarray") -> Buffer:
+        self._check_dims(obj)
+        items = obj.tolist()
+        return self._tx.get_dumper(items, PyFormat.TEXT).dump(items)
+
+
+class NdarrayBinaryDumper(_BaseNdarrayDumper):
+
+    format = pq.Format.BINARY
+
+    def dump(self, obj: "np.ndarray") -> Buffer:
+        self._check_dims(obj)
+        if not obj.size:
+            return _pack_head(0, 0, self.element_oid)
+
+        # Every element is preceded by its length: write them all at once,
+        # byte-swapping the values in bulk.
+        items = np.empty(
+            obj.size, dtype=[("len", ">i4"), ("val", self._dtype)]
+        )
+        items["len"] = self._dtype.itemsize
+        items["val"] = obj.ravel()
+
+        head = _pack_head(obj.ndim, 0, self.element_oid) + b"".join(
+            _pack_dim(dim, 1) for dim in obj.shape
+        )
+        return head + items.tobytes()
+
+
+class UInt64BinaryDumper(IntNumericBinaryDumper):
+    def dump(self, obj: "np.uint64") -> Buffer:
+        # The base class needs int methods, missing from the numpy ints
+        return super().dump(int(obj))
+
+
+class NdarrayBinaryLoader(Loader):
+
+    format = pq.Format.BINARY
+
+    def load(self, data: Buffer) -> "np.ndarray":
+        ndims, hasnull, oid = _unpack_head(data)
+        try:
+            dtype = np.dtype(_load_types[oid])
+        except KeyError:
+            raise e.DataError(
+                f"cannot load arrays of oid {oid} into NumPy arrays"
+            ) from None
+
+        if not ndims:
+            return np.empty(0, dtype=dtype.newbyteorder("="))
+
+        p = 12 + 8 * ndims
+        dims = [_unpack_dim(data, i)[0] for i in range(12, p, 8)]
+        nelems = int(np.prod(dims))
+
+        if not hasnull:
+            items = np.frombuffer(
+                data,
+                dtype=[("len", ">i4"), ("val", dtype)],
+                count=nelems,
+                offset=p,
+            )
+            # astype() copies the data, so the result doesn't refer to the
+            # buffer received, which is not guaranteed to stay valid.
+            return items["val"].astype(dtype.newbyteorder("=")).reshape(dims)
+
+        # Return the nulls as masked values
+        values = np.zeros(nelems, dtype=dtype.newbyteorder("="))
+        mask = np.zeros(nelems, dtype=bool)
+        for i in range(nelems):
+            size = unpack_len(data, p)[0]
+            p += 4
+            if size == -1:
+                mask[i] = True
+            else:
+                values[i] = np.frombuffer(
+                    data, dtype=dtype, count=1, offset=p
+                )[0]
+                p += size
+
+        return np.ma.masked_array(values, mask).reshape(dims)
+
+
+def register_numpy(context: Optional[AdaptContext] = None) -> None:
+    """Register the adapters to dump NumPy arrays and scalars.
+
+    :param context: The context where to register the adapters. If `!None`,
+        register them globally.
+
+    Arrays of booleans, integers and floats are dumped as Postgres arrays of
+    the matching type. The NumPy scalars are dumped as the matching Postgres
+    type.
+    """
+    adapters = context.adapters if context else postgres.adapters
+
+    adapters.register_dumper(np.ndarray, NdarrayBinaryDumper)
+    adapters.register_dumper(np.ndarray, NdarrayDumper)
+
+    scalars: Dict[Any, Tuple[type, type]] = {
+        np.bool_: (BoolBinaryDumper, BoolDumper),
+        np.int8: (Int2BinaryDumper, Int2Dumper),
+        np.int16: (Int2BinaryDumper, Int2Dumper),
+        np.int32: (Int4BinaryDumper, Int4Dumper),
+        np.int64: (Int8BinaryDumper, Int8Dumper),
+        np.uint8: (Int2BinaryDumper, Int2Dumper),
+        np.uint16: (Int4BinaryDumper, Int4Dumper),
+        np.uint32: (Int8BinaryDumper, Int8Dumper),
+        np.uint64: (UInt64BinaryDumper, IntNumericDumper),
+        np.float16: (Float4BinaryDumper, Float4Dumper),
+        np.float32: (Float4BinaryDumper, Float4Dumper),
+    }
+    for cls, dumpers in scalars.items():
+        for dumper in dumpers:
+            adapters.register_dumper(cls, dumper)
+
+
+def register_numpy_loaders(context: Optional[AdaptContext] = None) -> None:
+    """Register the adapters to load Postgres arrays as NumPy arrays.
+
+    :param context: The context where to register the adapters. If `!None`,
+        register them globally.
+
+    Only the arrays of :sql:`bool`, :sql:`int2`, :sql:`int4`, :sql:`int8`,
+    :sql:`float4`, :sql:`float8` received in binary format are loaded as NumPy
+    arrays. The null elements, if any, are returned as masked values.
+    """
+    adapters = context.adapters if context else postgres.adapters
+
+    for oid in _load_types:
+        adapters.register_loader(
+            postgres.types[oid].array_oid, NdarrayBinaryLoader
+        )
@@ -5,19 +5,21 @@ Support for range types adaptation.
 # Copyright (C) 2020-2021 The Psycopg Team
 
 import re
-from typing import Any, Dict, Generic, Optional, TypeVar, Type, Union
-from typing import cast
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+from typing import Type, Union, cast
 from decimal import Decimal
 from datetime import date, datetime
 
 from .. import postgres
+from .. import errors as e
 from ..pq import Format
 from ..abc import AdaptContext, Buffer, Dumper, DumperKey
 from ..adapt import RecursiveDumper, RecursiveLoader, PyFormat
 from .._struct import pack_len, unpack_len
 from ..postgres import INVALID_OID, TEXT_OID
 from .._typeinfo import RangeInfo as RangeInfo  # exported here
-from .composite import SequenceDumper, BaseCompositeLoader
+from .._cmodule import _psycopg
+from .composite import SequenceDumper
 
 RANGE_EMPTY = 0x01  # range is empty
 RANGE_LB_INC = 0x02  # lower bound is inclusive
@@ -373,58 +375,120 @@ class RangeBinaryDumper(BaseRangeDumper):
         return out
 
 
-class RangeLoader(BaseCompositeLoader, Generic[T]):
+class BaseRangeLoader(RecursiveLoader, Generic[T]):
     """Generic loader for a range.
 
-    Subclasses shoud specify the oid of the subtype and the class to load.
+    Subclasses must specify the oid of the subtype and the class to load.
     """
 
     subtype_oid: int
 
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+        self._load = self._tx.get_loader(self.subtype_oid, self.format).load
+
+
+class RangeLoader(BaseRangeLoader[T]):
     def load(self, data: Buffer) -> Range[T]:
-        if data == b"empty":
-            return Range(empty=True)
-
-        cast = self._tx.get_loader(self.subtype_oid, format=Format.TEXT).load
-        bounds = _int2parens[data[0]] + _int2parens[data[-1]]
-        min, max = (
-            cast(token) if token is not None else None
-            for token in self._parse_record(data[1:-1])
+        return load_range_text(data, self._load)[0]
+
+
+def load_range_text(
+    data: Buffer, load: Callable[[Buffer], Any]
+) -> Tuple[Range[Any], int]:
+    """
+    Parse a range at the start of *data*, loading its bounds with *load*.
+
+    Return the range and the position of the end of the range in *data*.
+    """
+    if data[:5] == b"empty":
+        return Range(empty=True), 5
+
+    m = _re_range.match(data)
+    if m is None:
+        raise e.DataError(
+            f"failed to parse range: '{bytes(data).decode('utf8', 'replace')}'"
         )
-        return Range(min, max, bounds)
 
+    lower = None
+    item = m.group(3)
+    if item is None:
+        item = m.group(2)
+        if item is not None:
+            lower = load(_re_undouble.sub(br"\1", item))
+    else:
+        lower = load(item)
+
+    upper = None
+    item = m.group(5)
+    if item is None:
+        item = m.group(4)
+        if item is not None:
+            upper = load(_re_undouble.sub(br"\1", item))
+    else:
+        upper = load(item)
+
+    bounds = _int2parens[m.group(1)[0]] + _int2parens[m.group(6)[0]]
+    return Range(lower, upper, bounds), m.end()
+
+
+_re_range = re.compile(
+    br"""(?x)
+    ( \(|\[ )                   # lower bound flag
+    (?:                         # lower bound:
+      " ( (?: [^"] | "")* ) "   #   - a quoted string
+      | ( [^",]+ )              #   - or an unquoted string
+    )?                          #   - or empty (not caught)
+    ,
+    (?:                         # upper bound:
+      " ( (?: [^"] | "")* ) "   #   - a quoted string
+      | ( [^"\)\]]+ )           #   - or an unquoted string
+    )?                          #   - or empty (not caught)
+    ( \)|\] )                   # upper bound flag
+    """
+)
 
-class RangeBinaryLoader(RecursiveLoader, Generic[T]):
+_re_undouble = re.compile(br'(["\\])\1')
+
+
+class RangeBinaryLoader(BaseRangeLoader[T]):
 
     format = Format.BINARY
-    subtype_oid: int
 
     def load(self, data: Buffer) -> Range[T]:
-        head = data[0]
-        if head & RANGE_EMPTY:
-            return Range(empty=True)
+        return load_range_binary(data, self._load)
 
-        load = self._tx.get_loader(self.subtype_oid, format=Format.BINARY).load
-        lb = "[" if head & RANGE_LB_INC else "("
-        ub = "]" if head & RANGE_UB_INC else ")"
 
-        pos = 1  # after the head
-        if head & RANGE_LB_INF:
-            min = None
-        else:
-            length = unpack_len(data, pos)[0]
-            pos += 4
-            min = load(data[pos : pos + length])
-            pos += length
+def load_range_binary(
+    data: Buffer, load: Callable[[Buffer], Any]
+) -> Range[Any]:
+    """
+    Parse a range in binary format, loading its bounds with *load*.
+    """
+    head = data[0]
+    if head & RANGE_EMPTY:
+        return Range(empty=True)
 
-        if head & RANGE_UB_INF:
-            max = None
-        else:
-            length = unpack_len(data, pos)[0]
-            pos += 4
-            max = load(data[pos : pos + length])
+    lb = "[" if head & RANGE_LB_INC else "("
+    ub = "]" if head & RANGE_UB_INC else ")"
+
+    pos = 1  # after the head
+    if head & RANGE_LB_INF:
+        min = None
+    else:
+        length = unpack_len(data, pos)[0]
+        pos += 4
+        min = load(data[pos : pos + length])
+        pos += length
 
-        return Range(min, max, lb + ub)
+    if head & RANGE_UB_INF:
+        max = None
+    else:
+        length = unpack_len(data, pos)[0]
+        pos += 4
+        max = load(data[pos : pos + length])
+
+    return Range(min, max, lb + ub)
 
 
 _int2parens = {ord(c): c for c in "[]()"}
@@ -449,20 +513,22 @@ def register_range(
     adapters = context.adapters if context else postgres.adapters
 
     # generate and register a customized text loader
-    loader: Type[RangeLoader[Any]] = type(
+    base: Type[Any] = _psycopg.RangeLoader if _psycopg else RangeLoader
+    loader: Type[Any] = type(
         f"{info.name.title()}Loader",
-        (RangeLoader,),
+        (base,),
         {"subtype_oid": info.subtype_oid},
     )
     adapters.register_loader(info.oid, loader)
 
     # generate and register a customized binary loader
-    bloader: Type[RangeBinaryLoader[Any]] = type(
+    base = _psycopg.RangeBinaryLoader if _psycopg else RangeBinaryLoader
+    loader = type(
         f"{info.name.title()}BinaryLoader",
-        (RangeBinaryLoader,),
+        (base,),
         {"subtype_oid": info.subtype_oid},
     )
-    adapters.register_loader(info.oid, bloader)
+    adapters.register_loader(info.oid, loader)
 
 
 # Text dumpers for builtin range types wrappers
@@ -4,7 +4,7 @@ Adapters for textual types.
 
 # Copyright (C) 2020-2021 The Psycopg Team
 
-from typing import Optional, Union, TYPE_CHECKING
+from typing import Dict, Optional, Union, TYPE_CHECKING
 
 from .. import postgres
 from ..pq import Format, Escaping
@@ -104,6 +104,49 @@ class TextBinaryLoader(TextLoader):
     format = Format.BINARY
 
 
+class InternedTextLoader(TextLoader):
+    """
+    Loader for textual types returning the same object for equal values.
+
+    Useful to reduce the memory used by large results containing columns with
+    few distinct values, such as status codes or enums. The loader is not
+    registered by default.
+
+    Every loader instance keeps the first `max_size` distinct values loaded
+    and shares them; further distinct values are loaded normally, and not
+    kept, so that memory stays bounded on columns with many distinct values.
+    """
+
+    max_size = 1024
+    """
+    Maximum number of distinct values kept and shared by each loader.
+
+    The first values loaded are kept, and they are never evicted.
+    """
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+        self._values: Dict[bytes, Union[bytes, str]] = {}
+
+    def load(self, data: Buffer) -> Union[bytes, str]:
+        # memoryview are not hashable
+        key = bytes(data)
+        try:
+            return self._values[key]
+        except KeyError:
+            pass
+
+        rv = super().load(key)
+        if len(self._values) < self.max_size:
+            self._values[key] = rv
+        return rv
+
+
+class InternedTextBinaryLoader(InternedTextLoader):
+
+    format = Format.BINARY
+
+
 class BytesDumper(Dumper):
 
     oid = postgres.types["bytea"].oid
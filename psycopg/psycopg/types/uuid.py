@@ -60,6 +60,44 @@ class UUIDBinaryLoader(UUIDLoader):
         return UUID(bytes=data)
 
 
+class UUIDIntLoader(Loader):
+    """
+    Load a :sql:`uuid` as the `!int` value of the `~uuid.UUID`.
+    """
+
+    def load(self, data: Buffer) -> int:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return int(data.replace(b"-", b""), 16)
+
+
+class UUIDIntBinaryLoader(UUIDIntLoader):
+
+    format = Format.BINARY
+
+    def load(self, data: Buffer) -> int:
+        return int.from_bytes(data, "big")
+
+
+class UUIDBytesLoader(Loader):
+    """
+    Load a :sql:`uuid` as the 16 `!bytes` value of the `~uuid.UUID`.
+    """
+
+    def load(self, data: Buffer) -> bytes:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return bytes.fromhex(data.replace(b"-", b"").decode())
+
+
+class UUIDBytesBinaryLoader(UUIDBytesLoader):
+
+    format = Format.BINARY
+
+    def load(self, data: Buffer) -> bytes:
+        return bytes(data)
+
+
 def register_default_adapters(context: AdaptContext) -> None:
     adapters = context.adapters
     adapters.register_dumper("uuid.UUID", UUIDDumper)
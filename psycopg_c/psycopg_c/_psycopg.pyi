@@ -7,7 +7,7 @@ information. Will submit a bug.
 
 # Copyright (C) 2020-2021 The Psycopg Team
 
-from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
 
 from psycopg import pq
 from psycopg import abc
@@ -52,6 +52,39 @@ class Transformer(abc.AdaptContext):
     ) -> Tuple[Any, ...]: ...
     def get_loader(self, oid: int, format: pq.Format) -> abc.Loader: ...
 
+# Loaders
+class CLoader:
+    format: pq.Format
+    def __init__(
+        self, oid: int, context: Optional[abc.AdaptContext] = None
+    ): ...
+    def load(self, data: abc.Buffer) -> Any: ...
+
+class ArrayLoader(CLoader):
+    base_oid: int
+    delimiter: bytes
+
+class ArrayBinaryLoader(CLoader): ...
+
+class CompositeLoader(CLoader):
+    factory: Callable[..., Any]
+    fields_types: List[int]
+
+class CompositeBinaryLoader(CLoader):
+    factory: Callable[..., Any]
+
+class RangeLoader(CLoader):
+    subtype_oid: int
+
+class RangeBinaryLoader(CLoader):
+    subtype_oid: int
+
+class MultirangeLoader(CLoader):
+    subtype_oid: int
+
+class MultirangeBinaryLoader(CLoader):
+    subtype_oid: int
+
 # Generators
 def connect(conninfo: str) -> abc.PQGenConn[PGconn]: ...
 def execute(pgconn: PGconn) -> abc.PQGen[List[PGresult]]: ...
@@ -65,5 +98,11 @@ def format_row_binary(
 ) -> bytearray: ...
 def parse_row_text(data: bytes, tx: abc.Transformer) -> Tuple[Any, ...]: ...
 def parse_row_binary(data: bytes, tx: abc.Transformer) -> Tuple[Any, ...]: ...
+def parse_rows_text(
+    data: Sequence[bytes], tx: abc.Transformer
+) -> List[Tuple[Any, ...]]: ...
+def parse_rows_binary(
+    data: Sequence[bytes], tx: abc.Transformer
+) -> List[Tuple[Any, ...]]: ...
 
 # vim: set syntax=python:
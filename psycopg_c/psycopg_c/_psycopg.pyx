@@ -30,4 +30,9 @@ include "_psycopg/transform.pyx"
 include "types/datetime.pyx"
 include "types/numeric.pyx"
 include "types/bool.pyx"
+include "types/json.pyx"
 include "types/string.pyx"
+include "types/array.pyx"
+include "types/composite.pyx"
+include "types/uuid.pyx"
+include "types/range.pyx"
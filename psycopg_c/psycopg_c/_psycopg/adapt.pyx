@@ -164,3 +164,12 @@ cdef class CLoader:
         cdef Py_ssize_t length
         _buffer_as_string_and_size(data, &ptr, &length)
         return self.cload(ptr, length)
+
+
+cdef class _CRecursiveLoader(CLoader):
+
+    cdef Transformer _tx
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+        self._tx = Transformer(context)
@@ -183,6 +183,22 @@ def format_row_text(
 
 
 def parse_row_binary(data, tx: Transformer) -> Tuple[Any, ...]:
+    cdef list row = _parse_row_binary(data)
+    return tx.load_sequence(row)
+
+
+def parse_rows_binary(data, tx: Transformer) -> List[Tuple[Any, ...]]:
+    cdef Py_ssize_t nrows = len(data)
+    cdef list rv = PyList_New(nrows)
+    cdef Py_ssize_t i
+    for i in range(nrows):
+        record = tx.load_sequence(_parse_row_binary(data[i]))
+        Py_INCREF(record)
+        PyList_SET_ITEM(rv, i, record)
+    return rv
+
+
+cdef list _parse_row_binary(data):
     cdef unsigned char *ptr
     cdef Py_ssize_t bufsize
     _buffer_as_string_and_size(data, <char **>&ptr, &bufsize)
@@ -213,16 +229,31 @@ def parse_row_binary(data, tx: Transformer) -> Tuple[Any, ...]:
         Py_INCREF(field)
         PyList_SET_ITEM(row, col, field)
 
-    return tx.load_sequence(row)
+    return row
 
 
 def parse_row_text(data, tx: Transformer) -> Tuple[Any, ...]:
+    # politely assume that the number of fields will be what in the result
+    cdef list row = _parse_row_text(data, tx._nfields)
+    return tx.load_sequence(row)
+
+
+def parse_rows_text(data, tx: Transformer) -> List[Tuple[Any, ...]]:
+    cdef Py_ssize_t nrows = len(data)
+    cdef list rv = PyList_New(nrows)
+    cdef Py_ssize_t i
+    for i in range(nrows):
+        record = tx.load_sequence(_parse_row_text(data[i], tx._nfields))
+        Py_INCREF(record)
+        PyList_SET_ITEM(rv, i, record)
+    return rv
+
+
+cdef list _parse_row_text(data, int nfields):
     cdef unsigned char *fstart
     cdef Py_ssize_t size
     _buffer_as_string_and_size(data, <char **>&fstart, &size)
 
-    # politely assume that the number of fields will be what in the result
-    cdef int nfields = tx._nfields
     cdef list row = PyList_New(nfields)
 
     cdef unsigned char *fend
@@ -284,8 +315,7 @@ def parse_row_text(data, tx: Transformer) -> Tuple[Any, ...]:
         # Start of the field
         fstart = fend + 1
 
-    # Convert the array of buffers into Python objects
-    return tx.load_sequence(row)
+    return row
 
 
 cdef extern from *:
@@ -24,6 +24,7 @@ cdef enum:
     CIDR_OID = 650
     CIRCLE_OID = 718
     DATE_OID = 1082
+    DATEMULTIRANGE_OID = 4535
     DATERANGE_OID = 3912
     FLOAT4_OID = 700
     FLOAT8_OID = 701
@@ -32,8 +33,10 @@ cdef enum:
     INT2_OID = 21
     INT2VECTOR_OID = 22
     INT4_OID = 23
+    INT4MULTIRANGE_OID = 4451
     INT4RANGE_OID = 3904
     INT8_OID = 20
+    INT8MULTIRANGE_OID = 4536
     INT8RANGE_OID = 3926
     INTERVAL_OID = 1186
     JSON_OID = 114
@@ -46,6 +49,7 @@ cdef enum:
     MONEY_OID = 790
     NAME_OID = 19
     NUMERIC_OID = 1700
+    NUMMULTIRANGE_OID = 4532
     NUMRANGE_OID = 3906
     OID_OID = 26
     OIDVECTOR_OID = 30
@@ -72,8 +76,10 @@ cdef enum:
     TIMESTAMP_OID = 1114
     TIMESTAMPTZ_OID = 1184
     TIMETZ_OID = 1266
+    TSMULTIRANGE_OID = 4533
     TSQUERY_OID = 3615
     TSRANGE_OID = 3908
+    TSTZMULTIRANGE_OID = 4534
     TSTZRANGE_OID = 3910
     TSVECTOR_OID = 3614
     TXID_SNAPSHOT_OID = 2970
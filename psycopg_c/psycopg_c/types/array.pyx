@@ -0,0 +1,245 @@
+"""
+C optimized functions to manipulate arrays
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+from libc.stdint cimport int32_t, uint32_t
+from libc.string cimport memcpy
+from cpython.mem cimport PyMem_Realloc, PyMem_Free
+from cpython.ref cimport Py_INCREF
+from cpython.list cimport PyList_New, PyList_Append, PyList_SET_ITEM
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cpython.object cimport PyObject, PyObject_CallFunctionObjArgs
+
+from psycopg_c._psycopg cimport endian
+
+from psycopg import errors as e
+
+# Maximum number of dimensions of a Postgres array
+DEF MAXDIM = 6
+
+
+cdef class ArrayLoader(_CRecursiveLoader):
+
+    format = PQ_TEXT
+    base_oid = oids.INVALID_OID
+    delimiter = b","
+
+    cdef PyObject *row_loader
+    cdef char cdelim
+
+    # A memory area used to unescape the elements. Keep it here to avoid a
+    # malloc per element.
+    cdef char *scratch
+    cdef size_t sclen
+
+    def __dealloc__(self):
+        PyMem_Free(self.scratch)
+
+    cdef object cload(self, const char *data, size_t length):
+        if self.row_loader == NULL:
+            self.row_loader = self._tx._c_get_loader(
+                <PyObject *>self.base_oid, <PyObject *>PQ_TEXT)
+            self.cdelim = (<bytes>self.delimiter)[0]
+
+        return _array_load_text(
+            data, length, <RowLoader>self.row_loader, self.cdelim,
+            &(self.scratch), &(self.sclen))
+
+
+cdef object _array_load_text(
+    const char *buf, size_t length, RowLoader row_loader, char cdelim,
+    char **scratch, size_t *sclen
+):
+    if length == 0:
+        raise e.DataError("malformed array: empty data")
+
+    cdef const char *end = buf + length
+    cdef list stack = []
+    cdef list a
+    rv = None
+
+    while buf < end:
+        if buf[0] == b'{':
+            a = []
+            if rv is None:
+                rv = a
+            if stack:
+                PyList_Append(stack[-1], a)
+            PyList_Append(stack, a)
+            buf += 1
+
+        elif buf[0] == b'}':
+            if not stack:
+                raise e.DataError("malformed array, unexpected '}'")
+            rv = stack.pop()
+            buf += 1
+
+        elif buf[0] == cdelim:
+            buf += 1
+
+        else:
+            if not stack:
+                raise e.DataError(
+                    f"malformed array, unexpected"
+                    f" '{chr(<unsigned char>buf[0])}'")
+            v = _parse_token(&buf, end, cdelim, scratch, sclen, row_loader)
+            PyList_Append(stack[-1], v)
+
+    if rv is None:
+        raise e.DataError("malformed array: no value parsed")
+    return rv
+
+
+cdef object _parse_token(
+    const char **bufptr, const char *bufend, char cdelim,
+    char **scratch, size_t *sclen, RowLoader row_loader
+):
+    cdef const char *start = bufptr[0]
+    cdef int has_quotes = start[0] == b'"'
+    cdef int quoted = has_quotes
+    cdef int num_escapes = 0
+    cdef int escaped = 0
+
+    if has_quotes:
+        start += 1
+    cdef const char *end = start
+
+    while end < bufend:
+        if (end[0] == cdelim or end[0] == b'}') and not quoted:
+            break
+        elif end[0] == b'\\' and not escaped:
+            num_escapes += 1
+            escaped = 1
+            end += 1
+            continue
+        elif end[0] == b'"' and not escaped:
+            quoted = 0
+        escaped = 0
+        end += 1
+    else:
+        raise e.DataError("malformed array: hit the end of the buffer")
+
+    # Return the new position for the buffer
+    bufptr[0] = end
+    if has_quotes:
+        end -= 1
+
+    cdef Py_ssize_t length = end - start
+    if (
+        length == 4 and not has_quotes
+        and start[0] == b'N' and start[1] == b'U'
+        and start[2] == b'L' and start[3] == b'L'
+    ):
+        return None
+
+    cdef const char *src
+    cdef char *tgt
+    cdef char *newbuf
+    cdef size_t unesclen
+
+    if num_escapes:
+        unesclen = length - num_escapes + 1
+        if unesclen > sclen[0]:
+            newbuf = <char *>PyMem_Realloc(scratch[0], unesclen)
+            if newbuf == NULL:
+                raise MemoryError()
+            scratch[0] = newbuf
+            sclen[0] = unesclen
+
+        src = start
+        tgt = scratch[0]
+        while src < end:
+            if src[0] == b'\\':
+                src += 1
+            tgt[0] = src[0]
+            src += 1
+            tgt += 1
+
+        tgt[0] = b'\x00'
+        start = scratch[0]
+        length -= num_escapes
+
+    return _load_item(row_loader, start, length)
+
+
+cdef object _load_item(RowLoader row_loader, const char *data, Py_ssize_t length):
+    if row_loader.cloader is not None:
+        return row_loader.cloader.cload(data, length)
+
+    b = PyBytes_FromStringAndSize(data, length)
+    return PyObject_CallFunctionObjArgs(row_loader.loadfunc, <PyObject *>b, NULL)
+
+
+cdef class ArrayBinaryLoader(_CRecursiveLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef const char *end = data + length
+        cdef uint32_t buf[3]
+        if length < sizeof(buf):
+            raise e.DataError("malformed array: not enough data")
+
+        memcpy(buf, data, sizeof(buf))
+        cdef int ndims = endian.be32toh(buf[0])
+        if not ndims:
+            return []
+        if ndims > MAXDIM:
+            raise e.DataError(
+                f"unexpected number of dimensions {ndims} exceeding {MAXDIM}")
+
+        cdef object oid = endian.be32toh(buf[2])
+        cdef PyObject *row_loader = self._tx._c_get_loader(
+            <PyObject *>oid, <PyObject *>PQ_BINARY)
+
+        cdef Py_ssize_t dims[MAXDIM]
+        cdef int i
+        data += sizeof(buf)
+        if data + 8 * ndims > end:
+            raise e.DataError("malformed array: not enough data")
+        for i in range(ndims):
+            # Every dimension is followed by its lower bound: skip it
+            memcpy(buf, data, sizeof(uint32_t))
+            dims[i] = endian.be32toh(buf[0])
+            data += 2 * sizeof(uint32_t)
+
+        return _array_load_binary_rec(
+            ndims, dims, &data, end, <RowLoader>row_loader)
+
+
+cdef object _array_load_binary_rec(
+    Py_ssize_t ndims, Py_ssize_t *dims, const char **bufptr,
+    const char *bufend, RowLoader row_loader
+):
+    cdef const char *buf = bufptr[0]
+    cdef Py_ssize_t nelems = dims[0]
+    cdef list out = PyList_New(nelems)
+    cdef Py_ssize_t i
+    cdef int32_t besize
+    cdef Py_ssize_t size
+
+    for i in range(nelems):
+        if ndims == 1:
+            if buf + sizeof(besize) > bufend:
+                raise e.DataError("malformed array: not enough data")
+            memcpy(&besize, buf, sizeof(besize))
+            buf += sizeof(besize)
+            if besize == -1:
+                val = None
+            else:
+                size = <int32_t>endian.be32toh(besize)
+                if buf + size > bufend:
+                    raise e.DataError("malformed array: not enough data")
+                val = _load_item(row_loader, buf, size)
+                buf += size
+        else:
+            val = _array_load_binary_rec(
+                ndims - 1, dims + 1, &buf, bufend, row_loader)
+
+        Py_INCREF(val)
+        PyList_SET_ITEM(out, i, val)
+
+    bufptr[0] = buf
+    return out
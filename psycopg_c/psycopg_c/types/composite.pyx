@@ -0,0 +1,297 @@
+"""
+Cython adapters for composite types.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+from libc.stdint cimport int32_t, uint32_t
+from libc.string cimport memcpy
+from cpython.mem cimport PyMem_Realloc, PyMem_Free
+from cpython.ref cimport Py_INCREF
+from cpython.list cimport PyList_Append, PyList_AsTuple, PyList_GET_SIZE
+from cpython.tuple cimport PyTuple_New, PyTuple_SET_ITEM
+from cpython.object cimport PyObject
+
+from psycopg_c._psycopg cimport endian
+
+from psycopg import errors as e
+
+cdef object _tuple_new = tuple.__new__
+cdef object _text_oid = oids.TEXT_OID
+cdef object _invalid_oid = oids.INVALID_OID
+
+
+cdef class _BaseRecordLoader(_CRecursiveLoader):
+
+    # A memory area used to unescape the fields. Keep it here to avoid a
+    # malloc per field.
+    cdef char *scratch
+    cdef size_t sclen
+
+    def __dealloc__(self):
+        PyMem_Free(self.scratch)
+
+    cdef object _load_text(self, const char *data, size_t length, list loaders):
+        """
+        Parse the text representation of a record and load its fields.
+
+        Load every field using *loaders* items, or the text loader if `!None`.
+        """
+        if length < 2 or data[0] != b'(' or data[length - 1] != b')':
+            raise e.DataError("malformed record: missing parentheses")
+
+        cdef list rv = []
+        if length == 2:
+            return rv
+
+        cdef const char *buf = data + 1
+        cdef const char *end = data + length - 1
+        cdef RowLoader row_loader
+        cdef Py_ssize_t i = 0
+        cdef Py_ssize_t nloaders = -1
+        if loaders is not None:
+            nloaders = PyList_GET_SIZE(loaders)
+        else:
+            row_loader = <RowLoader>self._tx._c_get_loader(
+                <PyObject *>_text_oid, <PyObject *>PQ_TEXT)
+
+        while True:
+            if loaders is not None:
+                if i >= nloaders:
+                    raise e.DataError(
+                        f"malformed record: more than {nloaders} fields")
+                row_loader = loaders[i]
+
+            if buf >= end or buf[0] == b',':
+                PyList_Append(rv, None)
+            else:
+                PyList_Append(rv, self._parse_field(&buf, end, row_loader))
+
+            i += 1
+            if buf >= end:
+                break
+            # Skip the comma. If it was the last char, a NULL follows.
+            buf += 1
+            if buf >= end:
+                if loaders is not None and i >= nloaders:
+                    raise e.DataError(
+                        f"malformed record: more than {nloaders} fields")
+                PyList_Append(rv, None)
+                break
+
+        return rv
+
+    cdef object _parse_field(
+        self, const char **bufptr, const char *end, RowLoader row_loader
+    ):
+        cdef const char *start = bufptr[0]
+        cdef const char *buf = start
+        cdef int quoted = 0
+        cdef int plain = 1
+
+        # Find the end of the field and check if it can be used as it is
+        while buf < end:
+            if buf[0] == b'"':
+                plain = 0
+                if quoted and buf + 1 < end and buf[1] == b'"':
+                    buf += 1
+                else:
+                    quoted = not quoted
+            elif buf[0] == b'\\':
+                plain = 0
+                buf += 1
+            elif buf[0] == b',' and not quoted:
+                break
+            buf += 1
+
+        if quoted:
+            raise e.DataError("malformed record: unterminated quoted string")
+        if buf > end:
+            raise e.DataError("malformed record: hit the end of the buffer")
+        bufptr[0] = buf
+
+        if plain:
+            return _load_item(row_loader, start, buf - start)
+
+        # Unquote the field into the scratch buffer. Terminate it as the
+        # values returned by libpq, as some loaders rely on it.
+        cdef size_t size = buf - start + 1
+        cdef char *newbuf
+        if size > self.sclen:
+            newbuf = <char *>PyMem_Realloc(self.scratch, size)
+            if newbuf == NULL:
+                raise MemoryError()
+            self.scratch = newbuf
+            self.sclen = size
+
+        cdef char *tgt = self.scratch
+        end = buf
+        buf = start
+        quoted = 0
+        while buf < end:
+            if buf[0] == b'"':
+                if quoted and buf + 1 < end and buf[1] == b'"':
+                    buf += 1
+                    tgt[0] = b'"'
+                    tgt += 1
+                else:
+                    quoted = not quoted
+            elif buf[0] == b'\\':
+                buf += 1
+                tgt[0] = buf[0]
+                tgt += 1
+            else:
+                tgt[0] = buf[0]
+                tgt += 1
+            buf += 1
+
+        tgt[0] = b'\x00'
+        return _load_item(row_loader, self.scratch, tgt - self.scratch)
+
+
+cdef class RecordLoader(_BaseRecordLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        return PyList_AsTuple(self._load_text(data, length, None))
+
+
+cdef class RecordBinaryLoader(_CRecursiveLoader):
+
+    format = PQ_BINARY
+
+    # The oids and the loaders of the fields found in the previous records
+    cdef list _oids
+    cdef list _row_loaders
+
+    def __cinit__(self):
+        self._oids = []
+        self._row_loaders = []
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef const char *end = data + length
+        cdef uint32_t buf[2]
+        if length < sizeof(uint32_t):
+            raise e.DataError("malformed record: not enough data")
+
+        memcpy(buf, data, sizeof(uint32_t))
+        data += sizeof(uint32_t)
+        cdef Py_ssize_t nfields = <int32_t>endian.be32toh(buf[0])
+
+        cdef tuple rv = PyTuple_New(nfields)
+        cdef Py_ssize_t i
+        cdef uint32_t oid
+        cdef int32_t size
+        cdef object row_loader
+
+        for i in range(nfields):
+            if data + sizeof(buf) > end:
+                raise e.DataError("malformed record: not enough data")
+            memcpy(buf, data, sizeof(buf))
+            data += sizeof(buf)
+            oid = endian.be32toh(buf[0])
+            size = <int32_t>endian.be32toh(buf[1])
+
+            if size == -1:
+                val = None
+            else:
+                if data + size > end:
+                    raise e.DataError("malformed record: not enough data")
+                row_loader = self._get_row_loader(i, oid)
+                val = _load_item(<RowLoader>row_loader, data, size)
+                data += size
+
+            Py_INCREF(val)
+            PyTuple_SET_ITEM(rv, i, val)
+
+        return rv
+
+    cdef object _get_row_loader(self, Py_ssize_t i, uint32_t oid):
+        # Fast path: same type of the same field in the previous record
+        if i < PyList_GET_SIZE(self._oids) and <uint32_t>self._oids[i] == oid:
+            return self._row_loaders[i]
+
+        cdef object pyoid = oid
+        row_loader = <object>self._tx._c_get_loader(
+            <PyObject *>pyoid, <PyObject *>PQ_BINARY)
+        if i < PyList_GET_SIZE(self._oids):
+            self._oids[i] = pyoid
+            self._row_loaders[i] = row_loader
+        else:
+            # Fields not seen yet, because null so far: pad with an oid that
+            # will never match
+            while PyList_GET_SIZE(self._oids) < i:
+                PyList_Append(self._oids, _invalid_oid)
+                PyList_Append(self._row_loaders, None)
+            PyList_Append(self._oids, pyoid)
+            PyList_Append(self._row_loaders, row_loader)
+        return row_loader
+
+
+cdef int _is_namedtuple(factory):
+    """
+    Return True if *factory* is a namedtuple class, not further subclassed.
+
+    Such classes can be instantiated from a tuple using `!tuple.__new__()`,
+    without going through their `!__new__()` implemented in Python.
+    """
+    return (
+        isinstance(factory, type)
+        and issubclass(factory, tuple)
+        and "_fields" in factory.__dict__
+        and "__new__" in factory.__dict__
+    )
+
+
+cdef class CompositeLoader(_BaseRecordLoader):
+
+    format = PQ_TEXT
+
+    cdef object _factory
+    cdef int _fast_factory
+    cdef list _row_loaders
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+        self._factory = type(self).factory
+        self._fast_factory = _is_namedtuple(self._factory)
+
+    cdef object cload(self, const char *data, size_t length):
+        if self._row_loaders is None:
+            self._row_loaders = [
+                <object>self._tx._c_get_loader(
+                    <PyObject *>oid, <PyObject *>PQ_TEXT)
+                for oid in type(self).fields_types
+            ]
+
+        cdef list fields = self._load_text(data, length, self._row_loaders)
+        if not fields:
+            return self._factory()
+
+        cdef tuple values = PyList_AsTuple(fields)
+        if self._fast_factory and len(values) == len(self._row_loaders):
+            return _tuple_new(self._factory, values)
+        return self._factory(*values)
+
+
+cdef class CompositeBinaryLoader(RecordBinaryLoader):
+
+    format = PQ_BINARY
+
+    cdef object _factory
+    cdef int _fast_factory
+    cdef Py_ssize_t _nfields
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+        self._factory = type(self).factory
+        self._fast_factory = _is_namedtuple(self._factory)
+        if self._fast_factory:
+            self._nfields = len(self._factory._fields)
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef tuple values = RecordBinaryLoader.cload(self, data, length)
+        if self._fast_factory and len(values) == self._nfields:
+            return _tuple_new(self._factory, values)
+        return self._factory(*values)
@@ -0,0 +1,85 @@
+"""
+Cython adapters for json types.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+from cpython.buffer cimport PyBUF_READ
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cpython.memoryview cimport PyMemoryView_FromMemory
+from cpython.object cimport PyObject, PyObject_CallFunctionObjArgs
+
+from psycopg import errors as e
+
+# The Python module, imported on first use to avoid an import loop.
+cdef object _py_json = None
+
+
+cdef class _JsonLoader(CLoader):
+
+    cdef object loads
+    cdef int zero_copy
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+
+        global _py_json
+        if _py_json is None:
+            from psycopg.types import json as _py_json
+
+        # Pick the loads function once: set_json_loads() may have changed it.
+        self.loads = _py_json._JsonLoader._loads
+        self.zero_copy = _py_json.accepts_memoryview(self.loads)
+
+    cdef object _cload_json(self, const char *data, size_t length):
+        cdef object b
+        if not self.zero_copy:
+            b = PyBytes_FromStringAndSize(data, length)
+            return PyObject_CallFunctionObjArgs(
+                self.loads, <PyObject *>b, NULL)
+
+        # Expose the data to the function without copying it. The view must
+        # not survive the call, as the buffer is not guaranteed to stay valid.
+        b = PyMemoryView_FromMemory(<char *>data, length, PyBUF_READ)
+        try:
+            return PyObject_CallFunctionObjArgs(
+                self.loads, <PyObject *>b, NULL)
+        finally:
+            b.release()
+
+
+cdef class JsonLoader(_JsonLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        return self._cload_json(data, length)
+
+
+cdef class JsonbLoader(_JsonLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        return self._cload_json(data, length)
+
+
+cdef class JsonBinaryLoader(_JsonLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        return self._cload_json(data, length)
+
+
+cdef class JsonbBinaryLoader(_JsonLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        if length and data[0] != 1:
+            raise e.DataError(f"unknown jsonb binary format: {data[0]}")
+        if length:
+            data += 1
+            length -= 1
+        return self._cload_json(data, length)
@@ -0,0 +1,314 @@
+"""
+Cython adapters for range and multirange types.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+from libc.stdint cimport int32_t, uint32_t
+from libc.string cimport memcpy, memcmp
+from cpython.object cimport PyObject
+
+from psycopg_c._psycopg cimport endian
+
+from psycopg import errors as e
+
+# Flags of the binary representation of the ranges
+DEF RANGE_EMPTY = 0x01
+DEF RANGE_LB_INC = 0x02
+DEF RANGE_UB_INC = 0x04
+DEF RANGE_LB_INF = 0x08
+DEF RANGE_UB_INF = 0x10
+
+# The Python classes to return, imported on first use to avoid an import loop.
+cdef object _Range = None
+cdef object _Multirange = None
+
+# The bounds of a range, indexed by lower_inc * 2 + upper_inc
+cdef tuple _bounds = ("()", "(]", "[)", "[]")
+
+
+cdef int _import_range() except -1:
+    global _Range, _Multirange
+    from psycopg.types.range import Range as _Range
+    from psycopg.types.multirange import Multirange as _Multirange
+    return 0
+
+
+cdef object _new_range(lower, upper, int lower_inc, int upper_inc):
+    # Create the object without going through Range.__init__(), which
+    # validates the bounds in Python.
+    cdef object rv = _object_new(_Range)
+    rv._lower = lower
+    rv._upper = upper
+    rv._bounds = _bounds[lower_inc * 2 + upper_inc]
+    return rv
+
+
+cdef object _new_empty_range():
+    cdef object rv = _object_new(_Range)
+    rv._lower = rv._upper = None
+    rv._bounds = ""
+    return rv
+
+
+cdef object _new_multirange(list ranges):
+    cdef object rv = _object_new(_Multirange)
+    rv._ranges = ranges
+    return rv
+
+
+cdef class _BaseRangeLoader(_BaseRecordLoader):
+
+    subtype_oid = oids.INVALID_OID
+
+    cdef RowLoader _row_loader
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+        if _Range is None:
+            _import_range()
+
+        cdef object suboid = self.subtype_oid
+        cdef object fmt = self.format
+        self._row_loader = <RowLoader>self._tx._c_get_loader(
+            <PyObject *>suboid, <PyObject *>fmt)
+
+    cdef object _parse_range_text(self, const char **bufptr, const char *end):
+        """
+        Parse the range at *bufptr*, moving the pointer after its end.
+        """
+        cdef const char *buf = bufptr[0]
+        if end - buf >= 5 and memcmp(buf, b"empty", 5) == 0:
+            bufptr[0] = buf + 5
+            return _new_empty_range()
+
+        if buf >= end or (buf[0] != b'[' and buf[0] != b'('):
+            raise e.DataError("malformed range: missing opening bracket")
+        cdef int lower_inc = buf[0] == b'['
+        buf += 1
+
+        cdef const char *close = _find_range_end(buf, end)
+        if close == NULL:
+            raise e.DataError("malformed range: missing closing bracket")
+        cdef int upper_inc = close[0] == b']'
+
+        lower = None
+        if buf < close and buf[0] != b',':
+            lower = self._parse_field(&buf, close, self._row_loader)
+        if buf >= close or buf[0] != b',':
+            raise e.DataError("malformed range: missing comma")
+        buf += 1
+
+        upper = None
+        if buf < close:
+            upper = self._parse_field(&buf, close, self._row_loader)
+            if buf != close:
+                raise e.DataError("malformed range: unexpected comma")
+
+        bufptr[0] = close + 1
+        return _new_range(lower, upper, lower_inc, upper_inc)
+
+    cdef object _parse_range_binary(self, const char *data, size_t length):
+        if length < 1:
+            raise e.DataError("malformed range: no data")
+
+        cdef char head = data[0]
+        if head & RANGE_EMPTY:
+            return _new_empty_range()
+
+        cdef const char *end = data + length
+        data += 1
+
+        lower = None
+        if not head & RANGE_LB_INF:
+            lower = self._load_bound(&data, end)
+        upper = None
+        if not head & RANGE_UB_INF:
+            upper = self._load_bound(&data, end)
+
+        return _new_range(
+            lower, upper,
+            (head & RANGE_LB_INC) != 0, (head & RANGE_UB_INC) != 0)
+
+    cdef object _load_bound(self, const char **bufptr, const char *end):
+        cdef const char *buf = bufptr[0]
+        cdef uint32_t besize
+        if buf + sizeof(besize) > end:
+            raise e.DataError("malformed range: not enough data")
+        memcpy(&besize, buf, sizeof(besize))
+        buf += sizeof(besize)
+        cdef Py_ssize_t size = <int32_t>endian.be32toh(besize)
+        if size < 0 or buf + size > end:
+            raise e.DataError("malformed range: not enough data")
+
+        bufptr[0] = buf + size
+        return _load_item(self._row_loader, buf, size)
+
+
+cdef const char *_find_range_end(const char *buf, const char *end):
+    """
+    Return the pointer to the closing bracket of a range, NULL if not found.
+    """
+    cdef int quoted = 0
+    while buf < end:
+        if buf[0] == b'"':
+            quoted = not quoted
+        elif buf[0] == b'\\':
+            buf += 1
+        elif (buf[0] == b']' or buf[0] == b')') and not quoted:
+            return buf
+        buf += 1
+
+    return NULL
+
+
+cdef class RangeLoader(_BaseRangeLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef const char *end = data + length
+        rv = self._parse_range_text(&data, end)
+        if data != end:
+            raise e.DataError("malformed range: data after closing bracket")
+        return rv
+
+
+cdef class RangeBinaryLoader(_BaseRangeLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        return self._parse_range_binary(data, length)
+
+
+cdef class MultirangeLoader(_BaseRangeLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        if length < 2 or data[0] != b'{' or data[length - 1] != b'}':
+            raise e.DataError("malformed multirange: missing braces")
+
+        cdef list ranges = []
+        cdef const char *buf = data + 1
+        cdef const char *end = data + length - 1
+        while buf < end:
+            ranges.append(self._parse_range_text(&buf, end))
+            if buf < end:
+                if buf[0] != b',':
+                    raise e.DataError("malformed multirange: missing comma")
+                buf += 1
+                if buf >= end:
+                    raise e.DataError("malformed multirange: trailing comma")
+
+        return _new_multirange(ranges)
+
+
+cdef class MultirangeBinaryLoader(_BaseRangeLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef const char *end = data + length
+        cdef uint32_t beval
+        if length < sizeof(beval):
+            raise e.DataError("malformed multirange: not enough data")
+        memcpy(&beval, data, sizeof(beval))
+        data += sizeof(beval)
+        cdef Py_ssize_t nelems = <int32_t>endian.be32toh(beval)
+
+        cdef list ranges = []
+        cdef Py_ssize_t i, size
+        for i in range(nelems):
+            if data + sizeof(beval) > end:
+                raise e.DataError("malformed multirange: not enough data")
+            memcpy(&beval, data, sizeof(beval))
+            data += sizeof(beval)
+            size = <int32_t>endian.be32toh(beval)
+            if size < 0 or data + size > end:
+                raise e.DataError("malformed multirange: not enough data")
+            ranges.append(self._parse_range_binary(data, size))
+            data += size
+
+        if data != end:
+            raise e.DataError("unexpected trailing data in multirange")
+        return _new_multirange(ranges)
+
+
+# Loaders for builtin range types
+
+cdef class Int4RangeLoader(RangeLoader):
+    subtype_oid = oids.INT4_OID
+
+cdef class Int8RangeLoader(RangeLoader):
+    subtype_oid = oids.INT8_OID
+
+cdef class NumericRangeLoader(RangeLoader):
+    subtype_oid = oids.NUMERIC_OID
+
+cdef class DateRangeLoader(RangeLoader):
+    subtype_oid = oids.DATE_OID
+
+cdef class TimestampRangeLoader(RangeLoader):
+    subtype_oid = oids.TIMESTAMP_OID
+
+cdef class TimestampTZRangeLoader(RangeLoader):
+    subtype_oid = oids.TIMESTAMPTZ_OID
+
+cdef class Int4RangeBinaryLoader(RangeBinaryLoader):
+    subtype_oid = oids.INT4_OID
+
+cdef class Int8RangeBinaryLoader(RangeBinaryLoader):
+    subtype_oid = oids.INT8_OID
+
+cdef class NumericRangeBinaryLoader(RangeBinaryLoader):
+    subtype_oid = oids.NUMERIC_OID
+
+cdef class DateRangeBinaryLoader(RangeBinaryLoader):
+    subtype_oid = oids.DATE_OID
+
+cdef class TimestampRangeBinaryLoader(RangeBinaryLoader):
+    subtype_oid = oids.TIMESTAMP_OID
+
+cdef class TimestampTZRangeBinaryLoader(RangeBinaryLoader):
+    subtype_oid = oids.TIMESTAMPTZ_OID
+
+
+# Loaders for builtin multirange types
+
+cdef class Int4MultirangeLoader(MultirangeLoader):
+    subtype_oid = oids.INT4_OID
+
+cdef class Int8MultirangeLoader(MultirangeLoader):
+    subtype_oid = oids.INT8_OID
+
+cdef class NumericMultirangeLoader(MultirangeLoader):
+    subtype_oid = oids.NUMERIC_OID
+
+cdef class DateMultirangeLoader(MultirangeLoader):
+    subtype_oid = oids.DATE_OID
+
+cdef class TimestampMultirangeLoader(MultirangeLoader):
+    subtype_oid = oids.TIMESTAMP_OID
+
+cdef class TimestampTZMultirangeLoader(MultirangeLoader):
+    subtype_oid = oids.TIMESTAMPTZ_OID
+
+cdef class Int4MultirangeBinaryLoader(MultirangeBinaryLoader):
+    subtype_oid = oids.INT4_OID
+
+cdef class Int8MultirangeBinaryLoader(MultirangeBinaryLoader):
+    subtype_oid = oids.INT8_OID
+
+cdef class NumericMultirangeBinaryLoader(MultirangeBinaryLoader):
+    subtype_oid = oids.NUMERIC_OID
+
+cdef class DateMultirangeBinaryLoader(MultirangeBinaryLoader):
+    subtype_oid = oids.DATE_OID
+
+cdef class TimestampMultirangeBinaryLoader(MultirangeBinaryLoader):
+    subtype_oid = oids.TIMESTAMP_OID
+
+cdef class TimestampTZMultirangeBinaryLoader(MultirangeBinaryLoader):
+    subtype_oid = oids.TIMESTAMPTZ_OID
@@ -6,8 +6,18 @@ Cython adapters for textual types.
 
 cimport cython
 
-from libc.string cimport memcpy, memchr
-from cpython.bytes cimport PyBytes_AsString, PyBytes_AsStringAndSize
+from libc.stdint cimport uint64_t
+from libc.string cimport memcpy, memchr, memcmp, memset
+from cpython.mem cimport PyMem_Malloc, PyMem_Free
+from cpython.ref cimport Py_INCREF, Py_XDECREF
+from cpython.object cimport PyObject
+from cpython.bytes cimport (
+    PyBytes_AsString,
+    PyBytes_AsStringAndSize,
+    PyBytes_AS_STRING,
+    PyBytes_FromStringAndSize,
+    PyBytes_GET_SIZE,
+)
 from cpython.unicode cimport (
     PyUnicode_AsEncodedString,
     PyUnicode_AsUTF8String,
@@ -151,6 +161,91 @@ cdef class TextBinaryLoader(_TextLoader):
     format = PQ_BINARY
 
 
+cdef class _InternedTextLoader(_TextLoader):
+
+    max_size = 1024
+
+    # Hash table of the values loaded, indexed by the hash of the data, with
+    # linear probing. As in the Python implementation, the first max_size
+    # distinct values are cached, further ones are not: the table is never
+    # more than half full, so the lookups are short.
+    cdef PyObject **_keys
+    cdef PyObject **_values
+    cdef size_t _mask
+    cdef Py_ssize_t _nvalues
+    cdef Py_ssize_t _max_size
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+
+        self._max_size = self.max_size
+        cdef size_t size = 1
+        while size < 2 * self._max_size:
+            size <<= 1
+
+        self._keys = <PyObject **>PyMem_Malloc(2 * size * sizeof(PyObject *))
+        if self._keys == NULL:
+            raise MemoryError("couldn't allocate the interned values table")
+        memset(self._keys, 0, 2 * size * sizeof(PyObject *))
+        self._values = self._keys + size
+        self._mask = size - 1
+
+    def __dealloc__(self):
+        cdef size_t i
+        if self._keys == NULL:
+            return
+        for i in range(2 * (self._mask + 1)):
+            Py_XDECREF(self._keys[i])
+        PyMem_Free(self._keys)
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef size_t i = _hash_data(data, length) & self._mask
+        cdef PyObject *key
+        while True:
+            key = self._keys[i]
+            if key == NULL:
+                break
+            if (
+                <size_t>PyBytes_GET_SIZE(<object>key) == length
+                and memcmp(PyBytes_AS_STRING(<object>key), data, length) == 0
+            ):
+                return <object>self._values[i]
+            i = (i + 1) & self._mask
+
+        cdef object rv = _TextLoader.cload(self, data, length)
+        if self._nvalues >= self._max_size:
+            return rv
+
+        # Store the value in the empty slot found
+        cdef object newkey = PyBytes_FromStringAndSize(data, length)
+        Py_INCREF(newkey)
+        Py_INCREF(rv)
+        self._keys[i] = <PyObject *>newkey
+        self._values[i] = <PyObject *>rv
+        self._nvalues += 1
+        return rv
+
+
+cdef class InternedTextLoader(_InternedTextLoader):
+
+    format = PQ_TEXT
+
+
+cdef class InternedTextBinaryLoader(_InternedTextLoader):
+
+    format = PQ_BINARY
+
+
+cdef inline uint64_t _hash_data(const char *data, size_t length):
+    # FNV-1a hash
+    cdef uint64_t rv = 0xcbf29ce484222325ULL
+    cdef size_t i
+    for i in range(length):
+        rv ^= <unsigned char>data[i]
+        rv *= 0x100000001b3ULL
+    return rv
+
+
 @cython.final
 cdef class BytesDumper(CDumper):
 
@@ -0,0 +1,201 @@
+"""
+Cython adapters for the UUID type.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+cimport cython
+
+from libc.stdint cimport uint64_t
+from libc.string cimport memcpy
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cpython.long cimport PyLong_AsUnsignedLongLong
+from cpython.long cimport PyLong_AsUnsignedLongLongMask
+from cpython.object cimport PyObject_GenericSetAttr
+
+from psycopg_c._psycopg cimport endian
+
+from psycopg import errors as e
+
+cdef extern from "Python.h":
+    object _PyLong_FromByteArray(
+        const unsigned char *bytes, size_t n, int little_endian, int is_signed)
+
+# Importing the uuid module is slow, so import it only on request.
+cdef object _UUID = None
+cdef object _SafeUUID_unknown = None
+cdef object _object_new = object.__new__
+
+cdef char *_hexdigits = b"0123456789abcdef"
+
+
+cdef void _import_uuid():
+    global _UUID, _SafeUUID_unknown
+    import uuid
+
+    _UUID = uuid.UUID
+    # SafeUUID is only available from Python 3.7
+    safe = getattr(uuid, "SafeUUID", None)
+    if safe is not None:
+        _SafeUUID_unknown = safe.unknown
+
+
+cdef int _uuid_as_bytes(obj, unsigned char *out) except -1:
+    cdef object value = obj.int
+    cdef uint64_t buf[2]
+    buf[0] = endian.htobe64(PyLong_AsUnsignedLongLong(value >> 64))
+    buf[1] = endian.htobe64(PyLong_AsUnsignedLongLongMask(value))
+    memcpy(out, buf, 16)
+    return 0
+
+
+cdef int _parse_hex(
+    const char *data, size_t length, unsigned char *out
+) except -1:
+    cdef int ndigits = 0
+    cdef int val
+    cdef char c
+    cdef size_t i
+
+    for i in range(length):
+        c = data[i]
+        if b'0' <= c <= b'9':
+            val = c - c'0'
+        elif b'a' <= c <= b'f':
+            val = c - c'a' + 10
+        elif b'A' <= c <= b'F':
+            val = c - c'A' + 10
+        elif c == b'-':
+            continue
+        else:
+            break
+
+        if ndigits >= 32:
+            break
+        if ndigits & 1:
+            out[ndigits >> 1] |= val
+        else:
+            out[ndigits >> 1] = val << 4
+        ndigits += 1
+
+    else:
+        if ndigits == 32:
+            return 0
+
+    raise e.DataError(
+        f"bad uuid representation: {data[:length].decode('utf8', 'replace')!r}"
+    )
+
+
+cdef object _uuid_from_bytes(const unsigned char *data):
+    cdef object value = _PyLong_FromByteArray(data, 16, 0, 0)
+
+    # Create the object without going through UUID.__init__(), which parses
+    # and validates its input in Python. UUID objects are immutable, so their
+    # attributes can only be set bypassing UUID.__setattr__().
+    cdef object rv = _object_new(_UUID)
+    PyObject_GenericSetAttr(rv, "int", value)
+    if _SafeUUID_unknown is not None:
+        PyObject_GenericSetAttr(rv, "is_safe", _SafeUUID_unknown)
+    return rv
+
+
+@cython.final
+cdef class UUIDDumper(CDumper):
+
+    format = PQ_TEXT
+    oid = oids.UUID_OID
+
+    cdef Py_ssize_t cdump(self, obj, bytearray rv, Py_ssize_t offset) except -1:
+        cdef unsigned char data[16]
+        _uuid_as_bytes(obj, data)
+
+        cdef char *buf = CDumper.ensure_size(rv, offset, 32)
+        cdef int i
+        for i in range(16):
+            buf[2 * i] = _hexdigits[data[i] >> 4]
+            buf[2 * i + 1] = _hexdigits[data[i] & 0x0F]
+        return 32
+
+
+@cython.final
+cdef class UUIDBinaryDumper(CDumper):
+
+    format = PQ_BINARY
+    oid = oids.UUID_OID
+
+    cdef Py_ssize_t cdump(self, obj, bytearray rv, Py_ssize_t offset) except -1:
+        cdef char *buf = CDumper.ensure_size(rv, offset, 16)
+        _uuid_as_bytes(obj, <unsigned char *>buf)
+        return 16
+
+
+cdef class _UUIDLoader(CLoader):
+
+    def __init__(self, oid: int, context: Optional[AdaptContext] = None):
+        super().__init__(oid, context)
+        if _UUID is None:
+            _import_uuid()
+
+
+@cython.final
+cdef class UUIDLoader(_UUIDLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef unsigned char buf[16]
+        _parse_hex(data, length, buf)
+        return _uuid_from_bytes(buf)
+
+
+@cython.final
+cdef class UUIDBinaryLoader(_UUIDLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        if length != 16:
+            raise e.DataError(f"bad uuid binary length: {length}")
+        return _uuid_from_bytes(<const unsigned char *>data)
+
+
+@cython.final
+cdef class UUIDIntLoader(CLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef unsigned char buf[16]
+        _parse_hex(data, length, buf)
+        return _PyLong_FromByteArray(buf, 16, 0, 0)
+
+
+@cython.final
+cdef class UUIDIntBinaryLoader(CLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        return _PyLong_FromByteArray(
+            <const unsigned char *>data, length, 0, 0)
+
+
+@cython.final
+cdef class UUIDBytesLoader(CLoader):
+
+    format = PQ_TEXT
+
+    cdef object cload(self, const char *data, size_t length):
+        cdef unsigned char buf[16]
+        _parse_hex(data, length, buf)
+        return PyBytes_FromStringAndSize(<char *>buf, 16)
+
+
+@cython.final
+cdef class UUIDBytesBinaryLoader(CLoader):
+
+    format = PQ_BINARY
+
+    cdef object cload(self, const char *data, size_t length):
+        return PyBytes_FromStringAndSize(data, length)
@@ -4,15 +4,27 @@ psycopg connection pool package
 
 # Copyright (C) 2021 The Psycopg Team
 
+from .base import Histogram
 from .pool import ConnectionPool
 from .pool_async import AsyncConnectionPool
+from .multihost import MultiHostPool
+from .multihost_async import AsyncMultiHostPool
+from .sharded import ShardedPool
+from .sharded_async import AsyncShardedPool
+from .warmup import Warmup
 from .errors import PoolClosed, PoolTimeout, TooManyRequests
 from .version import __version__  # noqa: F401
 
 __all__ = [
     "AsyncConnectionPool",
+    "AsyncMultiHostPool",
+    "AsyncShardedPool",
     "ConnectionPool",
+    "Histogram",
+    "MultiHostPool",
     "PoolClosed",
     "PoolTimeout",
+    "ShardedPool",
     "TooManyRequests",
+    "Warmup",
 ]
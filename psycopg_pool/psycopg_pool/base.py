@@ -4,15 +4,118 @@ psycopg connection pool base class and functionalities.
 
 # Copyright (C) 2021 The Psycopg Team
 
+import re
+import threading
+from time import monotonic
 from random import random
-from typing import Any, Callable, Deque, Dict, Generic, Optional
-from typing import TYPE_CHECKING
+from typing import Any, Callable, Deque, Dict, Generic, Iterator, List
+from typing import Optional, Tuple, TYPE_CHECKING
+from weakref import ReferenceType
 from collections import Counter, deque
 
-from psycopg.abc import ConnectionType
+from psycopg import errors as e
+from psycopg.abc import ConnectionType, PQGen
+from psycopg.pq import ConnStatus, ExecStatus
+from psycopg.generators import execute
 
 if TYPE_CHECKING:
     from typing import Counter as TCounter
+    from psycopg.pq.abc import PGconn
+    from psycopg._preparing import Key
+    from psycopg._typeinfo import TypeInfo
+    from .warmup import Warmup
+
+# Reset commands which deallocate the prepared statements of the session
+DEALLOCATING_RESET = re.compile(
+    r"\b(DISCARD\s+ALL|DEALLOCATE\s+(PREPARE\s+)?ALL)\b", re.IGNORECASE
+)
+
+
+class Histogram:
+    """
+    Distribution of a set of durations, in milliseconds.
+
+    The values are counted in buckets whose size grows in powers of 2, so that
+    adding a value is cheap and the relative error of the percentiles is
+    bounded, no matter the range of the values.
+    """
+
+    __module__ = "psycopg_pool"
+
+    # Values greater than 2 ** (NBUCKETS - 2) ms (about 6 days) all end up in
+    # the last bucket.
+    NBUCKETS = 32
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * self.NBUCKETS
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__module__}.{self.__class__.__name__}"
+            f" count={self.count} p50={self.percentile(50)}"
+            f" p99={self.percentile(99)} max={self.max}>"
+        )
+
+    def add(self, value: int) -> None:
+        """Add a value to the distribution."""
+        if value < 0:
+            value = 0
+        self.counts[min(value.bit_length(), self.NBUCKETS - 1)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def copy(self) -> "Histogram":
+        """Return a copy of the histogram."""
+        rv = Histogram()
+        rv.counts = self.counts[:]
+        rv.count = self.count
+        rv.sum = self.sum
+        rv.max = self.max
+        return rv
+
+    @property
+    def mean(self) -> float:
+        """The mean of the values added, 0 if the histogram is empty."""
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, pc: float) -> int:
+        """
+        Return an upper bound for the *pc*-th percentile of the values.
+
+        The value returned is the upper bound of the bucket where the
+        percentile falls, so it might overestimate it by up to a factor 2,
+        but never more than the maximum value added.
+        """
+        if not 0 <= pc <= 100:
+            raise ValueError("the percentile must be between 0 and 100")
+
+        target = self.count * pc / 100.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= target:
+                return min(self._upper_bound(i), self.max)
+        return self.max
+
+    def buckets(self) -> Iterator[Tuple[int, int]]:
+        """
+        Iterate on the non-empty buckets of the histogram.
+
+        Yield pairs *(upper bound, count)*: *count* values were added greater
+        than the previous bucket upper bound and less than or equal to *upper
+        bound*.
+        """
+        for i, n in enumerate(self.counts):
+            if n:
+                yield self._upper_bound(i), n
+
+    def _upper_bound(self, i: int) -> int:
+        return (1 << i) - 1 if i < self.NBUCKETS - 1 else self.max
 
 
 class BasePool(Generic[ConnectionType]):
@@ -20,6 +123,15 @@ class BasePool(Generic[ConnectionType]):
     # Used to generate pool names
     _num_pool = 0
 
+    # Max number of connections to check at every check_interval
+    _CHECK_BATCH = 3
+
+    # Weight of a new value in the moving averages of the durations
+    _AVG_WEIGHT = 0.1
+
+    # Max number of prepared statements to keep usage statistics about
+    _PREPARED_STATS_MAX = 1000
+
     # Stats keys
     _POOL_MIN = "pool_min"
     _POOL_MAX = "pool_max"
@@ -54,6 +166,13 @@ class BasePool(Generic[ConnectionType]):
             Callable[["BasePool[ConnectionType]"], None]
         ] = None,
         num_workers: int = 3,
+        policy: str = "fifo",
+        check_interval: Optional[float] = None,
+        check_idle: Optional[float] = None,
+        adaptive: bool = False,
+        prepared_warmup: int = 0,
+        connect_concurrency: Optional[int] = None,
+        warmup: Optional["Warmup"] = None,
     ):
         if max_size is None:
             max_size = min_size
@@ -66,6 +185,17 @@ class BasePool(Generic[ConnectionType]):
         if num_workers < 1:
             raise ValueError("num_workers must be at least 1")
 
+        if connect_concurrency is not None and connect_concurrency < 1:
+            raise ValueError("connect_concurrency must be at least 1")
+
+        if prepared_warmup < 0:
+            raise ValueError("prepared_warmup must be non-negative")
+
+        if policy not in ("fifo", "lifo"):
+            raise ValueError(
+                f"policy must be 'fifo' or 'lifo', got {policy!r} instead"
+            )
+
         self.conninfo = conninfo
         self.kwargs: Dict[str, Any] = kwargs or {}
         self._reconnect_failed: Callable[["BasePool[ConnectionType]"], None]
@@ -79,10 +209,35 @@ class BasePool(Generic[ConnectionType]):
         self.max_lifetime = max_lifetime
         self.max_idle = max_idle
         self.num_workers = num_workers
+        self.connect_concurrency = connect_concurrency
+        self._lifo = policy == "lifo"
+        self.check_interval = check_interval
+        self.check_idle = check_idle
+        self.adaptive = adaptive
+        self.prepared_warmup = prepared_warmup
+        self.warmup = warmup
 
         self._nconns = min_size  # currently in the pool, out, being prepared
         self._pool: Deque[ConnectionType] = deque()
         self._stats: "TCounter[str]" = Counter()
+        self._histograms = self._new_histograms()
+
+        # Protect the histograms and the averages, which may be updated
+        # without holding the pool lock.
+        self._stats_lock = threading.Lock()
+
+        # Moving averages of the durations measured, used to decide how much
+        # to grow the pool in adaptive mode.
+        self._averages: Dict[str, float] = {}
+
+        # Number of times the prepared statements have been used by any
+        # connection of the pool, used to prepare the most used ones on the
+        # new connections.
+        self._prepared_stats: "TCounter[Key]" = Counter()
+
+        # Information about the types in the warmup specification, fetched by
+        # the first connection and used to register the types on the others.
+        self._typeinfos: Dict[Tuple[type, str], "TypeInfo"] = {}
 
         # Min number of connections in the pool in a max_idle unit of time.
         # It is reset periodically by the ShrinkPool scheduled task.
@@ -91,11 +246,12 @@ class BasePool(Generic[ConnectionType]):
         # max_idle interval they weren't all used.
         self._nconns_min = min_size
 
-        # Flag to allow the pool to grow only one connection at time. In case
-        # of spike, if threads are allowed to grow in parallel and connection
-        # time is slow, there won't be any thread available to return the
-        # connections to the pool.
-        self._growing = False
+        # Number of connections being added to serve waiting clients. Unless
+        # adaptive, allow the pool to grow only one connection at time. In
+        # case of spike, if threads are allowed to grow in parallel and
+        # connection time is slow, there won't be any thread available to
+        # return the connections to the pool.
+        self._growing = 0
 
         # _close should be the last property to be set in the state
         # to avoid warning on __del__ in case __init__ fails.
@@ -115,6 +271,11 @@ class BasePool(Generic[ConnectionType]):
     def max_size(self) -> int:
         return self._max_size
 
+    @property
+    def policy(self) -> str:
+        """The policy used to choose the connection to serve."""
+        return "lifo" if self._lifo else "fifo"
+
     @property
     def closed(self) -> bool:
         """`!True` if the pool is closed."""
@@ -139,6 +300,183 @@ class BasePool(Generic[ConnectionType]):
         rv.update(self._get_measures())
         return rv
 
+    def get_histograms(self) -> Dict[str, Histogram]:
+        """
+        Return the distribution of the durations measured by the pool.
+        """
+        return {k: h.copy() for k, h in self._histograms.items()}
+
+    def pop_histograms(self) -> Dict[str, Histogram]:
+        """
+        Return the distribution of the durations measured by the pool.
+
+        After the call, all the histograms are reset.
+        """
+        with self._stats_lock:
+            rv, self._histograms = self._histograms, self._new_histograms()
+        return rv
+
+    def _new_histograms(self) -> Dict[str, Histogram]:
+        return {
+            self._REQUESTS_WAIT_MS: Histogram(),
+            self._USAGE_MS: Histogram(),
+            self._CONNECTIONS_MS: Histogram(),
+        }
+
+    def _record_ms(self, key: str, t0: float, t1: float) -> None:
+        """
+        Add the time between *t0* and *t1* to the counter and histogram *key*.
+        """
+        ms = int(1000.0 * (t1 - t0))
+        with self._stats_lock:
+            self._stats[key] += ms
+            self._add_ms(key, ms)
+
+    def _observe_ms(self, key: str, ms: int) -> None:
+        """
+        Add a duration to the histogram and the moving average *key*.
+        """
+        with self._stats_lock:
+            self._add_ms(key, ms)
+
+    def _add_ms(self, key: str, ms: int) -> None:
+        """
+        Add a duration to the histogram and the moving average *key*.
+
+        Must be called with the stats lock held.
+        """
+        self._histograms[key].add(ms)
+        avg = self._averages.get(key)
+        if avg is None:
+            self._averages[key] = float(ms)
+        else:
+            self._averages[key] = avg + self._AVG_WEIGHT * (ms - avg)
+
+    def _wait_progress(self) -> str:
+        """
+        Describe how far the pool is from being full, for `wait()` reports.
+        """
+        rv = f"{len(self._pool)} connections ready out of {self._nconns}"
+        errors = self._stats[self._CONNECTIONS_ERRORS]
+        if errors:
+            rv += f", {errors} failed connection attempts"
+        return rv
+
+    @staticmethod
+    def _count_prepared(
+        wself: "ReferenceType[BasePool[Any]]", key: "Key"
+    ) -> None:
+        """
+        Take note that a connection used the prepared statement *key*.
+
+        Use a weak reference to the pool so that the connections don't keep
+        it alive.
+        """
+        self = wself()
+        if not self:
+            return
+
+        with self._stats_lock:
+            self._prepared_stats[key] += 1
+            if len(self._prepared_stats) > self._PREPARED_STATS_MAX:
+                # Forget the least used statements.
+                self._prepared_stats = Counter(
+                    dict(
+                        self._prepared_stats.most_common(
+                            self._PREPARED_STATS_MAX // 2
+                        )
+                    )
+                )
+
+    def _prepared_to_warm_up(self) -> List["Key"]:
+        """
+        Return the statements to prepare on a new connection.
+        """
+        if not self.prepared_warmup:
+            return []
+        with self._stats_lock:
+            stats = self._prepared_stats.most_common(self.prepared_warmup)
+        return [k for k, n in stats]
+
+    def _grow_size(self, nwaiting: int) -> int:
+        """
+        Return how many connections to add to serve *nwaiting* clients.
+
+        Must be called with the pool lock held.
+        """
+        if not nwaiting or self._nconns >= self._max_size:
+            return 0
+        if not self.adaptive:
+            return 0 if self._growing else 1
+
+        # Estimate how many connections will be returned by the clients in the
+        # time it takes to create a new one, unless the clients are waiting
+        # longer than that already, which means the returns are not enough.
+        returning = 0.0
+        connect_ms = self._averages.get(self._CONNECTIONS_MS)
+        usage_ms = self._averages.get(self._USAGE_MS)
+        wait_ms = self._averages.get(self._REQUESTS_WAIT_MS, 0.0)
+        if connect_ms is not None and usage_ms and wait_ms < connect_ms:
+            nbusy = self._nconns - self._growing - len(self._pool)
+            returning = nbusy * connect_ms / usage_ms
+
+        need = nwaiting - self._growing - int(returning)
+        if need <= 0 and not self._growing:
+            # Make sure the clients will be served eventually
+            need = 1
+        return max(0, min(need, self._max_size - self._nconns))
+
+    def _shrink_size(self, nconns_min: int) -> int:
+        """
+        Return how many connections to close in a `max_idle` interval.
+
+        *nconns_min* is the number of connections never used in the interval.
+        Unless adaptive, close one connection at time. In adaptive mode close
+        half of them, so that the pool follows the load faster, but smoothly.
+
+        Must be called with the pool lock held.
+        """
+        surplus = min(nconns_min, self._nconns - self._min_size)
+        if surplus <= 0:
+            return 0
+        if not self.adaptive:
+            return 1
+        return (surplus + 1) // 2
+
+    def _must_check(self, conn: ConnectionType) -> bool:
+        """
+        Return True if *conn* was idle for longer than `check_idle`.
+        """
+        if self.check_idle is None:
+            return False
+        return monotonic() - conn._checked_at > self.check_idle
+
+    def _pop_to_check(self) -> List[ConnectionType]:
+        """
+        Remove from the pool the connections to check in a periodic run.
+
+        Return the `_CHECK_BATCH` connections not checked for the longest time,
+        if not checked within the last `check_interval`.
+
+        Must be called with the pool lock held.
+        """
+        assert self.check_interval is not None
+        threshold = monotonic() - self.check_interval
+        # Iterate on a copy: in the sync pool, clients may take connections
+        # without holding the lock.
+        conns = sorted(
+            (c for c in list(self._pool) if c._checked_at < threshold),
+            key=lambda c: c._checked_at,
+        )[: self._CHECK_BATCH]
+        rv = []
+        for conn in conns:
+            try:
+                self._pool.remove(conn)
+            except ValueError:
+                continue  # taken by a client
+            rv.append(conn)
+        return rv
+
     def _get_measures(self) -> Dict[str, int]:
         """
         Return immediate measures of the pool (not counters).
@@ -158,6 +496,32 @@ class BasePool(Generic[ConnectionType]):
         return value * (1.0 + ((max_pc - min_pc) * random()) + min_pc)
 
 
+def probe(pgconn: "PGconn") -> PQGen[None]:
+    """
+    Generator to check cheaply if an idle connection is still working.
+
+    Raise `~psycopg.OperationalError` if the connection is broken.
+    """
+    if pgconn.status != ConnStatus.OK:
+        raise e.OperationalError("the connection is closed")
+
+    # An idle connection has nothing to read: if there is input the server
+    # probably closed it. The libpq socket is non-blocking, so consuming the
+    # input doesn't wait (and, unlike select(), works with any fd number).
+    pgconn.consume_input()
+    if pgconn.status != ConnStatus.OK:
+        raise e.OperationalError("the connection is closed")
+
+    # An empty query is the cheapest round trip to the server.
+    pgconn.send_query(b"")
+    results = yield from execute(pgconn)
+    status = results[-1].status
+    if status != ExecStatus.EMPTY_QUERY:
+        raise e.OperationalError(
+            f"unexpected probe result: {ExecStatus(status).name}"
+        )
+
+
 class ConnectionAttempt:
     """Keep the state of a connection attempt."""
 
@@ -178,7 +542,13 @@ class ConnectionAttempt:
                 self.INITIAL_DELAY, -self.DELAY_JITTER, self.DELAY_JITTER
             )
         else:
-            self.delay *= self.DELAY_BACKOFF
+            # Keep on adding jitter, so that the clients which lost the
+            # connection at the same time don't retry in lockstep.
+            self.delay = BasePool._jitter(
+                self.delay * self.DELAY_BACKOFF,
+                -self.DELAY_JITTER,
+                self.DELAY_JITTER,
+            )
 
         if self.delay + now > self.give_up_at:
             self.delay = max(0.0, self.give_up_at - now)
@@ -0,0 +1,469 @@
+"""
+Bulk operations distributed over the connections of a pool.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+import logging
+import threading
+from queue import Queue, Empty
+from typing import Any, Callable, Hashable, Iterable, Iterator, List
+from typing import Optional, Sequence, Tuple, Union
+from contextlib import contextmanager, ExitStack
+
+from psycopg import sql
+from psycopg import errors as e
+from psycopg import Connection, Copy
+from psycopg.abc import Query
+from psycopg.transaction import _SNAPSHOT_LEVELS
+
+from .pool import ConnectionPool
+
+logger = logging.getLogger("psycopg.pool")
+
+# Number of rows sent to a worker in a single message.
+BATCH_SIZE = 1000
+
+# Max number of batches queued for each worker. More than that the producer
+# will block, waiting for the worker to catch up.
+QUEUE_SIZE = 8
+
+Row = Sequence[Any]
+PartitionFunc = Callable[[Row], Hashable]
+ExportSink = Callable[[int, memoryview], Any]
+
+
+class BulkResult:
+    """
+    The outcome of a bulk operation run on several connections.
+
+    Every worker runs in its own transaction: the data of the workers which
+    didn't fail is committed even if other workers had an error.
+    """
+
+    __module__ = "psycopg_pool.bulk"
+
+    def __init__(self, nworkers: int):
+        self.rowcounts: List[int] = [0] * nworkers
+        """Number of rows processed by every worker."""
+
+        self.errors: List[Optional[BaseException]] = [None] * nworkers
+        """The error raised by every worker, `!None` if it succeeded."""
+
+    def __repr__(self) -> str:
+        cls = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        return (
+            f"<{cls} rowcount={self.rowcount}"
+            f" errors={sum(1 for ex in self.errors if ex)}"
+            f" at 0x{id(self):x}>"
+        )
+
+    @property
+    def rowcount(self) -> int:
+        """Number of rows processed by all the workers that succeeded."""
+        return sum(
+            n for n, ex in zip(self.rowcounts, self.errors) if ex is None
+        )
+
+    @property
+    def ok(self) -> bool:
+        """`!True` if all the workers completed successfully."""
+        return not any(self.errors)
+
+
+def parallel_copy(
+    pool: ConnectionPool,
+    table: Union[str, sql.Identifier],
+    rows: Iterable[Row],
+    *,
+    columns: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    partition_by: Optional[PartitionFunc] = None,
+    timeout: Optional[float] = None,
+) -> BulkResult:
+    """
+    Load *rows* into *table* using :sql:`COPY` on several pool connections.
+
+    The rows are split into batches and distributed to *workers* threads
+    (by default `~ConnectionPool.min_size`, at most
+    `~ConnectionPool.max_size`), each one loading its share of data using
+    `~psycopg.Cursor.copy()` on its own connection. If
+    *partition_by* is specified, it is called on every row and all the rows
+    returning the same key are loaded by the same worker; otherwise the
+    batches are distributed round-robin.
+
+    Return a `BulkResult` with the rows loaded and the errors met by each
+    worker. If iterating on *rows* raises an exception, all the workers roll
+    back and the exception is propagated.
+    """
+    nworkers = _get_nworkers(pool.min_size, pool.max_size, workers)
+    statement = _copy_statement(table, columns, "FROM STDIN")
+    result = BulkResult(nworkers)
+    queues: List["Queue[Optional[List[Row]]]"] = [
+        Queue(maxsize=QUEUE_SIZE) for i in range(nworkers)
+    ]
+    threads = [
+        threading.Thread(
+            target=_copy_worker,
+            args=(pool, statement, queues[i], result, i, timeout),
+            name=f"{pool.name}-copy-{i}",
+            daemon=True,
+        )
+        for i in range(nworkers)
+    ]
+    for t in threads:
+        t.start()
+
+    partitioner = Partitioner(nworkers, partition_by)
+    try:
+        for row in rows:
+            ready = partitioner.add(row)
+            if ready:
+                queues[ready[0]].put(ready[1])
+        for i, batch in partitioner.flush():
+            queues[i].put(batch)
+
+    except BaseException:
+        for q in queues:
+            q.put(ABORT)
+        for t in threads:
+            t.join()
+        raise
+
+    for q in queues:
+        q.put(None)
+    for t in threads:
+        t.join()
+
+    return result
+
+
+@contextmanager
+def snapshot_connections(
+    pool: ConnectionPool, n: int, *, timeout: Optional[float] = None
+) -> Iterator[List[Connection[Any]]]:
+    """
+    Obtain *n* connections from *pool* sharing the same snapshot.
+
+    Return a list of connections, each one in a transaction seeing the same
+    state of the database: the first connection exports its snapshot, the
+    other ones import it (see :ref:`transaction-snapshot`). At the end of the
+    block the transactions are terminated and the connections are returned
+    to the pool.
+    """
+    if not 1 <= n <= pool.max_size:
+        raise ValueError(
+            f"the number of connections must be between 1 and {pool.max_size}"
+        )
+
+    with ExitStack() as stack:
+        leader = stack.enter_context(pool.connection(timeout=timeout))
+        tx = stack.enter_context(leader.transaction())
+        if leader.isolation_level not in _SNAPSHOT_LEVELS:
+            leader.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        snapshot = tx.export_snapshot()
+
+        conns = [leader]
+        for i in range(n - 1):
+            conn = stack.enter_context(pool.connection(timeout=timeout))
+            stack.enter_context(conn.transaction(snapshot=snapshot))
+            conns.append(conn)
+
+        yield conns
+
+
+def parallel_export(
+    pool: ConnectionPool,
+    table: Union[str, sql.Identifier],
+    key: str,
+    sink: ExportSink,
+    *,
+    columns: Optional[Sequence[str]] = None,
+    bounds: Optional[Sequence[Any]] = None,
+    workers: Optional[int] = None,
+    binary: bool = False,
+    timeout: Optional[float] = None,
+) -> BulkResult:
+    """
+    Read *table* using :sql:`COPY` on several pool connections in parallel.
+
+    The table is split in chunks by ranges of the *key* column and the chunks
+    are read by *workers* threads (by default `~ConnectionPool.min_size`, at
+    most `~ConnectionPool.max_size`), each one on its own connection. All the
+    connections share the same snapshot (see `snapshot_connections()`), so
+    the result is consistent as if it was read by a single transaction.
+
+    The split points can be specified in *bounds* as a sorted list of *key*
+    values: ``[b1, b2]`` splits the table in the chunks ``key < b1``, ``b1 <=
+    key < b2``, ``key >= b2`` (the rows with a null key go into the first
+    chunk). If *bounds* is not specified the key must be an integer column,
+    whose range is split in as many chunks as the workers.
+
+    The data of each chunk is passed to ``sink(chunk, data)``, where *chunk*
+    is the index of the chunk and *data* is a block of data in :sql:`COPY`
+    format (text or binary, according to *binary*). *sink* is called by
+    different threads concurrently; the buffer is only valid until it
+    returns.
+    """
+    nworkers = _get_nworkers(pool.min_size, pool.max_size, workers)
+    result = BulkResult(nworkers)
+    with snapshot_connections(pool, nworkers, timeout=timeout) as conns:
+        if bounds is None:
+            cur = conns[0].execute(_range_statement(table, key))
+            bounds = split_range(cur.fetchone(), nworkers)
+
+        chunks: "Queue[Tuple[int, Query]]" = Queue()
+        for chunk in enumerate(
+            _export_statements(table, key, columns, bounds, binary)
+        ):
+            chunks.put(chunk)
+
+        threads = [
+            threading.Thread(
+                target=_export_worker,
+                args=(conn, chunks, sink, result, i),
+                name=f"{pool.name}-export-{i}",
+                daemon=True,
+            )
+            for i, conn in enumerate(conns)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    return result
+
+
+class Partitioner:
+    """
+    Group rows in batches to be sent to a fixed number of workers.
+    """
+
+    def __init__(self, nworkers: int, partition_by: Optional[PartitionFunc]):
+        self.nworkers = nworkers
+        self.partition_by = partition_by
+        self._batches: List[List[Row]] = [[] for i in range(nworkers)]
+        self._next = 0
+
+    def add(self, row: Row) -> Optional[Tuple[int, List[Row]]]:
+        """
+        Add a row to a batch.
+
+        Return a ``(worker, rows)`` tuple if a batch is ready to be sent to
+        a worker, otherwise `!None`.
+        """
+        if self.partition_by:
+            i = hash(self.partition_by(row)) % self.nworkers
+        else:
+            i = self._next
+
+        batch = self._batches[i]
+        batch.append(row)
+        if len(batch) < BATCH_SIZE:
+            return None
+
+        self._batches[i] = []
+        if not self.partition_by:
+            self._next = (i + 1) % self.nworkers
+        return (i, batch)
+
+    def flush(self) -> List[Tuple[int, List[Row]]]:
+        """Return the ``(worker, rows)`` tuples not sent yet."""
+        rv = [(i, batch) for i, batch in enumerate(self._batches) if batch]
+        self._batches = [[] for i in range(self.nworkers)]
+        return rv
+
+
+class Aborted(Exception):
+    """
+    Raised in a worker to roll back its work if the producer failed.
+    """
+
+
+# Sentinel sent to the workers in case of error of the producer
+ABORT: List[Row] = []
+
+
+def _copy_worker(
+    pool: ConnectionPool,
+    statement: Query,
+    q: "Queue[Optional[List[Row]]]",
+    result: BulkResult,
+    idx: int,
+    timeout: Optional[float],
+) -> None:
+    done = aborted = False
+    try:
+        with pool.connection(timeout=timeout) as conn:
+            with conn.transaction(), conn.cursor() as cur:
+                with cur.copy(statement) as copy:
+                    while True:
+                        rows = q.get()
+                        if rows is None:
+                            done = True
+                            break
+                        if rows is ABORT:
+                            done = aborted = True
+                            raise Aborted("bulk operation aborted")
+                        for row in rows:
+                            copy.write_row(row)
+                nrows = cur.rowcount
+
+    except BaseException as ex:
+        if not aborted:
+            logger.warning("error in bulk worker %s: %s", idx, ex)
+        result.errors[idx] = ex
+        # Keep on consuming the queue or the producer will block.
+        while not done:
+            rows = q.get()
+            done = rows is None or rows is ABORT
+
+    else:
+        result.rowcounts[idx] = nrows
+
+
+def _export_worker(
+    conn: Connection[Any],
+    chunks: "Queue[Tuple[int, Query]]",
+    sink: ExportSink,
+    result: BulkResult,
+    idx: int,
+) -> None:
+    with conn.cursor() as cur:
+        while True:
+            try:
+                chunk, statement = chunks.get_nowait()
+            except Empty:
+                break
+
+            try:
+                with cur.copy(statement) as copy:
+                    try:
+                        for data in copy:
+                            sink(chunk, data)
+                    except BaseException:
+                        _cancel_copy(conn, copy)
+                        raise
+                result.rowcounts[idx] += cur.rowcount
+
+            except BaseException as ex:
+                logger.warning("error in bulk worker %s: %s", idx, ex)
+                result.errors[idx] = ex
+                break
+
+
+def _cancel_copy(conn: Connection[Any], copy: Copy) -> None:
+    """Interrupt a COPY TO operation and consume the data left."""
+    conn.cancel()
+    try:
+        for data in copy:
+            pass
+    except e.QueryCanceled:
+        pass
+
+
+def _get_nworkers(default: int, max_size: int, workers: Optional[int]) -> int:
+    # Every worker holds a connection for the whole operation: more workers
+    # than the connections of the pool would wait for them until timeout.
+    if workers is None:
+        workers = default
+    if not 1 <= workers <= max_size:
+        raise ValueError(f"workers must be between 1 and {max_size}")
+    return workers
+
+
+def split_range(minmax: Any, n: int) -> List[int]:
+    """
+    Return the points splitting a range of integers in *n* parts.
+
+    *minmax* is a ``(min, max)`` pair, or ``(None, None)`` if there are no
+    data to split.
+    """
+    lo, hi = minmax
+    if lo is None:
+        return []
+    if not (isinstance(lo, int) and isinstance(hi, int)):
+        raise TypeError(
+            "the split bounds must be specified for non-integer keys"
+        )
+
+    rv: List[int] = []
+    for i in range(1, n):
+        b = lo + (hi - lo + 1) * i // n
+        if b > lo and (not rv or b > rv[-1]):
+            rv.append(b)
+    return rv
+
+
+def _range_statement(
+    table: Union[str, sql.Identifier], key: str
+) -> sql.Composed:
+    if isinstance(table, str):
+        table = sql.Identifier(table)
+    return sql.SQL("SELECT min({key}), max({key}) FROM {table}").format(
+        key=sql.Identifier(key), table=table
+    )
+
+
+def _export_statements(
+    table: Union[str, sql.Identifier],
+    key: str,
+    columns: Optional[Sequence[str]],
+    bounds: Sequence[Any],
+    binary: bool,
+) -> List[sql.Composed]:
+    if isinstance(table, str):
+        table = sql.Identifier(table)
+    fields: sql.Composable
+    if columns:
+        fields = sql.SQL(", ").join([sql.Identifier(c) for c in columns])
+    else:
+        fields = sql.SQL("*")
+    k = sql.Identifier(key)
+    fmt = sql.SQL(" (FORMAT BINARY)" if binary else "")
+
+    conds: List[sql.Composable] = []
+    if not bounds:
+        conds.append(sql.SQL("true"))
+    else:
+        conds.append(
+            sql.SQL("{k} < {b} OR {k} IS NULL").format(
+                k=k, b=sql.Literal(bounds[0])
+            )
+        )
+        for lo, hi in zip(bounds, bounds[1:]):
+            conds.append(
+                sql.SQL("{k} >= {lo} AND {k} < {hi}").format(
+                    k=k, lo=sql.Literal(lo), hi=sql.Literal(hi)
+                )
+            )
+        conds.append(
+            sql.SQL("{k} >= {b}").format(k=k, b=sql.Literal(bounds[-1]))
+        )
+
+    return [
+        sql.SQL(
+            "COPY (SELECT {fields} FROM {table} WHERE {cond}) TO STDOUT{fmt}"
+        ).format(fields=fields, table=table, cond=cond, fmt=fmt)
+        for cond in conds
+    ]
+
+
+def _copy_statement(
+    table: Union[str, sql.Identifier],
+    columns: Optional[Sequence[str]],
+    direction: str,
+) -> sql.Composed:
+    if isinstance(table, str):
+        table = sql.Identifier(table)
+
+    parts: List[sql.Composable] = [sql.SQL("COPY "), table]
+    if columns:
+        parts.append(
+            sql.SQL(" ({})").format(
+                sql.SQL(", ").join([sql.Identifier(c) for c in columns])
+            )
+        )
+    parts.append(sql.SQL(f" {direction}"))
+    return sql.Composed(parts)
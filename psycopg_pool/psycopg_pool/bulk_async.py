@@ -0,0 +1,246 @@
+"""
+Bulk operations distributed over the connections of an asyncio pool.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+import asyncio
+import logging
+from inspect import isawaitable
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, List
+from typing import Optional, Sequence, Tuple, Union
+from contextlib import AsyncExitStack
+
+from psycopg import sql
+from psycopg import errors as e
+from psycopg import AsyncConnection, AsyncCopy
+from psycopg.abc import Query
+from psycopg._compat import asynccontextmanager, create_task
+from psycopg.transaction import _SNAPSHOT_LEVELS
+
+from .bulk import ABORT, QUEUE_SIZE, Aborted, BulkResult
+from .bulk import ExportSink, Partitioner, PartitionFunc, Row, split_range
+from .bulk import _copy_statement, _export_statements, _get_nworkers
+from .bulk import _range_statement
+from .pool_async import AsyncConnectionPool
+
+logger = logging.getLogger("psycopg.pool")
+
+
+async def parallel_copy(
+    pool: AsyncConnectionPool,
+    table: Union[str, sql.Identifier],
+    rows: Union[Iterable[Row], AsyncIterable[Row]],
+    *,
+    columns: Optional[Sequence[str]] = None,
+    workers: Optional[int] = None,
+    partition_by: Optional[PartitionFunc] = None,
+    timeout: Optional[float] = None,
+) -> BulkResult:
+    """
+    Load *rows* into *table* using :sql:`COPY` on several pool connections.
+
+    Similar to `psycopg_pool.bulk.parallel_copy()`, with the workers
+    implemented as concurrent tasks. *rows* can be an iterable or an async
+    iterable.
+    """
+    nworkers = _get_nworkers(pool.min_size, pool.max_size, workers)
+    statement = _copy_statement(table, columns, "FROM STDIN")
+    result = BulkResult(nworkers)
+    queues: List["asyncio.Queue[Optional[List[Row]]]"] = [
+        asyncio.Queue(maxsize=QUEUE_SIZE) for i in range(nworkers)
+    ]
+    tasks = [
+        create_task(
+            _copy_worker(pool, statement, queues[i], result, i, timeout),
+            name=f"{pool.name}-copy-{i}",
+        )
+        for i in range(nworkers)
+    ]
+
+    partitioner = Partitioner(nworkers, partition_by)
+    try:
+        if isinstance(rows, AsyncIterable):
+            async for row in rows:
+                ready = partitioner.add(row)
+                if ready:
+                    await queues[ready[0]].put(ready[1])
+        else:
+            for row in rows:
+                ready = partitioner.add(row)
+                if ready:
+                    await queues[ready[0]].put(ready[1])
+        for i, batch in partitioner.flush():
+            await queues[i].put(batch)
+
+    except BaseException:
+        for q in queues:
+            await q.put(ABORT)
+        await asyncio.gather(*tasks)
+        raise
+
+    for q in queues:
+        await q.put(None)
+    await asyncio.gather(*tasks)
+
+    return result
+
+
+@asynccontextmanager
+async def snapshot_connections(
+    pool: AsyncConnectionPool, n: int, *, timeout: Optional[float] = None
+) -> AsyncIterator[List[AsyncConnection[Any]]]:
+    """
+    Obtain *n* connections from *pool* sharing the same snapshot.
+
+    Similar to `psycopg_pool.bulk.snapshot_connections()`.
+    """
+    if not 1 <= n <= pool.max_size:
+        raise ValueError(
+            f"the number of connections must be between 1 and {pool.max_size}"
+        )
+
+    async with AsyncExitStack() as stack:
+        leader = await stack.enter_async_context(
+            pool.connection(timeout=timeout)
+        )
+        tx = await stack.enter_async_context(leader.transaction())
+        if leader.isolation_level not in _SNAPSHOT_LEVELS:
+            await leader.execute(
+                "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"
+            )
+        snapshot = await tx.export_snapshot()
+
+        conns = [leader]
+        for i in range(n - 1):
+            conn = await stack.enter_async_context(
+                pool.connection(timeout=timeout)
+            )
+            await stack.enter_async_context(
+                conn.transaction(snapshot=snapshot)
+            )
+            conns.append(conn)
+
+        yield conns
+
+
+async def parallel_export(
+    pool: AsyncConnectionPool,
+    table: Union[str, sql.Identifier],
+    key: str,
+    sink: ExportSink,
+    *,
+    columns: Optional[Sequence[str]] = None,
+    bounds: Optional[Sequence[Any]] = None,
+    workers: Optional[int] = None,
+    binary: bool = False,
+    timeout: Optional[float] = None,
+) -> BulkResult:
+    """
+    Read *table* using :sql:`COPY` on several pool connections in parallel.
+
+    Similar to `psycopg_pool.bulk.parallel_export()`, with the workers
+    implemented as concurrent tasks. *sink* can be a function or a coroutine
+    function.
+    """
+    nworkers = _get_nworkers(pool.min_size, pool.max_size, workers)
+    result = BulkResult(nworkers)
+    async with snapshot_connections(pool, nworkers, timeout=timeout) as conns:
+        if bounds is None:
+            cur = await conns[0].execute(_range_statement(table, key))
+            bounds = split_range(await cur.fetchone(), nworkers)
+
+        chunks: "asyncio.Queue[Tuple[int, Query]]" = asyncio.Queue()
+        for chunk in enumerate(
+            _export_statements(table, key, columns, bounds, binary)
+        ):
+            chunks.put_nowait(chunk)
+
+        await asyncio.gather(
+            *(
+                _export_worker(conn, chunks, sink, result, i)
+                for i, conn in enumerate(conns)
+            )
+        )
+
+    return result
+
+
+async def _copy_worker(
+    pool: AsyncConnectionPool,
+    statement: Query,
+    q: "asyncio.Queue[Optional[List[Row]]]",
+    result: BulkResult,
+    idx: int,
+    timeout: Optional[float],
+) -> None:
+    done = aborted = False
+    try:
+        async with pool.connection(timeout=timeout) as conn:
+            async with conn.transaction(), conn.cursor() as cur:
+                async with cur.copy(statement) as copy:
+                    while True:
+                        rows = await q.get()
+                        if rows is None:
+                            done = True
+                            break
+                        if rows is ABORT:
+                            done = aborted = True
+                            raise Aborted("bulk operation aborted")
+                        for row in rows:
+                            await copy.write_row(row)
+                nrows = cur.rowcount
+
+    except BaseException as ex:
+        if not aborted:
+            logger.warning("error in bulk worker %s: %s", idx, ex)
+        result.errors[idx] = ex
+        # Keep on consuming the queue or the producer will block.
+        while not done:
+            rows = await q.get()
+            done = rows is None or rows is ABORT
+
+    else:
+        result.rowcounts[idx] = nrows
+
+
+async def _export_worker(
+    conn: AsyncConnection[Any],
+    chunks: "asyncio.Queue[Tuple[int, Query]]",
+    sink: ExportSink,
+    result: BulkResult,
+    idx: int,
+) -> None:
+    async with conn.cursor() as cur:
+        while True:
+            try:
+                chunk, statement = chunks.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+
+            try:
+                async with cur.copy(statement) as copy:
+                    try:
+                        async for data in copy:
+                            rv = sink(chunk, data)
+                            if isawaitable(rv):
+                                await rv
+                    except BaseException:
+                        await _cancel_copy(conn, copy)
+                        raise
+                result.rowcounts[idx] += cur.rowcount
+
+            except BaseException as ex:
+                logger.warning("error in bulk worker %s: %s", idx, ex)
+                result.errors[idx] = ex
+                break
+
+
+async def _cancel_copy(conn: AsyncConnection[Any], copy: AsyncCopy) -> None:
+    """Interrupt a COPY TO operation and consume the data left."""
+    conn.cancel()
+    try:
+        async for data in copy:
+            pass
+    except e.QueryCanceled:
+        pass
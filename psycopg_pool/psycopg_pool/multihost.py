@@ -0,0 +1,368 @@
+"""
+A connection pool routing connections to several database hosts.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+import math
+import logging
+import threading
+from time import monotonic
+from types import TracebackType
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from typing import Type
+from weakref import ref, ReferenceType
+from contextlib import contextmanager
+
+from psycopg import errors as e
+from psycopg import Connection
+from psycopg.rows import tuple_row
+
+from .pool import ConnectionPool
+from .sched import Scheduler
+from .errors import PoolClosed
+
+logger = logging.getLogger("psycopg.pool")
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+RECOVERY_QUERY = "SELECT pg_is_in_recovery()"
+
+# Weight of a new measure in the moving average of the hosts latency
+LATENCY_WEIGHT = 0.2
+
+# Latency to assume for a host not measured yet, or measured too fast
+MIN_LATENCY = 0.001
+
+
+class Host:
+    """
+    The state of one of the hosts served by a `MultiHostPool`.
+    """
+
+    __module__ = "psycopg_pool.multihost"
+
+    def __init__(self, pool: Any, role: Optional[str]):
+        self.pool = pool
+        """The connection pool to the host."""
+
+        self.role = role
+        """The role of the host, ``primary`` or ``replica``, if known."""
+
+        self.up = True
+        """`!False` if the last check of the host failed."""
+
+        self.latency: Optional[float] = None
+        """Moving average of the time, in seconds, to query the host."""
+
+        self.inflight = 0
+        """Number of connections to the host currently used."""
+
+    def __repr__(self) -> str:
+        cls = f"{self.__class__.__module__}.{self.__class__.__qualname__}"
+        return (
+            f"<{cls} {self.pool.name!r} role={self.role} up={self.up}"
+            f" at 0x{id(self):x}>"
+        )
+
+    @property
+    def score(self) -> float:
+        """The expected cost of using the host: the lower the better."""
+        return max(self.latency or 0.0, MIN_LATENCY) * (self.inflight + 1)
+
+    def checked(self, in_recovery: bool, latency: float) -> None:
+        """Update the state of the host after a successful check."""
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_WEIGHT * (latency - self.latency)
+
+        if not self.up:
+            logger.warning("host %r available again", self.pool.name)
+            self.up = True
+
+        role = REPLICA if in_recovery else PRIMARY
+        if role != self.role:
+            if self.role:
+                logger.warning(
+                    "host %r changed role from %s to %s",
+                    self.pool.name,
+                    self.role,
+                    role,
+                )
+            self.role = role
+
+    def failed(self, ex: BaseException) -> None:
+        """Update the state of the host after a failed check."""
+        if self.up:
+            logger.warning("host %r unavailable: %s", self.pool.name, ex)
+            self.up = False
+
+
+def check_roles(roles: Optional[Sequence[Optional[str]]], nhosts: int) -> None:
+    """Verify the roles specified for the hosts of a multi-host pool."""
+    if not nhosts:
+        raise ValueError("at least one host must be specified")
+    if roles is None:
+        return
+    if len(roles) != nhosts:
+        raise ValueError(
+            f"got {len(roles)} roles for {nhosts} hosts: they must be the same"
+        )
+    for role in roles:
+        if role not in (PRIMARY, REPLICA, None):
+            raise ValueError(
+                f"the roles must be {PRIMARY!r} or {REPLICA!r}, got {role!r}"
+            )
+
+
+def select_primary(hosts: Sequence[Host]) -> Optional[Host]:
+    """Return the host to use for a read-write connection."""
+    for host in hosts:
+        if host.up and host.role == PRIMARY:
+            return host
+    return None
+
+
+def select_replica(hosts: Sequence[Host]) -> Optional[Host]:
+    """Return the host to use for a read-only connection.
+
+    Choose the replica with the best `Host.score` or fall back to the primary.
+    """
+    replicas = [h for h in hosts if h.up and h.role == REPLICA]
+    if replicas:
+        return min(replicas, key=lambda h: h.score)
+    return select_primary(hosts)
+
+
+class MultiHostPool:
+    """
+    A pool serving connections from a primary server and its replicas.
+    """
+
+    __module__ = "psycopg_pool"
+
+    _num_pool = 0
+
+    def __init__(
+        self,
+        conninfos: Sequence[str],
+        *,
+        roles: Optional[Sequence[Optional[str]]] = None,
+        name: Optional[str] = None,
+        check_interval: float = 10.0,
+        **kwargs: Any,
+    ):
+        check_roles(roles, len(conninfos))
+        if not name:
+            num = MultiHostPool._num_pool = MultiHostPool._num_pool + 1
+            name = f"multihost-{num}"
+
+        self.name = name
+        self.check_interval = check_interval
+        self._closed = False
+        self._lock = threading.Lock()
+
+        self.hosts: List[Host] = []
+        for i, conninfo in enumerate(conninfos):
+            pool = ConnectionPool(conninfo, name=f"{name}-{i}", **kwargs)
+            self.hosts.append(Host(pool, roles[i] if roles else None))
+
+        # The connections used to check the hosts, outside their pools, and
+        # the threads running the checks.
+        self._probes: List[Optional[Connection[Any]]] = [None] * len(
+            self.hosts
+        )
+        self._checkers: List[Optional[threading.Thread]] = [None] * len(
+            self.hosts
+        )
+
+        self._sched = Scheduler()
+        self._sched_runner = threading.Thread(
+            target=self._sched.run, name=f"{name}-scheduler", daemon=True
+        )
+        self._sched_runner.start()
+        self._sched.enter(check_interval, _CheckHosts(self))
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__module__}.{self.__class__.__name__}"
+            f" {self.name!r} at 0x{id(self):x}>"
+        )
+
+    @property
+    def closed(self) -> bool:
+        """`!True` if the pool is closed."""
+        return self._closed
+
+    def wait(self, timeout: float = 30.0) -> None:
+        """
+        Wait for the pools of all the hosts to be full, then check the hosts.
+
+        After the call the role of the hosts reachable is known. Raise
+        `PoolTimeout` if a pool is not ready within *timeout* sec.
+        """
+        deadline = monotonic() + timeout
+        for host in self.hosts:
+            host.pool.wait(max(0.0, deadline - monotonic()))
+        self.check()
+
+    @contextmanager
+    def connection(
+        self, readonly: bool = False, timeout: Optional[float] = None
+    ) -> Iterator[Connection[Any]]:
+        """Context manager to obtain a connection from the pool of a host.
+
+        If *readonly* is false return a connection to the primary, otherwise
+        to the replica with the best response time and fewest connections
+        in use, or to the primary if no replica is available.
+        """
+        if self._closed:
+            raise PoolClosed(f"the pool {self.name!r} is closed")
+
+        with self._lock:
+            host = select_replica(self.hosts) if readonly else None
+            if not host:
+                host = select_primary(self.hosts)
+            if not host:
+                raise e.OperationalError(
+                    f"no primary host available in {self.name!r}"
+                )
+            host.inflight += 1
+
+        try:
+            with host.pool.connection(timeout=timeout) as conn:
+                yield conn
+        finally:
+            with self._lock:
+                host.inflight -= 1
+
+    def check(self) -> None:
+        """Verify the state and the role of all the hosts."""
+        threads = [self._start_check(i)[0] for i in range(len(self.hosts))]
+        for t in threads:
+            t.join()
+
+    def _check_periodic(self) -> None:
+        for i, host in enumerate(self.hosts):
+            started = self._start_check(i)[1]
+            if not started:
+                # The previous check is still hanging
+                host.failed(
+                    e.OperationalError(
+                        f"check not completed in {self.check_interval} sec"
+                    )
+                )
+
+    def _start_check(self, i: int) -> Tuple[threading.Thread, bool]:
+        """
+        Check the host *i* in a new thread, unless a check is already running.
+
+        Return the thread checking the host, and if it was started now.
+        """
+        with self._lock:
+            t = self._checkers[i]
+            if t and t.is_alive():
+                return t, False
+            t = self._checkers[i] = threading.Thread(
+                target=self._check_host,
+                args=(i,),
+                name=f"{self.name}-check-{i}",
+                daemon=True,
+            )
+            t.start()
+            return t, True
+
+    def _check_host(self, i: int) -> None:
+        # Use a dedicated connection: a busy pool is not a host down, and the
+        # time waiting for a pool connection is not the latency of the host.
+        host = self.hosts[i]
+        if host.pool.closed:
+            host.failed(PoolClosed(f"the pool {host.pool.name!r} is closed"))
+            return
+
+        try:
+            conn = self._probes[i]
+            if not conn or conn.closed:
+                conn = self._probes[i] = self._connect_probe(host)
+            cur = conn.cursor(row_factory=tuple_row)
+            t0 = monotonic()
+            rec = cur.execute(RECOVERY_QUERY).fetchone()
+            latency = monotonic() - t0
+        except Exception as ex:
+            self._close_probe(i)
+            host.failed(ex)
+        else:
+            assert rec
+            host.checked(rec[0], latency)
+
+    def _connect_probe(self, host: Host) -> Connection[Any]:
+        kwargs: Dict[str, Any] = {
+            **host.pool.kwargs,
+            "autocommit": True,
+            "connect_timeout": max(2, math.ceil(self.check_interval)),
+        }
+        conn: Connection[Any]
+        conn = Connection.connect(host.pool.conninfo, **kwargs)
+        return conn
+
+    def _close_probe(self, i: int) -> None:
+        conn, self._probes[i] = self._probes[i], None
+        if conn:
+            conn.close()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Close the pools of all the hosts."""
+        if self._closed:
+            return
+        self._closed = True
+
+        self._sched.enter(0, None)
+        for host in self.hosts:
+            host.pool.close(timeout=timeout)
+        if timeout > 0:
+            self._sched_runner.join(timeout)
+
+        # Don't close the probes used by checks still running.
+        deadline = monotonic() + timeout
+        for i, t in enumerate(self._checkers):
+            if t:
+                t.join(max(0.0, deadline - monotonic()))
+                if t.is_alive():
+                    continue
+            self._close_probe(i)
+
+    def __enter__(self) -> "MultiHostPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Return current stats about the usage of the pools, by pool name.
+        """
+        return {h.pool.name: h.pool.get_stats() for h in self.hosts}
+
+
+class _CheckHosts:
+    """Check the hosts of a pool periodically, as long as the pool exists."""
+
+    def __init__(self, pool: MultiHostPool):
+        self.pool: "ReferenceType[MultiHostPool]" = ref(pool)
+
+    def __call__(self) -> None:
+        pool = self.pool()
+        if not pool or pool.closed:
+            return
+
+        try:
+            pool._check_periodic()
+        finally:
+            pool._sched.enter(pool.check_interval, self)
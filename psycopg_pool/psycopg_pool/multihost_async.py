@@ -0,0 +1,206 @@
+"""
+An asyncio connection pool routing connections to several database hosts.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+import math
+import asyncio
+import logging
+from time import monotonic
+from types import TracebackType
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from typing import Type
+from weakref import ref, ReferenceType
+
+from psycopg import errors as e
+from psycopg.rows import tuple_row
+from psycopg._compat import asynccontextmanager, create_task
+from psycopg.connection_async import AsyncConnection
+
+from .errors import PoolClosed
+from .multihost import Host, RECOVERY_QUERY
+from .multihost import check_roles, select_primary, select_replica
+from .pool_async import AsyncConnectionPool
+
+logger = logging.getLogger("psycopg.pool")
+
+
+class AsyncMultiHostPool:
+    """
+    An asyncio pool serving connections from a primary server and its replicas.
+    """
+
+    __module__ = "psycopg_pool"
+
+    _num_pool = 0
+
+    def __init__(
+        self,
+        conninfos: Sequence[str],
+        *,
+        roles: Optional[Sequence[Optional[str]]] = None,
+        name: Optional[str] = None,
+        check_interval: float = 10.0,
+        **kwargs: Any,
+    ):
+        check_roles(roles, len(conninfos))
+        if not name:
+            num = AsyncMultiHostPool._num_pool = (
+                AsyncMultiHostPool._num_pool + 1
+            )
+            name = f"multihost-async-{num}"
+
+        self.name = name
+        self.check_interval = check_interval
+        self._closed = False
+
+        self.hosts: List[Host] = []
+        for i, conninfo in enumerate(conninfos):
+            pool = AsyncConnectionPool(conninfo, name=f"{name}-{i}", **kwargs)
+            self.hosts.append(Host(pool, roles[i] if roles else None))
+
+        # The connections used to check the hosts, outside their pools.
+        self._probes: List[Optional[AsyncConnection[Any]]] = [None] * len(
+            self.hosts
+        )
+
+        self._checker = create_task(
+            _check_hosts(ref(self), check_interval), name=f"{name}-checker"
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__module__}.{self.__class__.__name__}"
+            f" {self.name!r} at 0x{id(self):x}>"
+        )
+
+    @property
+    def closed(self) -> bool:
+        """`!True` if the pool is closed."""
+        return self._closed
+
+    async def wait(self, timeout: float = 30.0) -> None:
+        deadline = monotonic() + timeout
+        for host in self.hosts:
+            await host.pool.wait(max(0.0, deadline - monotonic()))
+        await self.check()
+
+    @asynccontextmanager
+    async def connection(
+        self, readonly: bool = False, timeout: Optional[float] = None
+    ) -> AsyncIterator[AsyncConnection[Any]]:
+        if self._closed:
+            raise PoolClosed(f"the pool {self.name!r} is closed")
+
+        host = select_replica(self.hosts) if readonly else None
+        if not host:
+            host = select_primary(self.hosts)
+        if not host:
+            raise e.OperationalError(
+                f"no primary host available in {self.name!r}"
+            )
+
+        host.inflight += 1
+        try:
+            async with host.pool.connection(timeout=timeout) as conn:
+                yield conn
+        finally:
+            host.inflight -= 1
+
+    async def check(self) -> None:
+        await asyncio.gather(
+            *(self._check_host(i) for i in range(len(self.hosts)))
+        )
+
+    async def _check_host(self, i: int) -> None:
+        host = self.hosts[i]
+        if host.pool.closed:
+            host.failed(PoolClosed(f"the pool {host.pool.name!r} is closed"))
+            return
+
+        try:
+            rec, latency = await asyncio.wait_for(
+                self._probe(i), self.check_interval
+            )
+        except Exception as ex:
+            await self._close_probe(i)
+            host.failed(ex)
+        else:
+            assert rec
+            host.checked(rec[0], latency)
+
+    async def _probe(self, i: int) -> Tuple[Any, float]:
+        conn = self._probes[i]
+        if not conn or conn.closed:
+            conn = self._probes[i] = await self._connect_probe(self.hosts[i])
+        cur = conn.cursor(row_factory=tuple_row)
+        t0 = monotonic()
+        rec = await (await cur.execute(RECOVERY_QUERY)).fetchone()
+        return rec, monotonic() - t0
+
+    async def _connect_probe(self, host: Host) -> AsyncConnection[Any]:
+        kwargs: Dict[str, Any] = {
+            **host.pool.kwargs,
+            "autocommit": True,
+            "connect_timeout": max(2, math.ceil(self.check_interval)),
+        }
+        conn: AsyncConnection[Any]
+        conn = await AsyncConnection.connect(host.pool.conninfo, **kwargs)
+        return conn
+
+    async def _close_probe(self, i: int) -> None:
+        conn, self._probes[i] = self._probes[i], None
+        if conn:
+            await conn.close()
+
+    async def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+
+        self._checker.cancel()
+        await asyncio.gather(
+            *(h.pool.close(timeout=timeout) for h in self.hosts)
+        )
+        try:
+            await self._checker
+        except asyncio.CancelledError:
+            pass
+        for i in range(len(self.hosts)):
+            await self._close_probe(i)
+
+    async def __aenter__(self) -> "AsyncMultiHostPool":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {h.pool.name: h.pool.get_stats() for h in self.hosts}
+
+
+async def _check_hosts(
+    wpool: "ReferenceType[AsyncMultiHostPool]", interval: float
+) -> None:
+    """Check the hosts of a pool periodically, as long as the pool exists."""
+    while True:
+        await asyncio.sleep(interval)
+        pool = wpool()
+        if not pool or pool.closed:
+            return
+        try:
+            await pool.check()
+        except Exception as ex:
+            logger.warning(
+                "checking hosts of %r failed: %s: %s",
+                pool,
+                ex.__class__.__name__,
+                ex,
+            )
+        del pool
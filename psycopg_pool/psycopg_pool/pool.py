@@ -4,6 +4,7 @@ psycopg synchronous connection pool
 
 # Copyright (C) 2021 The Psycopg Team
 
+import os
 import logging
 import threading
 from abc import ABC, abstractmethod
@@ -11,8 +12,9 @@ from time import monotonic
 from queue import Queue, Empty
 from types import TracebackType
 from typing import Any, Callable, Deque, Dict, Iterator, List
-from typing import Optional, Type
-from weakref import ref
+from typing import Optional, Type, Union
+from weakref import ref, WeakSet
+from functools import partial
 from contextlib import contextmanager
 from collections import deque
 
@@ -20,7 +22,7 @@ from psycopg import errors as e
 from psycopg import Connection
 from psycopg.pq import TransactionStatus
 
-from .base import ConnectionAttempt, BasePool
+from .base import ConnectionAttempt, BasePool, DEALLOCATING_RESET, probe
 from .sched import Scheduler
 from .errors import PoolClosed, PoolTimeout, TooManyRequests
 
@@ -34,14 +36,23 @@ class ConnectionPool(BasePool[Connection[Any]]):
         *,
         connection_class: Type[Connection[Any]] = Connection,
         configure: Optional[Callable[[Connection[Any]], None]] = None,
-        reset: Optional[Callable[[Connection[Any]], None]] = None,
+        reset: Union[None, str, Callable[[Connection[Any]], None]] = None,
         **kwargs: Any,
     ):
         self.connection_class = connection_class
         self._configure = configure
         self._reset = reset
 
+        # If the reset is a command dropping the prepared statements, the
+        # connection must forget them after running it.
+        self._reset_deallocates = bool(
+            isinstance(reset, str) and DEALLOCATING_RESET.search(reset)
+        )
+
         self._lock = threading.RLock()
+
+        # to fetch the types of the warmup only once
+        self._typeinfos_lock = threading.Lock()
         self._waiting: Deque["WaitingClient"] = deque()
 
         # to notify that the pool is full
@@ -51,8 +62,23 @@ class ConnectionPool(BasePool[Connection[Any]]):
         self._tasks: "Queue[MaintenanceTask]" = Queue()
         self._workers: List[threading.Thread] = []
 
+        # Queue and threads dedicated to create connections, if the pool
+        # has a connect_concurrency.
+        self._connect_tasks: "Queue[MaintenanceTask]" = Queue()
+        self._connectors: List[threading.Thread] = []
+
+        # Set in a child process after fork: the pool threads must be started
+        self._restart_needed = False
+
         super().__init__(conninfo, **kwargs)
 
+        self._start()
+        _pools.add(self)
+
+    def _start(self) -> None:
+        """
+        Start the pool threads and the tasks to populate and maintain it.
+        """
         self._sched_runner = threading.Thread(
             target=self._sched.run, name=f"{self.name}-scheduler", daemon=True
         )
@@ -64,10 +90,18 @@ class ConnectionPool(BasePool[Connection[Any]]):
                 daemon=True,
             )
             self._workers.append(t)
+        for i in range(self.connect_concurrency or 0):
+            t = threading.Thread(
+                target=self.worker,
+                args=(self._connect_tasks,),
+                name=f"{self.name}-connector-{i}",
+                daemon=True,
+            )
+            self._connectors.append(t)
 
         # The object state is complete. Start the worker threads
         self._sched_runner.start()
-        for t in self._workers:
+        for t in self._workers + self._connectors:
             t.start()
 
         # populate the pool with initial min_size connections in background
@@ -78,6 +112,51 @@ class ConnectionPool(BasePool[Connection[Any]]):
         # remained unused.
         self.schedule_task(ShrinkPool(self), self.max_idle)
 
+        # Schedule a task to verify the idle connections periodically.
+        if self.check_interval:
+            self.schedule_task(CheckPool(self), self.check_interval)
+
+    def _after_fork(self) -> None:
+        """
+        Make the pool usable in a child process after fork().
+
+        The pool threads don't exist in the child and its locks and queues
+        might have been copied in an inconsistent state: replace them, and
+        start the pool again on its first use. The connections in the pool
+        are shared with the parent: detach the child from their sockets and
+        discard them without affecting the parent. The connections in use
+        during the fork will be discarded the same way when returned.
+        """
+        self._lock = threading.RLock()
+        self._stats_lock = threading.Lock()
+        self._typeinfos_lock = threading.Lock()
+        self._waiting = deque()
+        self._pool_full_event = None
+        self._sched = Scheduler()
+        self._tasks = Queue()
+        self._workers = []
+        self._connect_tasks = Queue()
+        self._connectors = []
+
+        for conn in self._drain_pool():
+            _detach(conn)
+
+        self._nconns = self._min_size
+        self._nconns_min = self._min_size
+        self._growing = 0
+        self._restart_needed = True
+
+    def _restart(self) -> None:
+        """
+        Start the pool in a child process, after fork().
+        """
+        with self._lock:
+            if not self._restart_needed:
+                return
+            self._restart_needed = False
+            logger.info("restarting pool %r after fork", self.name)
+            self._start()
+
     def __del__(self) -> None:
         # If the '_closed' property is not set we probably failed in __init__.
         # Don't try anything complicated as probably it won't work.
@@ -94,6 +173,8 @@ class ConnectionPool(BasePool[Connection[Any]]):
         # Stop the worker threads
         for i in range(len(self._workers)):
             self.run_task(StopWorker(self))
+        for i in range(len(self._connectors)):
+            self._connect_tasks.put_nowait(StopWorker(self))
 
     def wait(self, timeout: float = 30.0) -> None:
         """
@@ -107,6 +188,9 @@ class ConnectionPool(BasePool[Connection[Any]]):
         program to terminate in case the environment is not configured
         properly, rather than trying to stay up the hardest it can.
         """
+        if self._restart_needed:
+            self._restart()
+
         with self._lock:
             assert not self._pool_full_event
             if len(self._pool) >= self._nconns:
@@ -115,9 +199,12 @@ class ConnectionPool(BasePool[Connection[Any]]):
 
         logger.info("waiting for pool %r initialization", self.name)
         if not self._pool_full_event.wait(timeout):
+            with self._lock:
+                progress = self._wait_progress()
             self.close()  # stop all the threads
             raise PoolTimeout(
-                f"pool initialization incomplete after {timeout} sec"
+                f"pool initialization incomplete after {timeout} sec:"
+                f" {progress}"
             )
 
         with self._lock:
@@ -128,13 +215,14 @@ class ConnectionPool(BasePool[Connection[Any]]):
 
     @contextmanager
     def connection(
-        self, timeout: Optional[float] = None
+        self, timeout: Optional[float] = None, priority: int = 0
     ) -> Iterator[Connection[Any]]:
         """Context manager to obtain a connection from the pool.
 
         Return the connection immediately if available, otherwise wait up to
         *timeout* or `self.timeout` seconds and throw `PoolTimeout` if a
-        connection is not available in time.
+        connection is not available in time. If the client has to wait, it is
+        served before the clients waiting with a lower *priority*.
 
         Upon context exit, return the connection to the pool. Apply the normal
         :ref:`connection context behaviour <with-connection>` (commit/rollback
@@ -142,17 +230,19 @@ class ConnectionPool(BasePool[Connection[Any]]):
         in working state replace it with a new one.
 
         """
-        conn = self.getconn(timeout=timeout)
+        conn = self.getconn(timeout=timeout, priority=priority)
         t0 = monotonic()
         try:
             with conn:
                 yield conn
         finally:
             t1 = monotonic()
-            self._stats[self._USAGE_MS] += int(1000.0 * (t1 - t0))
+            self._record_ms(self._USAGE_MS, t0, t1)
             self.putconn(conn)
 
-    def getconn(self, timeout: Optional[float] = None) -> Connection[Any]:
+    def getconn(
+        self, timeout: Optional[float] = None, priority: int = 0
+    ) -> Connection[Any]:
         """Obtain a contection from the pool.
 
         You should preferrably use `connection()`. Use this function only if
@@ -162,8 +252,36 @@ class ConnectionPool(BasePool[Connection[Any]]):
         failing to do so will deplete the pool. A depleted pool is a sad pool:
         you don't want a depleted pool.
         """
+        if self._restart_needed:
+            self._restart()
+
         logger.info("connection requested from %r", self.name)
         self._stats[self._REQUESTS_NUM] += 1
+        while True:
+            conn = self._getconn_unchecked(timeout, priority)
+            # If the connection was idle for long, make sure it still works.
+            if not self._must_check(conn) or self._check_connection(conn):
+                break
+            self._discard_broken(conn)
+
+        # Tell the connection it belongs to a pool to avoid closing on __exit__
+        # Note that this property shouldn't be set while the connection is in
+        # the pool, to avoid to create a reference loop.
+        conn._pool = self
+        logger.info("connection given by %r", self.name)
+        return conn
+
+    def _getconn_unchecked(
+        self, timeout: Optional[float], priority: int
+    ) -> Connection[Any]:
+        # Fast path: if there is a connection ready take it without locking.
+        # Adding connections or clients to the queue still happens under the
+        # lock, so a client can't miss a connection returned to the pool.
+        if not self._closed:
+            conn = self._pop_ready()
+            if conn is not None:
+                return conn
+
         # Critical section: decide here if there's a connection ready
         # or if the client needs to wait.
         with self._lock:
@@ -171,12 +289,8 @@ class ConnectionPool(BasePool[Connection[Any]]):
                 raise PoolClosed(f"the pool {self.name!r} is closed")
 
             pos: Optional[WaitingClient] = None
-            if self._pool:
-                # Take a connection ready out of the pool
-                conn = self._pool.popleft()
-                if len(self._pool) < self._nconns_min:
-                    self._nconns_min = len(self._pool)
-            else:
+            conn = self._pop_ready()
+            if conn is None:
                 if self.max_waiting and len(self._waiting) >= self.max_waiting:
                     self._stats[self._REQUESTS_ERRORS] += 1
                     raise TooManyRequests(
@@ -186,42 +300,105 @@ class ConnectionPool(BasePool[Connection[Any]]):
 
                 # No connection available: put the client in the waiting queue
                 t0 = monotonic()
-                pos = WaitingClient()
-                self._waiting.append(pos)
+                if timeout is None:
+                    timeout = self.timeout
+                pos = WaitingClient(timeout, priority)
+                self._enqueue(pos)
                 self._stats[self._REQUESTS_QUEUED] += 1
 
+                # A connection may have been returned without locking after
+                # we checked the pool: if so pass it to the clients waiting.
+                self._serve_waiting()
+
                 # If there is space for the pool to grow, let's do it
-                # Allow only one thread at time to grow the pool (or returning
-                # connections might be starved).
-                if self._nconns < self._max_size and not self._growing:
-                    self._nconns += 1
-                    logger.info(
-                        "growing pool %r to %s", self.name, self._nconns
-                    )
-                    self._growing = True
-                    self.run_task(AddConnection(self, growing=True))
+                self._grow(self._grow_size(len(self._waiting)))
 
         # If we are in the waiting queue, wait to be assigned a connection
         # (outside the critical section, so only the waiting client is locked)
         if pos:
-            if timeout is None:
-                timeout = self.timeout
             try:
-                conn = pos.wait(timeout=timeout)
+                conn = pos.wait()
             except Exception:
                 self._stats[self._REQUESTS_ERRORS] += 1
                 raise
             finally:
                 t1 = monotonic()
-                self._stats[self._REQUESTS_WAIT_MS] += int(1000.0 * (t1 - t0))
+                self._record_ms(self._REQUESTS_WAIT_MS, t0, t1)
 
-        # Tell the connection it belongs to a pool to avoid closing on __exit__
-        # Note that this property shouldn't be set while the connection is in
-        # the pool, to avoid to create a reference loop.
-        conn._pool = self
-        logger.info("connection given by %r", self.name)
+        assert conn
         return conn
 
+    def _pop_ready(self) -> Optional[Connection[Any]]:
+        """
+        Take a connection ready out of the pool, if any.
+
+        Popping from the deque is atomic, so the function can be called without
+        holding the lock.
+        """
+        # Connections are returned on the right: with the lifo policy serve
+        # the most recently used, leaving the others idle to be shrunk.
+        try:
+            conn = self._pool.pop() if self._lifo else self._pool.popleft()
+        except IndexError:
+            return None
+
+        # We may not hold the pool lock: update the stats under their lock.
+        with self._stats_lock:
+            nconns = len(self._pool)
+            if nconns < self._nconns_min:
+                self._nconns_min = nconns
+            # Record the requests served immediately too, otherwise the
+            # wait time percentiles would be meaningless.
+            self._add_ms(self._REQUESTS_WAIT_MS, 0)
+        return conn
+
+    def _serve_waiting(self) -> None:
+        """
+        Pass the connections in the pool to the clients waiting, if any.
+
+        Must be called with the lock held.
+        """
+        while self._waiting:
+            try:
+                conn = self._pool.pop() if self._lifo else self._pool.popleft()
+            except IndexError:
+                return
+
+            while self._waiting:
+                if self._waiting.popleft().set(conn):
+                    break
+            else:
+                self._pool.append(conn)
+
+    def _drain_pool(self) -> List[Connection[Any]]:
+        """
+        Take all the connections out of the pool.
+
+        Pop them one at time, as clients may be taking them concurrently.
+        """
+        rv: List[Connection[Any]] = []
+        while True:
+            try:
+                rv.append(self._pool.popleft())
+            except IndexError:
+                return rv
+
+    def _enqueue(self, pos: "WaitingClient") -> None:
+        """
+        Add a client to the waiting queue, after the ones with higher or equal
+        priority.
+
+        Must be called with the pool lock held.
+        """
+        if not self._waiting or self._waiting[-1].priority >= pos.priority:
+            self._waiting.append(pos)
+            return
+
+        for i, other in enumerate(self._waiting):
+            if other.priority < pos.priority:
+                self._waiting.insert(i, pos)
+                break
+
     def putconn(self, conn: Connection[Any]) -> None:
         """Return a connection to the loving hands of its pool.
 
@@ -241,6 +418,17 @@ class ConnectionPool(BasePool[Connection[Any]]):
 
         logger.info("returning connection to %r", self.name)
 
+        # If the connection was in use when the process forked, it is shared
+        # with the parent: discard it without affecting the parent's session.
+        # The pool doesn't count it in the child, so don't replace it.
+        if conn._pool_pid != os.getpid():
+            logger.warning(
+                "discarding connection created by another process: %s", conn
+            )
+            conn._pool = None
+            _detach(conn)
+            return
+
         # If the pool is closed just close the connection instead of returning
         # it to the pool. For extra refcare remove the pool reference from it.
         if self._closed:
@@ -249,7 +437,10 @@ class ConnectionPool(BasePool[Connection[Any]]):
             return
 
         # Use a worker to perform eventual maintenance work in a separate thread
-        if self._reset:
+        # If the reset is a command, skip it if the session wasn't changed.
+        if self._reset and (
+            not isinstance(self._reset, str) or conn._session_changed
+        ):
             self.run_task(ReturnConnection(self, conn))
         else:
             self._return_connection(conn)
@@ -275,8 +466,7 @@ class ConnectionPool(BasePool[Connection[Any]]):
             # Take waiting client and pool connections out of the state
             waiting = list(self._waiting)
             self._waiting.clear()
-            pool = list(self._pool)
-            self._pool.clear()
+            pool = self._drain_pool()
 
         # Now that the flag _closed is set, getconn will fail immediately,
         # putconn will just close the returned connection.
@@ -287,6 +477,8 @@ class ConnectionPool(BasePool[Connection[Any]]):
         # Stop the worker threads
         for i in range(len(self._workers)):
             self.run_task(StopWorker(self))
+        for i in range(len(self._connectors)):
+            self._connect_tasks.put_nowait(StopWorker(self))
 
         # Signal to eventual clients in the queue that business is closed.
         for pos in waiting:
@@ -298,7 +490,7 @@ class ConnectionPool(BasePool[Connection[Any]]):
 
         # Wait for the worker threads to terminate
         if timeout > 0:
-            for t in [self._sched_runner] + self._workers:
+            for t in [self._sched_runner] + self._workers + self._connectors:
                 if not t.is_alive():
                     continue
                 t.join(timeout)
@@ -351,19 +543,14 @@ class ConnectionPool(BasePool[Connection[Any]]):
         dispose of it and create a new one.
         """
         with self._lock:
-            conns = list(self._pool)
-            self._pool.clear()
+            conns = self._drain_pool()
 
         while conns:
             conn = conns.pop()
-            try:
-                conn.execute("SELECT 1")
-            except Exception:
-                self._stats[self._CONNECTIONS_LOST] += 1
-                logger.warning("discarding broken connection: %s", conn)
-                self.run_task(AddConnection(self))
-            else:
+            if self._check_connection(conn):
                 self._add_to_pool(conn)
+            else:
+                self._discard_broken(conn)
 
     def reconnect_failed(self) -> None:
         """
@@ -373,7 +560,10 @@ class ConnectionPool(BasePool[Connection[Any]]):
 
     def run_task(self, task: "MaintenanceTask") -> None:
         """Run a maintenance task in a worker thread."""
-        self._tasks.put_nowait(task)
+        if self._connectors and isinstance(task, AddConnection):
+            self._connect_tasks.put_nowait(task)
+        else:
+            self._tasks.put_nowait(task)
 
     def schedule_task(self, task: "MaintenanceTask", delay: float) -> None:
         """Run a maintenance task in a worker thread in the future."""
@@ -417,6 +607,34 @@ class ConnectionPool(BasePool[Connection[Any]]):
                     ex,
                 )
 
+    def _check_connection(self, conn: Connection[Any]) -> bool:
+        """Return True if an idle connection is still working."""
+        try:
+            with conn.lock:
+                conn.wait(probe(conn.pgconn))
+        except Exception:
+            return False
+        else:
+            return True
+
+    def _discard_broken(self, conn: Connection[Any]) -> None:
+        """Close a connection found broken and replace it with a new one."""
+        self._stats[self._CONNECTIONS_LOST] += 1
+        logger.warning("discarding broken connection: %s", conn)
+        conn.close()
+        self.run_task(AddConnection(self))
+
+    def _check_idle_connections(self) -> None:
+        """Verify a few of the connections idle in the pool."""
+        with self._lock:
+            conns = self._pop_to_check()
+
+        for conn in conns:
+            if self._check_connection(conn):
+                self._add_to_pool(conn, checked=True)
+            else:
+                self._discard_broken(conn)
+
     def _connect(self) -> Connection[Any]:
         """Return a new connection configured for the pool."""
         self._stats[self._CONNECTIONS_NUM] += 1
@@ -429,9 +647,13 @@ class ConnectionPool(BasePool[Connection[Any]]):
             raise
         else:
             t1 = monotonic()
-            self._stats[self._CONNECTIONS_MS] += int(1000.0 * (t1 - t0))
+            self._record_ms(self._CONNECTIONS_MS, t0, t1)
 
         conn._pool = self
+        conn._pool_pid = os.getpid()
+
+        if self.warmup:
+            self._warm_up(conn)
 
         if self._configure:
             self._configure(conn)
@@ -443,12 +665,50 @@ class ConnectionPool(BasePool[Connection[Any]]):
                     f" {self._configure}: discarded"
                 )
 
+        if self.prepared_warmup:
+            conn._prepared.on_prepared = partial(
+                self._count_prepared, ref(self)
+            )
+            keys = self._prepared_to_warm_up()
+            if keys:
+                with conn.lock:
+                    conn.wait(conn._prepared.prepare_gen(conn.pgconn, keys))
+
+        if isinstance(self._reset, str):
+            conn._session_changed = False
+
         # Set an expiry date, with some randomness to avoid mass reconnection
         conn._expire_at = monotonic() + self._jitter(
             self.max_lifetime, -0.05, 0.0
         )
         return conn
 
+    def _warm_up(self, conn: Connection[Any]) -> None:
+        """Apply the `warmup` specification to a new connection."""
+        assert self.warmup
+        cmd = self.warmup.settings_command()
+        if cmd:
+            with conn.lock:
+                conn.wait(conn._exec_command(cmd))
+
+        for cls, tname, register in self.warmup.types:
+            with self._typeinfos_lock:
+                info = self._typeinfos.get((cls, tname))
+                if not info:
+                    info = cls.fetch(conn, tname)
+                    if not info:
+                        logger.warning(
+                            "type %r not found in the database", tname
+                        )
+                        continue
+                    self._typeinfos[cls, tname] = info
+            register(info, conn)
+
+        keys = self.warmup.statements_keys(conn)
+        if keys:
+            with conn.lock:
+                conn.wait(conn._prepared.prepare_gen(conn.pgconn, keys))
+
     def _add_connection(
         self, attempt: Optional[ConnectionAttempt], growing: bool = False
     ) -> None:
@@ -477,6 +737,8 @@ class ConnectionPool(BasePool[Connection[Any]]):
                 )
                 with self._lock:
                     self._nconns -= 1
+                    if growing:
+                        self._growing -= 1
                 self.reconnect_failed()
             else:
                 attempt.update_delay(now)
@@ -490,14 +752,22 @@ class ConnectionPool(BasePool[Connection[Any]]):
         self._add_to_pool(conn)
         if growing:
             with self._lock:
-                if self._nconns < self._max_size and self._waiting:
-                    self._nconns += 1
-                    logger.info(
-                        "growing pool %r to %s", self.name, self._nconns
-                    )
-                    self.run_task(AddConnection(self, growing=True))
-                else:
-                    self._growing = False
+                self._growing -= 1
+                self._grow(self._grow_size(len(self._waiting)))
+
+    def _grow(self, n: int) -> None:
+        """
+        Add *n* connections to the pool to serve the clients waiting.
+
+        Must be called with the pool lock held.
+        """
+        if n <= 0:
+            return
+        self._nconns += n
+        self._growing += n
+        logger.info("growing pool %r to %s", self.name, self._nconns)
+        for i in range(n):
+            self.run_task(AddConnection(self, growing=True))
 
     def _return_connection(self, conn: Connection[Any]) -> None:
         """
@@ -520,19 +790,36 @@ class ConnectionPool(BasePool[Connection[Any]]):
 
         self._add_to_pool(conn)
 
-    def _add_to_pool(self, conn: Connection[Any]) -> None:
+    def _add_to_pool(
+        self, conn: Connection[Any], checked: bool = False
+    ) -> None:
         """
         Add a connection to the pool.
 
         The connection can be a fresh one or one already used in the pool.
 
         If a client is already waiting for a connection pass it on, otherwise
-        put it back into the pool
+        put it back into the pool. If *checked* the connection was only taken
+        out of the pool to be verified: put it back at the end of the pool
+        holding the least recently used connections.
         """
         # Remove the pool reference from the connection before returning it
         # to the state, to avoid to create a reference loop.
         # Also disable the warning for open connection in conn.__del__
         conn._pool = None
+        conn._checked_at = monotonic()
+
+        # Fast path: if no client is waiting put the connection back into the
+        # pool without locking. Check again after adding it: a client may
+        # have started waiting, or wait() may have started waiting for the
+        # pool to be full, in the meantime, not finding the connection.
+        if not (self._waiting or self._pool_full_event or checked):
+            self._pool.append(conn)
+            if self._waiting or self._pool_full_event:
+                with self._lock:
+                    self._serve_waiting()
+                    self._notify_pool_full()
+            return
 
         pos: Optional[WaitingClient] = None
 
@@ -547,12 +834,24 @@ class ConnectionPool(BasePool[Connection[Any]]):
                     break
             else:
                 # No client waiting for a connection: put it back into the pool
-                self._pool.append(conn)
+                if checked:
+                    self._pool.appendleft(conn)
+                else:
+                    self._pool.append(conn)
 
-                # If we have been asked to wait for pool init, notify the
-                # waiter if the pool is full.
-                if self._pool_full_event and len(self._pool) >= self._nconns:
-                    self._pool_full_event.set()
+                self._notify_pool_full()
+
+    def _notify_pool_full(self) -> None:
+        """
+        Notify the waiter of the pool init, if any, if the pool is full.
+
+        Must be called with the lock held.
+        """
+        if self._pool_full_event:
+            if len(self._pool) >= self._nconns:
+                self._pool_full_event.set()
+            else:
+                logger.info("pool %r: %s", self.name, self._wait_progress())
 
     def _reset_connection(self, conn: Connection[Any]) -> None:
         """
@@ -565,6 +864,10 @@ class ConnectionPool(BasePool[Connection[Any]]):
         elif status in (TransactionStatus.INTRANS, TransactionStatus.INERROR):
             # Connection returned with an active transaction
             logger.warning("rolling back returned connection: %s", conn)
+            if isinstance(self._reset, str) and conn._session_changed:
+                # Roll back and reset the session in a single round trip
+                self._reset_session(conn, rollback=True)
+                return
             try:
                 conn.rollback()
             except Exception as ex:
@@ -581,33 +884,75 @@ class ConnectionPool(BasePool[Connection[Any]]):
             logger.warning("closing returned connection: %s", conn)
             conn.close()
 
-        if not conn.closed and self._reset:
-            try:
-                self._reset(conn)
-                status = conn.pgconn.transaction_status
-                if status != TransactionStatus.IDLE:
-                    nstatus = TransactionStatus(status).name
-                    raise e.ProgrammingError(
-                        f"connection left in status {nstatus} by reset function"
-                        f" {self._reset}: discarded"
-                    )
-            except Exception as ex:
-                logger.warning(f"error resetting connection: {ex}")
-                conn.close()
+        if conn.closed or not self._reset:
+            return
+
+        if isinstance(self._reset, str):
+            if conn._session_changed:
+                self._reset_session(conn)
+            return
+
+        try:
+            self._reset(conn)
+            status = conn.pgconn.transaction_status
+            if status != TransactionStatus.IDLE:
+                nstatus = TransactionStatus(status).name
+                raise e.ProgrammingError(
+                    f"connection left in status {nstatus} by reset function"
+                    f" {self._reset}: discarded"
+                )
+        except Exception as ex:
+            logger.warning(f"error resetting connection: {ex}")
+            conn.close()
+
+    def _reset_session(
+        self, conn: Connection[Any], rollback: bool = False
+    ) -> None:
+        """
+        Run the reset command on a connection, optionally after a rollback.
+        """
+        assert isinstance(self._reset, str)
+        command = f"ROLLBACK; {self._reset}" if rollback else self._reset
+        try:
+            with conn.lock:
+                try:
+                    conn.wait(conn._exec_command(command))
+                except e.ActiveSqlTransaction:
+                    # Some commands (e.g. DISCARD ALL) cannot run in the same
+                    # query of the ROLLBACK: run them on their own.
+                    if not rollback:
+                        raise
+                    conn.wait(conn._exec_command(self._reset))
+        except Exception as ex:
+            logger.warning(f"error resetting connection: {ex}")
+            conn.close()
+            return
+
+        conn._session_changed = False
+        if self._reset_deallocates:
+            conn._prepared.clear()
 
     def _shrink_pool(self) -> None:
-        to_close: Optional[Connection[Any]] = None
+        to_close: List[Connection[Any]] = []
 
         with self._lock:
             # Reset the min number of connections used
-            nconns_min = self._nconns_min
-            self._nconns_min = len(self._pool)
-
-            # If the pool can shrink and connections were unused, drop one
-            if self._nconns > self._min_size and nconns_min > 0:
-                to_close = self._pool.popleft()
+            with self._stats_lock:
+                nconns_min = self._nconns_min
+                self._nconns_min = len(self._pool)
+
+            # If the pool can shrink and connections were unused, drop some.
+            # The ones on the left are the least recently used.
+            nclose = min(self._shrink_size(nconns_min), len(self._pool))
+            for i in range(nclose):
+                # Clients might have taken the connections in the meantime.
+                try:
+                    to_close.append(self._pool.popleft())
+                except IndexError:
+                    break
                 self._nconns -= 1
-                self._nconns_min -= 1
+                with self._stats_lock:
+                    self._nconns_min -= 1
 
         if to_close:
             logger.info(
@@ -618,7 +963,8 @@ class ConnectionPool(BasePool[Connection[Any]]):
                 nconns_min,
                 self.max_idle,
             )
-            to_close.close()
+            for conn in to_close:
+                conn.close()
 
     def _get_measures(self) -> Dict[str, int]:
         rv = super()._get_measures()
@@ -626,12 +972,50 @@ class ConnectionPool(BasePool[Connection[Any]]):
         return rv
 
 
+def _detach(conn: Connection[Any]) -> None:
+    """
+    Close a connection inherited from the parent process after fork().
+
+    Redirect the connection socket to /dev/null before closing it, so that
+    nothing is sent to the server on the parent's session.
+    """
+    try:
+        fd = conn.pgconn.socket
+    except e.OperationalError:
+        pass
+    else:
+        devnull = os.open(os.devnull, os.O_RDWR)
+        try:
+            os.dup2(devnull, fd)
+        finally:
+            os.close(devnull)
+    conn.close()
+
+
+# The pools to make usable in a child process after fork()
+_pools: "WeakSet[ConnectionPool]" = WeakSet()
+
+
+def _after_fork_in_child() -> None:
+    for pool in list(_pools):
+        if not pool.closed:
+            pool._after_fork()
+
+
+# Available on Unix from Python 3.7
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
 class WaitingClient:
     """A position in a queue for a client waiting for a connection."""
 
-    __slots__ = ("conn", "error", "_cond")
+    __slots__ = ("conn", "error", "timeout", "priority", "deadline", "_cond")
 
-    def __init__(self) -> None:
+    def __init__(self, timeout: float, priority: int = 0):
+        self.timeout = timeout
+        self.priority = priority
+        self.deadline = monotonic() + timeout
         self.conn: Optional[Connection[Any]] = None
         self.error: Optional[Exception] = None
 
@@ -642,17 +1026,15 @@ class WaitingClient:
         # will be lost.
         self._cond = threading.Condition()
 
-    def wait(self, timeout: float) -> Connection[Any]:
+    def wait(self) -> Connection[Any]:
         """Wait for a connection to be set and return it.
 
         Raise an exception if the wait times out or if fail() is called.
         """
         with self._cond:
             if not (self.conn or self.error):
-                if not self._cond.wait(timeout):
-                    self.error = PoolTimeout(
-                        f"couldn't get a connection after {timeout} sec"
-                    )
+                if not self._cond.wait(max(0.0, self.deadline - monotonic())):
+                    self._timed_out()
 
         if self.conn:
             return self.conn
@@ -670,6 +1052,12 @@ class WaitingClient:
             if self.conn or self.error:
                 return False
 
+            # Don't hand a connection to a client which would throw it away.
+            if monotonic() >= self.deadline:
+                self._timed_out()
+                self._cond.notify_all()
+                return False
+
             self.conn = conn
             self._cond.notify_all()
             return True
@@ -688,6 +1076,11 @@ class WaitingClient:
             self._cond.notify_all()
             return True
 
+    def _timed_out(self) -> None:
+        self.error = PoolTimeout(
+            f"couldn't get a connection after {self.timeout} sec"
+        )
+
 
 class MaintenanceTask(ABC):
     """A task to run asynchronously to maintain the pool state."""
@@ -759,6 +1152,18 @@ class AddConnection(MaintenanceTask):
         pool._add_connection(self.attempt, growing=self.growing)
 
 
+class CheckPool(MaintenanceTask):
+    """Verify a few idle connections and replace the broken ones.
+
+    Re-schedule periodically.
+    """
+
+    def _run(self, pool: "ConnectionPool") -> None:
+        assert pool.check_interval
+        pool.schedule_task(self, pool.check_interval)
+        pool._check_idle_connections()
+
+
 class ReturnConnection(MaintenanceTask):
     """Clean up and return a connection to the pool."""
 
@@ -11,8 +11,9 @@ from abc import ABC, abstractmethod
 from time import monotonic
 from types import TracebackType
 from typing import Any, AsyncIterator, Awaitable, Callable, Deque
-from typing import Dict, List, Optional, Type
+from typing import Dict, List, Optional, Type, Union
 from weakref import ref
+from functools import partial
 from collections import deque
 
 from psycopg import errors as e
@@ -20,7 +21,7 @@ from psycopg.pq import TransactionStatus
 from psycopg._compat import Task, asynccontextmanager, create_task
 from psycopg.connection_async import AsyncConnection
 
-from .base import ConnectionAttempt, BasePool
+from .base import ConnectionAttempt, BasePool, DEALLOCATING_RESET, probe
 from .sched import AsyncScheduler
 from .errors import PoolClosed, PoolTimeout, TooManyRequests
 
@@ -36,8 +37,8 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         configure: Optional[
             Callable[[AsyncConnection[Any]], Awaitable[None]]
         ] = None,
-        reset: Optional[
-            Callable[[AsyncConnection[Any]], Awaitable[None]]
+        reset: Union[
+            None, str, Callable[[AsyncConnection[Any]], Awaitable[None]]
         ] = None,
         **kwargs: Any,
     ):
@@ -51,7 +52,16 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         self._configure = configure
         self._reset = reset
 
+        # If the reset is a command dropping the prepared statements, the
+        # connection must forget them after running it.
+        self._reset_deallocates = bool(
+            isinstance(reset, str) and DEALLOCATING_RESET.search(reset)
+        )
+
         self._lock = asyncio.Lock()
+
+        # to fetch the types of the warmup only once
+        self._typeinfos_lock = asyncio.Lock()
         self._waiting: Deque["AsyncClient"] = deque()
 
         # to notify that the pool is full
@@ -61,6 +71,11 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         self._tasks: "asyncio.Queue[MaintenanceTask]" = asyncio.Queue()
         self._workers: List[Task[None]] = []
 
+        # Queue and tasks dedicated to create connections, if the pool
+        # has a connect_concurrency.
+        self._connect_tasks: "asyncio.Queue[MaintenanceTask]" = asyncio.Queue()
+        self._connectors: List[Task[None]] = []
+
         super().__init__(conninfo, **kwargs)
 
         self._sched_runner = create_task(
@@ -72,6 +87,12 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
                 name=f"{self.name}-worker-{i}",
             )
             self._workers.append(t)
+        for i in range(self.connect_concurrency or 0):
+            t = create_task(
+                self.worker(self._connect_tasks),
+                name=f"{self.name}-connector-{i}",
+            )
+            self._connectors.append(t)
 
         # populate the pool with initial min_size connections in background
         for i in range(self._nconns):
@@ -81,6 +102,10 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         # remained unused.
         self.run_task(Schedule(self, ShrinkPool(self), self.max_idle))
 
+        # Schedule a task to verify the idle connections periodically.
+        if self.check_interval:
+            self.run_task(Schedule(self, CheckPool(self), self.check_interval))
+
     async def wait(self, timeout: float = 30.0) -> None:
         async with self._lock:
             assert not self._pool_full_event
@@ -92,9 +117,12 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         try:
             await asyncio.wait_for(self._pool_full_event.wait(), timeout)
         except asyncio.TimeoutError:
+            async with self._lock:
+                progress = self._wait_progress()
             await self.close()  # stop all the threads
             raise PoolTimeout(
-                f"pool initialization incomplete after {timeout} sec"
+                f"pool initialization incomplete after {timeout} sec:"
+                f" {progress}"
             ) from None
 
         async with self._lock:
@@ -105,23 +133,42 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
 
     @asynccontextmanager
     async def connection(
-        self, timeout: Optional[float] = None
+        self, timeout: Optional[float] = None, priority: int = 0
     ) -> AsyncIterator[AsyncConnection[Any]]:
-        conn = await self.getconn(timeout=timeout)
+        conn = await self.getconn(timeout=timeout, priority=priority)
         t0 = monotonic()
         try:
             async with conn:
                 yield conn
         finally:
             t1 = monotonic()
-            self._stats[self._USAGE_MS] += int(1000.0 * (t1 - t0))
+            self._record_ms(self._USAGE_MS, t0, t1)
             await self.putconn(conn)
 
     async def getconn(
-        self, timeout: Optional[float] = None
+        self, timeout: Optional[float] = None, priority: int = 0
     ) -> AsyncConnection[Any]:
         logger.info("connection requested from %r", self.name)
         self._stats[self._REQUESTS_NUM] += 1
+        while True:
+            conn = await self._getconn_unchecked(timeout, priority)
+            # If the connection was idle for long, make sure it still works.
+            if not self._must_check(conn):
+                break
+            if await self._check_connection(conn):
+                break
+            await self._discard_broken(conn)
+
+        # Tell the connection it belongs to a pool to avoid closing on __exit__
+        # Note that this property shouldn't be set while the connection is in
+        # the pool, to avoid to create a reference loop.
+        conn._pool = self
+        logger.info("connection given by %r", self.name)
+        return conn
+
+    async def _getconn_unchecked(
+        self, timeout: Optional[float], priority: int
+    ) -> AsyncConnection[Any]:
         # Critical section: decide here if there's a connection ready
         # or if the client needs to wait.
         async with self._lock:
@@ -130,10 +177,18 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
 
             pos: Optional[AsyncClient] = None
             if self._pool:
-                # Take a connection ready out of the pool
-                conn = self._pool.popleft()
+                # Take a connection ready out of the pool. Connections are
+                # returned on the right: with the lifo policy serve the most
+                # recently used, leaving the others idle to be shrunk.
+                if self._lifo:
+                    conn = self._pool.pop()
+                else:
+                    conn = self._pool.popleft()
                 if len(self._pool) < self._nconns_min:
                     self._nconns_min = len(self._pool)
+                # Record the requests served immediately too, otherwise the
+                # wait time percentiles would be meaningless.
+                self._observe_ms(self._REQUESTS_WAIT_MS, 0)
             else:
                 if self.max_waiting and len(self._waiting) >= self.max_waiting:
                     self._stats[self._REQUESTS_ERRORS] += 1
@@ -144,41 +199,45 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
 
                 # No connection available: put the client in the waiting queue
                 t0 = monotonic()
-                pos = AsyncClient()
-                self._waiting.append(pos)
+                if timeout is None:
+                    timeout = self.timeout
+                pos = AsyncClient(timeout, priority)
+                self._enqueue(pos)
                 self._stats[self._REQUESTS_QUEUED] += 1
 
-                # Allow only one thread at time to grow the pool (or returning
-                # connections might be starved).
-                if self._nconns < self._max_size and not self._growing:
-                    self._nconns += 1
-                    logger.info(
-                        "growing pool %r to %s", self.name, self._nconns
-                    )
-                    self._growing = True
-                    self.run_task(AddConnection(self, growing=True))
+                # If there is space for the pool to grow, let's do it
+                self._grow(self._grow_size(len(self._waiting)))
 
         # If we are in the waiting queue, wait to be assigned a connection
         # (outside the critical section, so only the waiting client is locked)
         if pos:
-            if timeout is None:
-                timeout = self.timeout
             try:
-                conn = await pos.wait(timeout=timeout)
+                conn = await pos.wait()
             except Exception:
                 self._stats[self._REQUESTS_ERRORS] += 1
                 raise
             finally:
                 t1 = monotonic()
-                self._stats[self._REQUESTS_WAIT_MS] += int(1000.0 * (t1 - t0))
+                self._record_ms(self._REQUESTS_WAIT_MS, t0, t1)
 
-        # Tell the connection it belongs to a pool to avoid closing on __exit__
-        # Note that this property shouldn't be set while the connection is in
-        # the pool, to avoid to create a reference loop.
-        conn._pool = self
-        logger.info("connection given by %r", self.name)
         return conn
 
+    def _enqueue(self, pos: "AsyncClient") -> None:
+        """
+        Add a client to the waiting queue, after the ones with higher or equal
+        priority.
+
+        Must be called with the pool lock held.
+        """
+        if not self._waiting or self._waiting[-1].priority >= pos.priority:
+            self._waiting.append(pos)
+            return
+
+        for i, other in enumerate(self._waiting):
+            if other.priority < pos.priority:
+                self._waiting.insert(i, pos)
+                break
+
     async def putconn(self, conn: AsyncConnection[Any]) -> None:
         # Quick check to discard the wrong connection
         pool = getattr(conn, "_pool", None)
@@ -201,7 +260,10 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
             return
 
         # Use a worker to perform eventual maintenance work in a separate thread
-        if self._reset:
+        # If the reset is a command, skip it if the session wasn't changed.
+        if self._reset and (
+            not isinstance(self._reset, str) or conn._session_changed
+        ):
             self.run_task(ReturnConnection(self, conn))
         else:
             await self._return_connection(conn)
@@ -229,6 +291,8 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         # Stop the worker threads
         for w in self._workers:
             self.run_task(StopWorker(self))
+        for w in self._connectors:
+            self._connect_tasks.put_nowait(StopWorker(self))
 
         # Signal to eventual clients in the queue that business is closed.
         for pos in waiting:
@@ -239,7 +303,9 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
             await conn.close()
 
         # Wait for the worker threads to terminate
-        wait = asyncio.gather(self._sched_runner, *self._workers)
+        wait = asyncio.gather(
+            self._sched_runner, *self._workers, *self._connectors
+        )
         if timeout > 0:
             wait = asyncio.wait_for(asyncio.shield(wait), timeout=timeout)
         try:
@@ -293,14 +359,10 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
 
         while conns:
             conn = conns.pop()
-            try:
-                await conn.execute("SELECT 1")
-            except Exception:
-                self._stats[self._CONNECTIONS_LOST] += 1
-                logger.warning("discarding broken connection: %s", conn)
-                self.run_task(AddConnection(self))
-            else:
+            if await self._check_connection(conn):
                 await self._add_to_pool(conn)
+            else:
+                await self._discard_broken(conn)
 
     def reconnect_failed(self) -> None:
         """
@@ -310,7 +372,10 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
 
     def run_task(self, task: "MaintenanceTask") -> None:
         """Run a maintenance task in a worker thread."""
-        self._tasks.put_nowait(task)
+        if self._connectors and isinstance(task, AddConnection):
+            self._connect_tasks.put_nowait(task)
+        else:
+            self._tasks.put_nowait(task)
 
     async def schedule_task(
         self, task: "MaintenanceTask", delay: float
@@ -345,6 +410,34 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
                     ex,
                 )
 
+    async def _check_connection(self, conn: AsyncConnection[Any]) -> bool:
+        """Return True if an idle connection is still working."""
+        try:
+            async with conn.lock:
+                await conn.wait(probe(conn.pgconn))
+        except Exception:
+            return False
+        else:
+            return True
+
+    async def _discard_broken(self, conn: AsyncConnection[Any]) -> None:
+        """Close a connection found broken and replace it with a new one."""
+        self._stats[self._CONNECTIONS_LOST] += 1
+        logger.warning("discarding broken connection: %s", conn)
+        await conn.close()
+        self.run_task(AddConnection(self))
+
+    async def _check_idle_connections(self) -> None:
+        """Verify a few of the connections idle in the pool."""
+        async with self._lock:
+            conns = self._pop_to_check()
+
+        for conn in conns:
+            if await self._check_connection(conn):
+                await self._add_to_pool(conn, checked=True)
+            else:
+                await self._discard_broken(conn)
+
     async def _connect(self) -> AsyncConnection[Any]:
         """Return a new connection configured for the pool."""
         self._stats[self._CONNECTIONS_NUM] += 1
@@ -359,10 +452,13 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
             raise
         else:
             t1 = monotonic()
-            self._stats[self._CONNECTIONS_MS] += int(1000.0 * (t1 - t0))
+            self._record_ms(self._CONNECTIONS_MS, t0, t1)
 
         conn._pool = self
 
+        if self.warmup:
+            await self._warm_up(conn)
+
         if self._configure:
             await self._configure(conn)
             status = conn.pgconn.transaction_status
@@ -373,12 +469,52 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
                     f" {self._configure}: discarded"
                 )
 
+        if self.prepared_warmup:
+            conn._prepared.on_prepared = partial(
+                self._count_prepared, ref(self)
+            )
+            keys = self._prepared_to_warm_up()
+            if keys:
+                async with conn.lock:
+                    await conn.wait(
+                        conn._prepared.prepare_gen(conn.pgconn, keys)
+                    )
+
+        if isinstance(self._reset, str):
+            conn._session_changed = False
+
         # Set an expiry date, with some randomness to avoid mass reconnection
         conn._expire_at = monotonic() + self._jitter(
             self.max_lifetime, -0.05, 0.0
         )
         return conn
 
+    async def _warm_up(self, conn: AsyncConnection[Any]) -> None:
+        """Apply the `warmup` specification to a new connection."""
+        assert self.warmup
+        cmd = self.warmup.settings_command()
+        if cmd:
+            async with conn.lock:
+                await conn.wait(conn._exec_command(cmd))
+
+        for cls, tname, register in self.warmup.types:
+            async with self._typeinfos_lock:
+                info = self._typeinfos.get((cls, tname))
+                if not info:
+                    info = await cls.fetch(conn, tname)
+                    if not info:
+                        logger.warning(
+                            "type %r not found in the database", tname
+                        )
+                        continue
+                    self._typeinfos[cls, tname] = info
+            register(info, conn)
+
+        keys = self.warmup.statements_keys(conn)
+        if keys:
+            async with conn.lock:
+                await conn.wait(conn._prepared.prepare_gen(conn.pgconn, keys))
+
     async def _add_connection(
         self, attempt: Optional[ConnectionAttempt], growing: bool = False
     ) -> None:
@@ -407,6 +543,8 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
                 )
                 async with self._lock:
                     self._nconns -= 1
+                    if growing:
+                        self._growing -= 1
                 self.reconnect_failed()
             else:
                 attempt.update_delay(now)
@@ -420,14 +558,22 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         await self._add_to_pool(conn)
         if growing:
             async with self._lock:
-                if self._nconns < self._max_size and self._waiting:
-                    self._nconns += 1
-                    logger.info(
-                        "growing pool %r to %s", self.name, self._nconns
-                    )
-                    self.run_task(AddConnection(self, growing=True))
-                else:
-                    self._growing = False
+                self._growing -= 1
+                self._grow(self._grow_size(len(self._waiting)))
+
+    def _grow(self, n: int) -> None:
+        """
+        Add *n* connections to the pool to serve the clients waiting.
+
+        Must be called with the pool lock held.
+        """
+        if n <= 0:
+            return
+        self._nconns += n
+        self._growing += n
+        logger.info("growing pool %r to %s", self.name, self._nconns)
+        for i in range(n):
+            self.run_task(AddConnection(self, growing=True))
 
     async def _return_connection(self, conn: AsyncConnection[Any]) -> None:
         """
@@ -450,19 +596,24 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
 
         await self._add_to_pool(conn)
 
-    async def _add_to_pool(self, conn: AsyncConnection[Any]) -> None:
+    async def _add_to_pool(
+        self, conn: AsyncConnection[Any], checked: bool = False
+    ) -> None:
         """
         Add a connection to the pool.
 
         The connection can be a fresh one or one already used in the pool.
 
         If a client is already waiting for a connection pass it on, otherwise
-        put it back into the pool
+        put it back into the pool. If *checked* the connection was only taken
+        out of the pool to be verified: put it back at the end of the pool
+        holding the least recently used connections.
         """
         # Remove the pool reference from the connection before returning it
         # to the state, to avoid to create a reference loop.
         # Also disable the warning for open connection in conn.__del__
         conn._pool = None
+        conn._checked_at = monotonic()
 
         pos: Optional[AsyncClient] = None
 
@@ -477,12 +628,20 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
                     break
             else:
                 # No client waiting for a connection: put it back into the pool
-                self._pool.append(conn)
+                if checked:
+                    self._pool.appendleft(conn)
+                else:
+                    self._pool.append(conn)
 
                 # If we have been asked to wait for pool init, notify the
                 # waiter if the pool is full.
-                if self._pool_full_event and len(self._pool) >= self._nconns:
-                    self._pool_full_event.set()
+                if self._pool_full_event:
+                    if len(self._pool) >= self._nconns:
+                        self._pool_full_event.set()
+                    else:
+                        logger.info(
+                            "pool %r: %s", self.name, self._wait_progress()
+                        )
 
     async def _reset_connection(self, conn: AsyncConnection[Any]) -> None:
         """
@@ -495,6 +654,10 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
         elif status in (TransactionStatus.INTRANS, TransactionStatus.INERROR):
             # Connection returned with an active transaction
             logger.warning("rolling back returned connection: %s", conn)
+            if isinstance(self._reset, str) and conn._session_changed:
+                # Roll back and reset the session in a single round trip
+                await self._reset_session(conn, rollback=True)
+                return
             try:
                 await conn.rollback()
             except Exception as ex:
@@ -511,31 +674,67 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
             logger.warning("closing returned connection: %s", conn)
             await conn.close()
 
-        if not conn.closed and self._reset:
-            try:
-                await self._reset(conn)
-                status = conn.pgconn.transaction_status
-                if status != TransactionStatus.IDLE:
-                    nstatus = TransactionStatus(status).name
-                    raise e.ProgrammingError(
-                        f"connection left in status {nstatus} by reset function"
-                        f" {self._reset}: discarded"
-                    )
-            except Exception as ex:
-                logger.warning(f"error resetting connection: {ex}")
-                await conn.close()
+        if conn.closed or not self._reset:
+            return
+
+        if isinstance(self._reset, str):
+            if conn._session_changed:
+                await self._reset_session(conn)
+            return
+
+        try:
+            await self._reset(conn)
+            status = conn.pgconn.transaction_status
+            if status != TransactionStatus.IDLE:
+                nstatus = TransactionStatus(status).name
+                raise e.ProgrammingError(
+                    f"connection left in status {nstatus} by reset function"
+                    f" {self._reset}: discarded"
+                )
+        except Exception as ex:
+            logger.warning(f"error resetting connection: {ex}")
+            await conn.close()
+
+    async def _reset_session(
+        self, conn: AsyncConnection[Any], rollback: bool = False
+    ) -> None:
+        """
+        Run the reset command on a connection, optionally after a rollback.
+        """
+        assert isinstance(self._reset, str)
+        command = f"ROLLBACK; {self._reset}" if rollback else self._reset
+        try:
+            async with conn.lock:
+                try:
+                    await conn.wait(conn._exec_command(command))
+                except e.ActiveSqlTransaction:
+                    # Some commands (e.g. DISCARD ALL) cannot run in the same
+                    # query of the ROLLBACK: run them on their own.
+                    if not rollback:
+                        raise
+                    await conn.wait(conn._exec_command(self._reset))
+        except Exception as ex:
+            logger.warning(f"error resetting connection: {ex}")
+            await conn.close()
+            return
+
+        conn._session_changed = False
+        if self._reset_deallocates:
+            conn._prepared.clear()
 
     async def _shrink_pool(self) -> None:
-        to_close: Optional[AsyncConnection[Any]] = None
+        to_close: List[AsyncConnection[Any]] = []
 
         async with self._lock:
             # Reset the min number of connections used
             nconns_min = self._nconns_min
             self._nconns_min = len(self._pool)
 
-            # If the pool can shrink and connections were unused, drop one
-            if self._nconns > self._min_size and nconns_min > 0:
-                to_close = self._pool.popleft()
+            # If the pool can shrink and connections were unused, drop some.
+            # The ones on the left are the least recently used.
+            nclose = min(self._shrink_size(nconns_min), len(self._pool))
+            for i in range(nclose):
+                to_close.append(self._pool.popleft())
                 self._nconns -= 1
                 self._nconns_min -= 1
 
@@ -548,7 +747,8 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
                 nconns_min,
                 self.max_idle,
             )
-            await to_close.close()
+            for conn in to_close:
+                await conn.close()
 
     def _get_measures(self) -> Dict[str, int]:
         rv = super()._get_measures()
@@ -559,9 +759,12 @@ class AsyncConnectionPool(BasePool[AsyncConnection[Any]]):
 class AsyncClient:
     """A position in a queue for a client waiting for a connection."""
 
-    __slots__ = ("conn", "error", "_cond")
+    __slots__ = ("conn", "error", "timeout", "priority", "deadline", "_cond")
 
-    def __init__(self) -> None:
+    def __init__(self, timeout: float, priority: int = 0):
+        self.timeout = timeout
+        self.priority = priority
+        self.deadline = monotonic() + timeout
         self.conn: Optional[AsyncConnection[Any]] = None
         self.error: Optional[Exception] = None
 
@@ -572,7 +775,7 @@ class AsyncClient:
         # will be lost.
         self._cond = asyncio.Condition()
 
-    async def wait(self, timeout: float) -> AsyncConnection[Any]:
+    async def wait(self) -> AsyncConnection[Any]:
         """Wait for a connection to be set and return it.
 
         Raise an exception if the wait times out or if fail() is called.
@@ -580,11 +783,12 @@ class AsyncClient:
         async with self._cond:
             if not (self.conn or self.error):
                 try:
-                    await asyncio.wait_for(self._cond.wait(), timeout)
-                except asyncio.TimeoutError:
-                    self.error = PoolTimeout(
-                        f"couldn't get a connection after {timeout} sec"
+                    await asyncio.wait_for(
+                        self._cond.wait(),
+                        max(0.0, self.deadline - monotonic()),
                     )
+                except asyncio.TimeoutError:
+                    self._timed_out()
 
         if self.conn:
             return self.conn
@@ -602,6 +806,12 @@ class AsyncClient:
             if self.conn or self.error:
                 return False
 
+            # Don't hand a connection to a client which would throw it away.
+            if monotonic() >= self.deadline:
+                self._timed_out()
+                self._cond.notify_all()
+                return False
+
             self.conn = conn
             self._cond.notify_all()
             return True
@@ -620,6 +830,11 @@ class AsyncClient:
             self._cond.notify_all()
             return True
 
+    def _timed_out(self) -> None:
+        self.error = PoolTimeout(
+            f"couldn't get a connection after {self.timeout} sec"
+        )
+
 
 class MaintenanceTask(ABC):
     """A task to run asynchronously to maintain the pool state."""
@@ -685,6 +900,18 @@ class AddConnection(MaintenanceTask):
         await pool._add_connection(self.attempt, growing=self.growing)
 
 
+class CheckPool(MaintenanceTask):
+    """Verify a few idle connections and replace the broken ones.
+
+    Re-schedule periodically.
+    """
+
+    async def _run(self, pool: "AsyncConnectionPool") -> None:
+        assert pool.check_interval
+        await pool.schedule_task(self, pool.check_interval)
+        await pool._check_idle_connections()
+
+
 class ReturnConnection(MaintenanceTask):
     """Clean up and return a connection to the pool."""
 
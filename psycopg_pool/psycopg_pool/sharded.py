@@ -0,0 +1,220 @@
+"""
+A connection pool routing connections to several database shards by key.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+import hashlib
+import threading
+from bisect import bisect
+from time import monotonic
+from types import TracebackType
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from typing import Tuple, Type, TypeVar
+from contextlib import contextmanager
+
+from psycopg import Connection
+
+from .pool import ConnectionPool
+from .errors import PoolClosed
+
+T = TypeVar("T")
+
+# Number of points of every shard on the hash ring
+VNODES = 100
+
+
+class HashRing:
+    """
+    Map keys to shards using consistent hashing.
+
+    Every shard is mapped to *vnodes* points on a ring and a key is assigned
+    to the shard owning the first point following the key hash. Adding or
+    removing a shard only moves the keys of that shard.
+    """
+
+    __module__ = "psycopg_pool.sharded"
+
+    def __init__(self, names: Sequence[str], vnodes: int = VNODES):
+        if not names:
+            raise ValueError("at least one shard must be specified")
+        if len(set(names)) != len(names):
+            raise ValueError("the names of the shards must be unique")
+        if vnodes < 1:
+            raise ValueError("vnodes must be at least 1")
+
+        points: List[Tuple[int, str]] = sorted(
+            (_hash(f"{name}#{i}".encode()), name)
+            for name in names
+            for i in range(vnodes)
+        )
+        self._hashes = [p[0] for p in points]
+        self._names = [p[1] for p in points]
+
+    def get(self, key: Any) -> str:
+        """Return the name of the shard where *key* belongs."""
+        i = bisect(self._hashes, _hash(_key_bytes(key)))
+        return self._names[i if i < len(self._names) else 0]
+
+
+def _key_bytes(key: Any) -> bytes:
+    if isinstance(key, bytes):
+        return key
+    return str(key).encode()
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def check_names(names: Optional[Sequence[str]], nshards: int) -> List[str]:
+    """Return the names of the shards of a sharded pool."""
+    if names is None:
+        return [str(i) for i in range(nshards)]
+    if len(names) != nshards:
+        raise ValueError(
+            f"got {len(names)} names for {nshards} shards: they must be the"
+            " same"
+        )
+    return list(names)
+
+
+class ShardedPool:
+    """
+    A pool serving connections from several shards, chosen by key.
+    """
+
+    __module__ = "psycopg_pool"
+
+    _num_pool = 0
+
+    def __init__(
+        self,
+        conninfos: Sequence[str],
+        *,
+        names: Optional[Sequence[str]] = None,
+        name: Optional[str] = None,
+        vnodes: int = VNODES,
+        **kwargs: Any,
+    ):
+        snames = check_names(names, len(conninfos))
+        self.ring = HashRing(snames, vnodes)
+        if not name:
+            num = ShardedPool._num_pool = ShardedPool._num_pool + 1
+            name = f"sharded-{num}"
+
+        self.name = name
+        self._closed = False
+
+        self.shards: Dict[str, ConnectionPool] = {}
+        for sname, conninfo in zip(snames, conninfos):
+            self.shards[sname] = ConnectionPool(
+                conninfo, name=f"{name}-{sname}", **kwargs
+            )
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__module__}.{self.__class__.__name__}"
+            f" {self.name!r} at 0x{id(self):x}>"
+        )
+
+    @property
+    def closed(self) -> bool:
+        """`!True` if the pool is closed."""
+        return self._closed
+
+    def wait(self, timeout: float = 30.0) -> None:
+        """
+        Wait for the pools of all the shards to be full.
+
+        Raise `PoolTimeout` if a pool is not ready within *timeout* sec.
+        """
+        deadline = monotonic() + timeout
+        for pool in self.shards.values():
+            pool.wait(max(0.0, deadline - monotonic()))
+
+    def get_pool(self, key: Any) -> ConnectionPool:
+        """Return the pool of the shard where *key* belongs."""
+        return self.shards[self.ring.get(key)]
+
+    @contextmanager
+    def connection(
+        self, key: Any, timeout: Optional[float] = None
+    ) -> Iterator[Connection[Any]]:
+        """Context manager to obtain a connection to the shard of *key*."""
+        if self._closed:
+            raise PoolClosed(f"the pool {self.name!r} is closed")
+
+        with self.get_pool(key).connection(timeout=timeout) as conn:
+            yield conn
+
+    def map(
+        self,
+        func: Callable[[Connection[Any]], T],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, T]:
+        """
+        Call *func* on a connection of every shard, in parallel.
+
+        Return the results of the calls by shard name. If any call fails,
+        raise the error of the first shard failing, after all the calls have
+        terminated.
+        """
+        if self._closed:
+            raise PoolClosed(f"the pool {self.name!r} is closed")
+
+        results: Dict[str, T] = {}
+        errors: Dict[str, BaseException] = {}
+
+        def worker(sname: str, pool: ConnectionPool) -> None:
+            try:
+                with pool.connection(timeout=timeout) as conn:
+                    results[sname] = func(conn)
+            except BaseException as ex:
+                errors[sname] = ex
+
+        threads = [
+            threading.Thread(
+                target=worker,
+                args=(sname, pool),
+                name=f"{pool.name}-map",
+                daemon=True,
+            )
+            for sname, pool in self.shards.items()
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        for sname in self.shards:
+            if sname in errors:
+                raise errors[sname]
+
+        return {sname: results[sname] for sname in self.shards}
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Close the pools of all the shards."""
+        if self._closed:
+            return
+        self._closed = True
+
+        for pool in self.shards.values():
+            pool.close(timeout=timeout)
+
+    def __enter__(self) -> "ShardedPool":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Return current stats about the usage of the pools, by shard name.
+        """
+        return {sname: pool.get_stats() for sname, pool in self.shards.items()}
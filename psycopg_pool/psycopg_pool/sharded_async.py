@@ -0,0 +1,128 @@
+"""
+An asyncio connection pool routing connections to database shards by key.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+import asyncio
+from time import monotonic
+from types import TracebackType
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from typing import Sequence, Type, TypeVar
+
+from psycopg._compat import asynccontextmanager
+from psycopg.connection_async import AsyncConnection
+
+from .errors import PoolClosed
+from .sharded import HashRing, VNODES, check_names
+from .pool_async import AsyncConnectionPool
+
+T = TypeVar("T")
+
+
+class AsyncShardedPool:
+    """
+    An asyncio pool serving connections from several shards, chosen by key.
+    """
+
+    __module__ = "psycopg_pool"
+
+    _num_pool = 0
+
+    def __init__(
+        self,
+        conninfos: Sequence[str],
+        *,
+        names: Optional[Sequence[str]] = None,
+        name: Optional[str] = None,
+        vnodes: int = VNODES,
+        **kwargs: Any,
+    ):
+        snames = check_names(names, len(conninfos))
+        self.ring = HashRing(snames, vnodes)
+        if not name:
+            num = AsyncShardedPool._num_pool = AsyncShardedPool._num_pool + 1
+            name = f"sharded-async-{num}"
+
+        self.name = name
+        self._closed = False
+
+        self.shards: Dict[str, AsyncConnectionPool] = {}
+        for sname, conninfo in zip(snames, conninfos):
+            self.shards[sname] = AsyncConnectionPool(
+                conninfo, name=f"{name}-{sname}", **kwargs
+            )
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__module__}.{self.__class__.__name__}"
+            f" {self.name!r} at 0x{id(self):x}>"
+        )
+
+    @property
+    def closed(self) -> bool:
+        """`!True` if the pool is closed."""
+        return self._closed
+
+    async def wait(self, timeout: float = 30.0) -> None:
+        deadline = monotonic() + timeout
+        for pool in self.shards.values():
+            await pool.wait(max(0.0, deadline - monotonic()))
+
+    def get_pool(self, key: Any) -> AsyncConnectionPool:
+        return self.shards[self.ring.get(key)]
+
+    @asynccontextmanager
+    async def connection(
+        self, key: Any, timeout: Optional[float] = None
+    ) -> AsyncIterator[AsyncConnection[Any]]:
+        if self._closed:
+            raise PoolClosed(f"the pool {self.name!r} is closed")
+
+        async with self.get_pool(key).connection(timeout=timeout) as conn:
+            yield conn
+
+    async def map(
+        self,
+        func: Callable[[AsyncConnection[Any]], Awaitable[T]],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, T]:
+        if self._closed:
+            raise PoolClosed(f"the pool {self.name!r} is closed")
+
+        async def worker(pool: AsyncConnectionPool) -> T:
+            async with pool.connection(timeout=timeout) as conn:
+                return await func(conn)
+
+        rvs = await asyncio.gather(
+            *(worker(pool) for pool in self.shards.values()),
+            return_exceptions=True,
+        )
+        for rv in rvs:
+            if isinstance(rv, BaseException):
+                raise rv
+
+        return dict(zip(self.shards, rvs))
+
+    async def close(self, timeout: float = 5.0) -> None:
+        if self._closed:
+            return
+        self._closed = True
+
+        await asyncio.gather(
+            *(pool.close(timeout=timeout) for pool in self.shards.values())
+        )
+
+    async def __aenter__(self) -> "AsyncShardedPool":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_val: Optional[BaseException],
+        exc_tb: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        return {sname: pool.get_stats() for sname, pool in self.shards.items()}
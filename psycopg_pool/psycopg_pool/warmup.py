@@ -0,0 +1,121 @@
+"""
+Declarative preparation of the new connections of a pool.
+"""
+
+# Copyright (C) 2021 The Psycopg Team
+
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+from typing import Tuple, Type, Union
+
+from psycopg import sql
+from psycopg.abc import AdaptContext, Params, Query
+from psycopg.adapt import Transformer
+from psycopg._queries import PostgresQuery
+from psycopg._preparing import Key
+from psycopg._typeinfo import TypeInfo, RangeInfo, CompositeInfo
+from psycopg.types.range import register_range
+from psycopg.types.composite import register_composite
+
+RegisterFunc = Callable[[Any, Optional[AdaptContext]], None]
+
+TypeSpec = Union[
+    Tuple[Type[TypeInfo], str],
+    Tuple[Type[TypeInfo], str, RegisterFunc],
+]
+
+StatementSpec = Union[Query, Tuple[Query, Optional[Params]]]
+
+
+class Warmup:
+    """
+    Describe how to prepare every new connection of a pool.
+
+    :param settings: Configuration parameters to set on the connection, all
+        in the same query.
+    :param types: Types to register on the connection, as ``(info_class,
+        name)`` or ``(info_class, name, register)`` tuples. The type
+        information is fetched by the first connection of the pool only.
+    :param statements: Statements to prepare on the connection, as queries
+        or as ``(query, params)`` tuples, with *params* an example of the
+        parameters the query is executed with.
+    """
+
+    __module__ = "psycopg_pool"
+
+    def __init__(
+        self,
+        *,
+        settings: Optional[Mapping[str, Any]] = None,
+        types: Sequence[TypeSpec] = (),
+        statements: Sequence[StatementSpec] = (),
+    ):
+        self.settings: Dict[str, str] = {
+            k: str(v) for k, v in (settings or {}).items()
+        }
+
+        self.types: List[Tuple[Type[TypeInfo], str, RegisterFunc]] = []
+        for spec in types:
+            if len(spec) == 2:
+                cls, name = spec  # type: ignore[misc]
+                self.types.append((cls, name, register_default))
+            elif len(spec) == 3:
+                self.types.append(spec)  # type: ignore[arg-type]
+            else:
+                raise TypeError(
+                    "types must be (info_class, name) or"
+                    f" (info_class, name, register) tuples, got {spec!r}"
+                )
+
+        self.statements: List[Tuple[Query, Optional[Params]]] = [
+            stmt if isinstance(stmt, tuple) else (stmt, None)
+            for stmt in statements
+        ]
+
+    def __repr__(self) -> str:
+        return (
+            f"<{self.__class__.__module__}.{self.__class__.__name__}"
+            f" settings={len(self.settings)} types={len(self.types)}"
+            f" statements={len(self.statements)} at 0x{id(self):x}>"
+        )
+
+    def settings_command(self) -> Optional[sql.Composable]:
+        """
+        Return the query to apply the `settings` to a connection, if any.
+        """
+        if not self.settings:
+            return None
+
+        calls = [
+            sql.SQL("set_config({}, {}, false)").format(
+                sql.Literal(k), sql.Literal(v)
+            )
+            for k, v in self.settings.items()
+        ]
+        return sql.SQL("SELECT ") + sql.SQL(", ").join(calls)
+
+    def statements_keys(self, context: AdaptContext) -> List[Key]:
+        """
+        Return the identity of the `statements` to prepare on a connection.
+
+        The types of the parameters depend on the adapters configured, so
+        this function must be called after the types are registered.
+        """
+        rv = []
+        tx = Transformer(context)
+        for query, params in self.statements:
+            pgq = PostgresQuery(tx)
+            pgq.convert(query, params)
+            rv.append((pgq.query, pgq.types))
+        return rv
+
+
+def register_default(info: TypeInfo, context: Optional[AdaptContext]) -> None:
+    """Register *info* using the function suitable for its class."""
+    if isinstance(info, RangeInfo):
+        register_range(info, context)
+    elif isinstance(info, CompositeInfo):
+        # Reuse the type created for the first connection, so that all the
+        # connections of the pool return the same Python type.
+        register_composite(info, context, info.python_type)
+    else:
+        info.register(context)
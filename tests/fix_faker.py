@@ -590,6 +590,55 @@ class Faker:
     def match_TimestamptzRange(self, spec, got, want):
         return self.match_Range((spec, (dt.datetime, True)), got, want)
 
+    def schema_Multirange(self, cls):
+        if self.conn.info.server_version < 140000:
+            return None
+        return self.schema_Range(cls)
+
+    def make_Multirange(self, spec):
+        # Generate sorted, disjoint, non-adjacent ranges, otherwise the
+        # server would normalise them and the result would differ.
+        while True:
+            bounds = []
+            for i in range(randrange(1, self.list_max_length) * 2):
+                val = self.make(spec[1])
+                if spec[1] is Decimal and val.is_nan():
+                    continue
+                if val not in bounds:
+                    bounds.append(val)
+
+            if len(bounds) >= 2:
+                break
+
+        bounds.sort()
+        return spec[0](
+            Range(bounds[i], bounds[i + 1])
+            for i in range(0, len(bounds) - 1, 2)
+        )
+
+    def make_Int4Multirange(self, spec):
+        return self.make_Multirange((spec, Int4))
+
+    def make_Int8Multirange(self, spec):
+        return self.make_Multirange((spec, Int8))
+
+    def make_NumericMultirange(self, spec):
+        return self.make_Multirange((spec, Decimal))
+
+    def make_DateMultirange(self, spec):
+        return self.make_Multirange((spec, dt.date))
+
+    def make_TimestampMultirange(self, spec):
+        return self.make_Multirange((spec, (dt.datetime, False)))
+
+    def make_TimestamptzMultirange(self, spec):
+        return self.make_Multirange((spec, (dt.datetime, True)))
+
+    def match_Multirange(self, spec, got, want):
+        assert len(got) == len(want)
+        for g, w in zip(got, want):
+            self.match_Range(spec, g, w)
+
     def make_str(self, spec, length=0):
         if not length:
             length = randrange(self.str_max_length)
@@ -0,0 +1,249 @@
+import pytest
+
+from psycopg import errors as e
+from psycopg import sql
+from psycopg.pq import TransactionStatus
+
+pytestmark = []
+
+try:
+    from psycopg_pool import ConnectionPool  # noqa: F401
+except ImportError as ex:
+    pytestmark.append(pytest.mark.skip(reason=str(ex)))
+else:
+    import psycopg_pool as pool
+    from psycopg_pool import bulk
+
+
+@pytest.fixture
+def table(svcconn):
+    svcconn.execute("drop table if exists bulktest")
+    svcconn.execute(
+        """
+        create table bulktest (
+            id int primary key, key int, data text,
+            pid int default pg_backend_pid())
+        """
+    )
+    yield "bulktest"
+    svcconn.execute("drop table bulktest")
+
+
+def test_parallel_copy(dsn, svcconn, table):
+    rows = [(i, i % 7, f"data {i}") for i in range(5000)]
+    with pool.ConnectionPool(dsn, min_size=3) as p:
+        res = bulk.parallel_copy(p, table, rows, columns=["id", "key", "data"])
+
+    assert res.ok
+    assert res.rowcount == 5000
+    assert sum(res.rowcounts) == 5000
+    assert all(n for n in res.rowcounts)
+    cur = svcconn.execute("select count(*), count(distinct pid) from bulktest")
+    assert cur.fetchone() == (5000, 3)
+    cur = svcconn.execute("select data from bulktest where id = 42")
+    assert cur.fetchone() == ("data 42",)
+
+
+def test_workers(dsn, svcconn, table):
+    rows = [(i,) for i in range(3000)]
+    with pool.ConnectionPool(dsn, min_size=1, max_size=4) as p:
+        res = bulk.parallel_copy(p, table, rows, columns=["id"], workers=2)
+
+    assert res.rowcount == 3000
+    assert len(res.rowcounts) == 2
+    cur = svcconn.execute("select count(distinct pid) from bulktest")
+    assert cur.fetchone() == (2,)
+
+    with pytest.raises(ValueError):
+        bulk.parallel_copy(p, table, rows, workers=0)
+    with pytest.raises(ValueError):
+        bulk.parallel_copy(p, table, rows, workers=5)
+    with pytest.raises(ValueError):
+        bulk.parallel_export(p, table, "id", print, workers=5)
+
+
+def test_partition_by(dsn, svcconn, table):
+    rows = [(i, i % 7) for i in range(5000)]
+    with pool.ConnectionPool(dsn, min_size=3) as p:
+        res = bulk.parallel_copy(
+            p,
+            table,
+            rows,
+            columns=["id", "key"],
+            partition_by=lambda row: row[1],
+        )
+
+    assert res.rowcount == 5000
+    cur = svcconn.execute(
+        "select key, count(distinct pid) from bulktest group by key"
+    )
+    assert set(cur.fetchall()) == {(k, 1) for k in range(7)}
+
+
+def test_worker_error(dsn, svcconn, table):
+    rows = [(i, i % 2) for i in range(100)]
+    rows.append(("nan", 1))
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        res = bulk.parallel_copy(
+            p,
+            table,
+            rows,
+            columns=["id", "key"],
+            partition_by=lambda row: row[1],
+        )
+        assert p.get_stats().get("returns_bad", 0) == 0
+
+    assert not res.ok
+    assert res.rowcount == 50
+    errors = [ex for ex in res.errors if ex]
+    assert len(errors) == 1
+    assert isinstance(errors[0], e.InvalidTextRepresentation)
+    cur = svcconn.execute("select distinct key from bulktest")
+    assert cur.fetchall() == [(0,)]
+
+
+def test_source_error(dsn, svcconn, table):
+    def rows():
+        for i in range(3000):
+            yield (i,)
+        1 / 0
+
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        with pytest.raises(ZeroDivisionError):
+            bulk.parallel_copy(p, table, rows(), columns=["id"])
+
+        assert len(p._pool) == 2
+
+    cur = svcconn.execute("select count(*) from bulktest")
+    assert cur.fetchone() == (0,)
+
+
+def test_qualified_table(dsn, svcconn, table):
+    with pool.ConnectionPool(dsn, min_size=1) as p:
+        res = bulk.parallel_copy(
+            p,
+            sql.Identifier("public", table),
+            [(1,), (2,)],
+            columns=["id"],
+        )
+
+    assert res.rowcount == 2
+    assert res.rowcounts == [2]
+
+
+def test_snapshot_connections(dsn, svcconn, table):
+    svcconn.execute("insert into bulktest (id) values (1)")
+    with pool.ConnectionPool(dsn, min_size=3) as p:
+        with bulk.snapshot_connections(p, 3) as conns:
+            assert len(conns) == 3
+            assert len(set(conns)) == 3
+            svcconn.execute("insert into bulktest (id) values (2)")
+            for conn in conns:
+                cur = conn.execute("select id from bulktest")
+                assert cur.fetchall() == [(1,)]
+
+        assert len(p._pool) == 3
+        for conn in p._pool:
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+
+        with pytest.raises(ValueError):
+            with bulk.snapshot_connections(p, 4):
+                pass
+
+
+@pytest.mark.parametrize(
+    "minmax, n, want",
+    [
+        ((None, None), 3, []),
+        ((0, 8), 3, [3, 6]),
+        ((1, 100), 4, [26, 51, 76]),
+        ((5, 5), 3, []),
+        ((1, 2), 4, [2]),
+    ],
+)
+def test_split_range(minmax, n, want):
+    assert bulk.split_range(minmax, n) == want
+
+
+def test_split_range_bad_type():
+    with pytest.raises(TypeError):
+        bulk.split_range(("a", "z"), 3)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_export(dsn, svcconn, table, workers):
+    svcconn.execute(
+        "insert into bulktest (id, data)"
+        " select x, 'data ' || x from generate_series(1, 1000) x"
+    )
+    data = {}
+
+    def sink(chunk, block):
+        data.setdefault(chunk, []).append(bytes(block))
+
+    with pool.ConnectionPool(dsn, min_size=3) as p:
+        res = bulk.parallel_export(
+            p, table, "id", sink, columns=["id", "data"], workers=workers
+        )
+
+    assert res.ok
+    assert res.rowcount == 1000
+    assert len(data) == workers
+    rows = sorted(
+        int(line.split(b"\t")[0])
+        for blocks in data.values()
+        for line in b"".join(blocks).splitlines()
+    )
+    assert rows == list(range(1, 1001))
+
+
+def test_parallel_export_bounds(dsn, svcconn, table):
+    svcconn.execute(
+        "insert into bulktest (id, data)"
+        " select x, 'data ' || x from generate_series(1, 100) x"
+    )
+    svcconn.execute("update bulktest set data = null where id = 42")
+    data = {}
+
+    def sink(chunk, block):
+        data.setdefault(chunk, []).append(bytes(block))
+
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        res = bulk.parallel_export(
+            p, table, "data", sink, columns=["id"], bounds=["data 3", "data 7"]
+        )
+
+    assert res.rowcount == 100
+    assert res.rowcounts[0] + res.rowcounts[1] == 100
+    ids = {
+        k: sorted(int(line) for line in b"".join(v).splitlines())
+        for k, v in data.items()
+    }
+    assert 42 in ids[0]
+    assert ids[1][:2] == [3, 4]
+    assert 7 in ids[2] and 70 in ids[2]
+
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        with pytest.raises(TypeError):
+            bulk.parallel_export(p, table, "data", sink)
+
+
+def test_parallel_export_sink_error(dsn, svcconn, table):
+    svcconn.execute(
+        "insert into bulktest (id, data)"
+        " select x, repeat('x', 1000) from generate_series(1, 10000) x"
+    )
+
+    def sink(chunk, block):
+        if chunk == 0:
+            1 / 0
+
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        res = bulk.parallel_export(p, table, "id", sink)
+        assert p.get_stats().get("returns_bad", 0) == 0
+
+    assert not res.ok
+    assert res.rowcount == 5000
+    errors = [ex for ex in res.errors if ex]
+    assert len(errors) == 1
+    assert isinstance(errors[0], ZeroDivisionError)
@@ -0,0 +1,242 @@
+import sys
+
+import pytest
+
+from psycopg import errors as e
+from psycopg import sql
+from psycopg.pq import TransactionStatus
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(
+        sys.version_info < (3, 7),
+        reason="async pool not supported before Python 3.7",
+    ),
+]
+
+try:
+    from psycopg_pool import AsyncConnectionPool  # noqa: F401
+except ImportError as ex:
+    pytestmark.append(pytest.mark.skip(reason=str(ex)))
+else:
+    import psycopg_pool as pool
+    from psycopg_pool import bulk_async
+
+
+@pytest.fixture
+def table(svcconn):
+    svcconn.execute("drop table if exists bulktest")
+    svcconn.execute(
+        """
+        create table bulktest (
+            id int primary key, key int, data text,
+            pid int default pg_backend_pid())
+        """
+    )
+    yield "bulktest"
+    svcconn.execute("drop table bulktest")
+
+
+async def test_parallel_copy(dsn, svcconn, table):
+    rows = [(i, i % 7, f"data {i}") for i in range(5000)]
+    async with pool.AsyncConnectionPool(dsn, min_size=3) as p:
+        res = await bulk_async.parallel_copy(
+            p, table, rows, columns=["id", "key", "data"]
+        )
+
+    assert res.ok
+    assert res.rowcount == 5000
+    assert sum(res.rowcounts) == 5000
+    assert all(n for n in res.rowcounts)
+    cur = svcconn.execute("select count(*), count(distinct pid) from bulktest")
+    assert cur.fetchone() == (5000, 3)
+    cur = svcconn.execute("select data from bulktest where id = 42")
+    assert cur.fetchone() == ("data 42",)
+
+
+async def test_workers(dsn, svcconn, table):
+    rows = [(i,) for i in range(3000)]
+    async with pool.AsyncConnectionPool(dsn, min_size=1, max_size=4) as p:
+        res = await bulk_async.parallel_copy(
+            p, table, rows, columns=["id"], workers=2
+        )
+
+    assert res.rowcount == 3000
+    assert len(res.rowcounts) == 2
+    cur = svcconn.execute("select count(distinct pid) from bulktest")
+    assert cur.fetchone() == (2,)
+
+    with pytest.raises(ValueError):
+        await bulk_async.parallel_copy(p, table, rows, workers=0)
+    with pytest.raises(ValueError):
+        await bulk_async.parallel_copy(p, table, rows, workers=5)
+    with pytest.raises(ValueError):
+        await bulk_async.parallel_export(p, table, "id", print, workers=5)
+
+
+async def test_partition_by(dsn, svcconn, table):
+    rows = [(i, i % 7) for i in range(5000)]
+    async with pool.AsyncConnectionPool(dsn, min_size=3) as p:
+        res = await bulk_async.parallel_copy(
+            p,
+            table,
+            rows,
+            columns=["id", "key"],
+            partition_by=lambda row: row[1],
+        )
+
+    assert res.rowcount == 5000
+    cur = svcconn.execute(
+        "select key, count(distinct pid) from bulktest group by key"
+    )
+    assert set(cur.fetchall()) == {(k, 1) for k in range(7)}
+
+
+async def test_worker_error(dsn, svcconn, table):
+    rows = [(i, i % 2) for i in range(100)]
+    rows.append(("nan", 1))
+    async with pool.AsyncConnectionPool(dsn, min_size=2) as p:
+        res = await bulk_async.parallel_copy(
+            p,
+            table,
+            rows,
+            columns=["id", "key"],
+            partition_by=lambda row: row[1],
+        )
+        assert p.get_stats().get("returns_bad", 0) == 0
+
+    assert not res.ok
+    assert res.rowcount == 50
+    errors = [ex for ex in res.errors if ex]
+    assert len(errors) == 1
+    assert isinstance(errors[0], e.InvalidTextRepresentation)
+    cur = svcconn.execute("select distinct key from bulktest")
+    assert cur.fetchall() == [(0,)]
+
+
+async def test_source_error(dsn, svcconn, table):
+    async def rows():
+        for i in range(3000):
+            yield (i,)
+        1 / 0
+
+    async with pool.AsyncConnectionPool(dsn, min_size=2) as p:
+        with pytest.raises(ZeroDivisionError):
+            await bulk_async.parallel_copy(p, table, rows(), columns=["id"])
+
+        assert len(p._pool) == 2
+
+    cur = svcconn.execute("select count(*) from bulktest")
+    assert cur.fetchone() == (0,)
+
+
+async def test_qualified_table(dsn, svcconn, table):
+    async with pool.AsyncConnectionPool(dsn, min_size=1) as p:
+        res = await bulk_async.parallel_copy(
+            p,
+            sql.Identifier("public", table),
+            [(1,), (2,)],
+            columns=["id"],
+        )
+
+    assert res.rowcount == 2
+    assert res.rowcounts == [2]
+
+
+async def test_snapshot_connections(dsn, svcconn, table):
+    svcconn.execute("insert into bulktest (id) values (1)")
+    async with pool.AsyncConnectionPool(dsn, min_size=3) as p:
+        async with bulk_async.snapshot_connections(p, 3) as conns:
+            assert len(conns) == 3
+            assert len(set(conns)) == 3
+            svcconn.execute("insert into bulktest (id) values (2)")
+            for conn in conns:
+                cur = await conn.execute("select id from bulktest")
+                assert await cur.fetchall() == [(1,)]
+
+        assert len(p._pool) == 3
+        for conn in p._pool:
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+
+        with pytest.raises(ValueError):
+            async with bulk_async.snapshot_connections(p, 4):
+                pass
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+async def test_parallel_export(dsn, svcconn, table, workers):
+    svcconn.execute(
+        "insert into bulktest (id, data)"
+        " select x, 'data ' || x from generate_series(1, 1000) x"
+    )
+    data = {}
+
+    async def sink(chunk, block):
+        data.setdefault(chunk, []).append(bytes(block))
+
+    async with pool.AsyncConnectionPool(dsn, min_size=3) as p:
+        res = await bulk_async.parallel_export(
+            p, table, "id", sink, columns=["id", "data"], workers=workers
+        )
+
+    assert res.ok
+    assert res.rowcount == 1000
+    assert len(data) == workers
+    rows = sorted(
+        int(line.split(b"\t")[0])
+        for blocks in data.values()
+        for line in b"".join(blocks).splitlines()
+    )
+    assert rows == list(range(1, 1001))
+
+
+async def test_parallel_export_bounds(dsn, svcconn, table):
+    svcconn.execute(
+        "insert into bulktest (id, data)"
+        " select x, 'data ' || x from generate_series(1, 100) x"
+    )
+    svcconn.execute("update bulktest set data = null where id = 42")
+    data = {}
+
+    def sink(chunk, block):
+        data.setdefault(chunk, []).append(bytes(block))
+
+    async with pool.AsyncConnectionPool(dsn, min_size=2) as p:
+        res = await bulk_async.parallel_export(
+            p, table, "data", sink, columns=["id"], bounds=["data 3", "data 7"]
+        )
+
+    assert res.rowcount == 100
+    assert res.rowcounts[0] + res.rowcounts[1] == 100
+    ids = {
+        k: sorted(int(line) for line in b"".join(v).splitlines())
+        for k, v in data.items()
+    }
+    assert 42 in ids[0]
+    assert ids[1][:2] == [3, 4]
+    assert 7 in ids[2] and 70 in ids[2]
+
+    async with pool.AsyncConnectionPool(dsn, min_size=2) as p:
+        with pytest.raises(TypeError):
+            await bulk_async.parallel_export(p, table, "data", sink)
+
+
+async def test_parallel_export_sink_error(dsn, svcconn, table):
+    svcconn.execute(
+        "insert into bulktest (id, data)"
+        " select x, repeat('x', 1000) from generate_series(1, 10000) x"
+    )
+
+    def sink(chunk, block):
+        if chunk == 0:
+            1 / 0
+
+    async with pool.AsyncConnectionPool(dsn, min_size=2) as p:
+        res = await bulk_async.parallel_export(p, table, "id", sink)
+        assert p.get_stats().get("returns_bad", 0) == 0
+
+    assert not res.ok
+    assert res.rowcount == 5000
+    errors = [ex for ex in res.errors if ex]
+    assert len(errors) == 1
+    assert isinstance(errors[0], ZeroDivisionError)
@@ -0,0 +1,150 @@
+import logging
+from time import sleep
+
+import pytest
+
+import psycopg
+
+try:
+    from psycopg_pool import MultiHostPool  # noqa: F401
+except ImportError as ex:
+    pytestmark = pytest.mark.skip(reason=str(ex))
+else:
+    import psycopg_pool as pool
+
+
+def test_bad_roles(dsn):
+    with pytest.raises(ValueError):
+        pool.MultiHostPool([])
+    with pytest.raises(ValueError):
+        pool.MultiHostPool([dsn, dsn], roles=["primary"])
+    with pytest.raises(ValueError):
+        pool.MultiHostPool([dsn], roles=["master"])
+
+
+def test_route(dsn):
+    with pool.MultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], min_size=1
+    ) as p:
+        with p.connection() as conn:
+            assert conn._pool is p.hosts[0].pool
+            conn.execute("select 1")
+        with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[1].pool
+            assert p.hosts[1].inflight == 1
+        assert p.hosts[1].inflight == 0
+
+
+def test_readonly_fallback(dsn):
+    with pool.MultiHostPool([dsn, dsn], roles=["primary", None]) as p:
+        with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[0].pool
+
+
+def test_no_primary(dsn):
+    with pool.MultiHostPool([dsn, dsn], roles=["replica", None]) as p:
+        with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[0].pool
+        with pytest.raises(psycopg.OperationalError):
+            with p.connection():
+                pass
+
+
+def test_balance(dsn):
+    with pool.MultiHostPool(
+        [dsn, dsn, dsn], roles=["primary", "replica", "replica"], min_size=2
+    ) as p:
+        p.hosts[1].latency = 0.002
+        p.hosts[2].latency = 0.001
+        with p.connection(readonly=True) as conn1:
+            assert conn1._pool is p.hosts[2].pool
+            with p.connection(readonly=True) as conn2:
+                assert conn2._pool is p.hosts[1].pool
+                with p.connection(readonly=True) as conn3:
+                    assert conn3._pool is p.hosts[2].pool
+
+
+def test_check(dsn, caplog):
+    caplog.set_level(logging.WARNING, logger="psycopg.pool")
+    with pool.MultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], min_size=1
+    ) as p:
+        p.wait()
+        assert [h.role for h in p.hosts] == ["primary", "primary"]
+        assert all(h.up for h in p.hosts)
+        assert all(h.latency > 0 for h in p.hosts)
+        assert len(caplog.records) == 1
+        assert "changed role" in caplog.records[0].message
+
+        with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[0].pool
+
+
+def test_check_down(dsn, caplog):
+    caplog.set_level(logging.WARNING, logger="psycopg.pool")
+    with pool.MultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], min_size=1
+    ) as p:
+        p.hosts[0].pool.close()
+        p.check()
+        assert not p.hosts[0].up
+        assert p.hosts[1].up
+        assert "unavailable" in caplog.records[0].message
+
+        # The new primary is discovered
+        assert p.hosts[1].role == "primary"
+        with p.connection() as conn:
+            assert conn._pool is p.hosts[1].pool
+
+
+@pytest.mark.slow
+def test_check_interval(dsn):
+    with pool.MultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], check_interval=0.2
+    ) as p:
+        assert p.hosts[1].role == "replica"
+        p.hosts[0].pool.wait()
+        p.hosts[1].pool.wait()
+        for i in range(20):
+            if p.hosts[1].role == "primary":
+                break
+            sleep(0.05)
+        assert p.hosts[1].role == "primary"
+
+
+@pytest.mark.slow
+def test_check_interval_host_busy(dsn):
+    with pool.MultiHostPool(
+        [dsn, dsn],
+        roles=["primary", "replica"],
+        min_size=1,
+        max_size=1,
+        check_interval=0.2,
+    ) as p:
+        p.hosts[1].pool.wait()
+
+        # A host with no connection available is busy, not down
+        conn = p.hosts[0].pool.getconn()
+        for i in range(20):
+            if p.hosts[1].role == "primary":
+                break
+            sleep(0.05)
+        assert p.hosts[1].role == "primary"
+
+        sleep(0.5)
+        assert p.hosts[0].up
+        assert p.hosts[0].latency < 0.2
+        # The client waits for the host, instead of failing
+        with pytest.raises(pool.PoolTimeout):
+            with p.connection(timeout=0.1):
+                pass
+        p.hosts[0].pool.putconn(conn)
+        with p.connection() as conn:
+            assert conn._pool is p.hosts[0].pool
+
+
+def test_stats(dsn):
+    with pool.MultiHostPool([dsn, dsn], name="mh", min_size=1) as p:
+        stats = p.get_stats()
+        assert set(stats) == {"mh-0", "mh-1"}
+        assert stats["mh-0"]["pool_min"] == 1
@@ -0,0 +1,164 @@
+import sys
+import asyncio
+import logging
+
+import pytest
+
+import psycopg
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(
+        sys.version_info < (3, 7),
+        reason="async pool not supported before Python 3.7",
+    ),
+]
+
+try:
+    from psycopg_pool import AsyncMultiHostPool  # noqa: F401
+except ImportError as ex:
+    pytestmark.append(pytest.mark.skip(reason=str(ex)))
+else:
+    import psycopg_pool as pool
+
+
+async def test_bad_roles(dsn):
+    with pytest.raises(ValueError):
+        pool.AsyncMultiHostPool([])
+    with pytest.raises(ValueError):
+        pool.AsyncMultiHostPool([dsn, dsn], roles=["primary"])
+    with pytest.raises(ValueError):
+        pool.AsyncMultiHostPool([dsn], roles=["master"])
+
+
+async def test_route(dsn):
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], min_size=1
+    ) as p:
+        async with p.connection() as conn:
+            assert conn._pool is p.hosts[0].pool
+            await conn.execute("select 1")
+        async with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[1].pool
+            assert p.hosts[1].inflight == 1
+        assert p.hosts[1].inflight == 0
+
+
+async def test_readonly_fallback(dsn):
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn], roles=["primary", None]
+    ) as p:
+        async with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[0].pool
+
+
+async def test_no_primary(dsn):
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn], roles=["replica", None]
+    ) as p:
+        async with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[0].pool
+        with pytest.raises(psycopg.OperationalError):
+            async with p.connection():
+                pass
+
+
+async def test_balance(dsn):
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn, dsn], roles=["primary", "replica", "replica"], min_size=2
+    ) as p:
+        p.hosts[1].latency = 0.002
+        p.hosts[2].latency = 0.001
+        async with p.connection(readonly=True) as conn1:
+            assert conn1._pool is p.hosts[2].pool
+            async with p.connection(readonly=True) as conn2:
+                assert conn2._pool is p.hosts[1].pool
+                async with p.connection(readonly=True) as conn3:
+                    assert conn3._pool is p.hosts[2].pool
+
+
+async def test_check(dsn, caplog):
+    caplog.set_level(logging.WARNING, logger="psycopg.pool")
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], min_size=1
+    ) as p:
+        await p.wait()
+        assert [h.role for h in p.hosts] == ["primary", "primary"]
+        assert all(h.up for h in p.hosts)
+        assert all(h.latency > 0 for h in p.hosts)
+        assert len(caplog.records) == 1
+        assert "changed role" in caplog.records[0].message
+
+        async with p.connection(readonly=True) as conn:
+            assert conn._pool is p.hosts[0].pool
+
+
+async def test_check_down(dsn, caplog):
+    caplog.set_level(logging.WARNING, logger="psycopg.pool")
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], min_size=1
+    ) as p:
+        await p.hosts[0].pool.close()
+        await p.check()
+        assert not p.hosts[0].up
+        assert p.hosts[1].up
+        assert "unavailable" in caplog.records[0].message
+
+        # The new primary is discovered
+        assert p.hosts[1].role == "primary"
+        async with p.connection() as conn:
+            assert conn._pool is p.hosts[1].pool
+
+
+@pytest.mark.slow
+async def test_check_interval(dsn):
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn], roles=["primary", "replica"], check_interval=0.2
+    ) as p:
+        assert p.hosts[1].role == "replica"
+        p.hosts[0].pool.wait()
+        p.hosts[1].pool.wait()
+        for i in range(20):
+            if p.hosts[1].role == "primary":
+                break
+            await asyncio.sleep(0.05)
+        assert p.hosts[1].role == "primary"
+
+
+@pytest.mark.slow
+async def test_check_interval_host_busy(dsn):
+    async with pool.AsyncMultiHostPool(
+        [dsn, dsn],
+        roles=["primary", "replica"],
+        min_size=1,
+        max_size=1,
+        check_interval=0.2,
+    ) as p:
+        await p.hosts[1].pool.wait()
+
+        # A host with no connection available is busy, not down
+        conn = await p.hosts[0].pool.getconn()
+        for i in range(20):
+            if p.hosts[1].role == "primary":
+                break
+            await asyncio.sleep(0.05)
+        assert p.hosts[1].role == "primary"
+
+        await asyncio.sleep(0.5)
+        assert p.hosts[0].up
+        assert p.hosts[0].latency < 0.2
+
+        # The client waits for the host, instead of failing
+        with pytest.raises(pool.PoolTimeout):
+            async with p.connection(timeout=0.1):
+                pass
+        await p.hosts[0].pool.putconn(conn)
+        async with p.connection() as conn:
+            assert conn._pool is p.hosts[0].pool
+
+
+async def test_stats(dsn):
+    async with pool.AsyncMultiHostPool([dsn, dsn], name="mh", min_size=1) as p:
+        stats = p.get_stats()
+        assert set(stats) == {"mh-0", "mh-1"}
+        assert stats["mh-0"]["pool_min"] == 1
@@ -1,14 +1,19 @@
+import os
 import sys
 import logging
 import weakref
 from time import sleep, time
 from threading import Thread, Event
-from collections import Counter
+from collections import Counter, deque
+from unittest.mock import Mock
 
 import pytest
 
 import psycopg
 from psycopg.pq import TransactionStatus
+from psycopg.types import TypeInfo
+from psycopg.types.range import RangeInfo
+from psycopg.types.composite import CompositeInfo
 
 pytestmark = []
 
@@ -114,6 +119,52 @@ def test_concurrent_filling(dsn, monkeypatch, retries):
                     assert got == pytest.approx(want, 0.1), times
 
 
+@pytest.mark.slow
+@pytest.mark.timing
+def test_connect_concurrency(dsn, monkeypatch, retries):
+    delay_connection(monkeypatch, 0.1)
+
+    def add_time(self, conn):
+        times.append(time() - t0)
+        add_orig(self, conn)
+
+    add_orig = pool.ConnectionPool._add_to_pool
+    monkeypatch.setattr(pool.ConnectionPool, "_add_to_pool", add_time)
+
+    for retry in retries:
+        with retry:
+            times = []
+            t0 = time()
+
+            with pool.ConnectionPool(
+                dsn, min_size=6, num_workers=1, connect_concurrency=3
+            ) as p:
+                p.wait(1.0)
+                want_times = [0.1, 0.1, 0.1, 0.2, 0.2, 0.2]
+                assert len(times) == len(want_times)
+                for got, want in zip(times, want_times):
+                    assert got == pytest.approx(want, 0.1), times
+
+    with pytest.raises(ValueError):
+        pool.ConnectionPool(dsn, connect_concurrency=0)
+
+
+@pytest.mark.slow
+@pytest.mark.timing
+def test_wait_progress(dsn, monkeypatch, caplog):
+    caplog.set_level(logging.INFO, logger="psycopg.pool")
+    delay_connection(monkeypatch, 0.1)
+    with pytest.raises(pool.PoolTimeout) as exc:
+        with pool.ConnectionPool(
+            dsn, min_size=4, num_workers=1, name="progress"
+        ) as p:
+            p.wait(0.25)
+
+    assert "2 connections ready out of 4" in str(exc.value)
+    msgs = [r.message for r in caplog.records]
+    assert "pool 'progress': 1 connections ready out of 4" in msgs
+
+
 @pytest.mark.slow
 @pytest.mark.timing
 def test_wait_ready(dsn, monkeypatch):
@@ -235,6 +286,121 @@ def test_reset(dsn):
         assert resets == 2
 
 
+def test_reset_command(dsn):
+    reset = "set application_name to 'reset'"
+    with pool.ConnectionPool(dsn, min_size=1, reset=reset) as p:
+        with p.connection() as conn:
+            conn.execute("select 1")
+            assert conn._session_changed is False
+
+        with p.connection() as conn:
+            # The session wasn't changed: reset skipped
+            cur = conn.execute("show application_name")
+            assert cur.fetchone() != ("reset",)
+            conn.execute("set timezone to '+2:00'")
+            assert conn._session_changed is True
+
+        p.wait()
+        with p.connection() as conn:
+            cur = conn.execute("show application_name")
+            assert cur.fetchone() == ("reset",)
+            assert conn._session_changed is False
+
+
+@pytest.mark.parametrize(
+    "query, changed",
+    [
+        ("select 1", False),
+        ("insert into tmp values (1)", False),
+        ("begin; update tmp set id = 2; commit", False),
+        ("set timezone to utc", True),
+        ("create temp table tmp2 (id int)", True),
+        ("create temp table tmp2 as select 1", True),
+        ("select 1 into temp tmp2", True),
+        ("select set_config('application_name', 'x', false)", True),
+        ("select pg_advisory_lock(42)", True),
+        ("select * from pg_try_advisory_lock_shared(42)", True),
+        ("listen chan", True),
+    ],
+)
+def test_reset_command_changes(dsn, query, changed):
+    with pool.ConnectionPool(dsn, min_size=1, reset="discard all") as p:
+        with p.connection() as conn:
+            conn.execute("create temp table tmp (id int)")
+            assert conn._session_changed is True
+            conn._session_changed = False
+            conn.execute(query)
+            assert conn._session_changed is changed
+
+
+def test_reset_command_stream(dsn):
+    with pool.ConnectionPool(dsn, min_size=1, reset="reset all") as p:
+        with p.connection() as conn:
+            for rec in conn.cursor().stream("select 1"):
+                pass
+            assert conn._session_changed is False
+            for rec in conn.cursor().stream(
+                "select set_config('application_name', 'x', false)"
+            ):
+                pass
+            assert conn._session_changed is True
+
+
+def test_reset_command_rollback(dsn):
+    with pool.ConnectionPool(dsn, min_size=1, reset="reset all") as p:
+        conn = p.getconn()
+        pid1 = conn.pgconn.backend_pid
+        conn.execute("set timezone to '+2:00'")
+        conn.execute("set datestyle to 'SQL, DMY'")
+        conn.commit()
+        conn.execute("select 1")
+        p.putconn(conn)
+
+        with p.connection() as conn:
+            assert conn.pgconn.backend_pid == pid1
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+            cur = conn.execute("show datestyle")
+            assert cur.fetchone() == ("ISO, MDY",)
+
+
+def test_reset_command_discard(dsn):
+    with pool.ConnectionPool(dsn, min_size=1, reset="discard all") as p:
+        conn = p.getconn()
+        pid1 = conn.pgconn.backend_pid
+        conn.execute("select %s::int", [1], prepare=True)
+        conn.execute("listen foo")
+        p.putconn(conn)
+
+        with p.connection() as conn:
+            assert conn.pgconn.backend_pid == pid1
+            cur = conn.execute("select pg_listening_channels()")
+            assert cur.fetchall() == []
+            cur = conn.execute("select %s::int", [1], prepare=True)
+            assert cur.fetchone() == (1,)
+
+
+def test_reset_command_discard_temp(dsn):
+    with pool.ConnectionPool(dsn, min_size=1, reset="discard temp") as p:
+        conn = p.getconn()
+        pid1 = conn.pgconn.backend_pid
+        conn.execute("select %s::int", [1], prepare=True)
+        conn.execute("create temp table tmp (id int)")
+        p.putconn(conn)
+
+        # The prepared statements are not dropped: the connection remembers
+        with p.connection() as conn:
+            assert conn.pgconn.backend_pid == pid1
+            assert b"select $1::int" in [
+                k[0] for k in conn._prepared._prepared
+            ]
+            cur = conn.execute("select %s::int", [1], prepare=True)
+            assert (cur.fetchone()) == (1,)
+            cur = conn.execute(
+                "select count(*) from pg_prepared_statements", prepare=False
+            )
+            assert (cur.fetchone()) == (1,)
+
+
 def test_reset_badstate(dsn, caplog):
     caplog.set_level(logging.WARNING, logger="psycopg.pool")
 
@@ -304,6 +470,87 @@ def test_queue(dsn, retries):
             assert len(set(r[2] for r in results)) == 2, results
 
 
+@pytest.mark.slow
+def test_queue_priority(dsn):
+    def worker(n, priority):
+        with p.connection(priority=priority):
+            order.append(n)
+
+    order = []
+    with pool.ConnectionPool(dsn, min_size=1) as p:
+        p.wait()
+        with p.connection():
+            ts = []
+            for n, priority in enumerate([0, 0, 10, 5, 10]):
+                ts.append(Thread(target=worker, args=(n, priority)))
+                ts[-1].start()
+                sleep(0.05)
+
+        [t.join() for t in ts]
+
+    assert order == [2, 4, 3, 0, 1]
+
+
+def test_queue_expired():
+    pos = pool.pool.WaitingClient(0.05)
+    sleep(0.1)
+    assert not pos.set(Mock())
+    with pytest.raises(pool.PoolTimeout):
+        pos.wait()
+
+    pos = pool.pool.WaitingClient(1.0)
+    conn = Mock()
+    assert pos.set(conn)
+    assert pos.wait() is conn
+
+
+def test_wait_during_return(dsn):
+    with pool.ConnectionPool(dsn, min_size=1) as p:
+        p.wait()
+        conn = p.getconn()
+
+        class RacingDeque(deque):
+            def append(self, conn):
+                # wait() starts waiting while the connection is returned
+                p._pool_full_event = Event()
+                super().append(conn)
+
+        p._pool = RacingDeque(p._pool)
+        p.putconn(conn)
+        assert p._pool_full_event.is_set()
+
+
+@pytest.mark.slow
+def test_concurrent_use(dsn):
+    def worker():
+        for i in range(200):
+            conn = p.getconn(timeout=5.0)
+            if id(conn) in used:
+                shared.append(conn)
+            used.add(id(conn))
+            sleep(0)
+            used.remove(id(conn))
+            p.putconn(conn)
+
+    used = set()
+    shared = []
+    with pool.ConnectionPool(dsn, min_size=4) as p:
+        p.wait()
+        ts = [Thread(target=worker) for i in range(16)]
+        [t.start() for t in ts]
+        [t.join() for t in ts]
+
+        stats = p.get_stats()
+        assert stats["pool_available"] == 4
+        assert stats["requests_num"] == 16 * 200
+        assert not stats.get("requests_errors")
+        # The stats updated without the pool lock are not lost
+        hists = p.get_histograms()
+        assert hists["requests_wait_ms"].count == 16 * 200
+
+    assert not shared
+
+
 @pytest.mark.slow
 def test_queue_size(dsn):
     def worker(t, ev=None):
@@ -673,6 +920,70 @@ def test_grow(dsn, monkeypatch, retries):
                 assert got == pytest.approx(want, 0.1), times
 
 
+@pytest.mark.slow
+@pytest.mark.timing
+def test_grow_adaptive(dsn, monkeypatch, retries):
+    delay_connection(monkeypatch, 0.1)
+
+    def worker(n):
+        t0 = time()
+        with p.connection() as conn:
+            conn.execute("select 1 from pg_sleep(0.2)")
+        t1 = time()
+        results.append((n, t1 - t0))
+
+    for retry in retries:
+        with retry:
+            with pool.ConnectionPool(
+                dsn, min_size=2, max_size=4, num_workers=3, adaptive=True
+            ) as p:
+                p.wait(1.0)
+                results = []
+
+                ts = [Thread(target=worker, args=(i,)) for i in range(6)]
+                [t.start() for t in ts]
+                [t.join() for t in ts]
+
+            want_times = [0.2, 0.2, 0.3, 0.3, 0.4, 0.4]
+            times = [item[1] for item in results]
+            for got, want in zip(times, want_times):
+                assert got == pytest.approx(want, 0.1), times
+
+
+@pytest.mark.slow
+@pytest.mark.timing
+def test_shrink_adaptive(dsn, monkeypatch):
+
+    from psycopg_pool.pool import ShrinkPool
+
+    results = []
+
+    def run_hacked(self, pool):
+        n0 = pool._nconns
+        orig_run(self, pool)
+        n1 = pool._nconns
+        results.append((n0, n1))
+
+    orig_run = ShrinkPool._run
+    monkeypatch.setattr(ShrinkPool, "_run", run_hacked)
+
+    def worker(n):
+        with p.connection() as conn:
+            conn.execute("select pg_sleep(0.1)")
+
+    with pool.ConnectionPool(
+        dsn, min_size=2, max_size=8, max_idle=0.2, adaptive=True
+    ) as p:
+        p.wait(5.0)
+
+        ts = [Thread(target=worker, args=(i,)) for i in range(8)]
+        [t.start() for t in ts]
+        [t.join() for t in ts]
+        sleep(1)
+
+    assert results == [(8, 8), (8, 5), (5, 3), (3, 2), (2, 2)]
+
+
 @pytest.mark.slow
 @pytest.mark.timing
 def test_shrink(dsn, monkeypatch):
@@ -706,6 +1017,20 @@ def test_shrink(dsn, monkeypatch):
     assert results == [(4, 4), (4, 3), (3, 2), (2, 2), (2, 2)]
 
 
+def test_reconnect_jitter():
+    delays = []
+    for i in range(10):
+        attempt = pool.base.ConnectionAttempt(reconnect_timeout=100.0)
+        attempt.update_delay(0.0)
+        attempt.update_delay(0.0)
+        delays.append(attempt.delay)
+
+    # Jitter is added at every step, not only on the initial delay.
+    assert len(set(delays)) > 1
+    for delay in delays:
+        assert 2.0 * 0.9 * 0.9 <= delay <= 2.0 * 1.1 * 1.1
+
+
 @pytest.mark.slow
 def test_reconnect(proxy, caplog, monkeypatch, retries):
     caplog.set_level(logging.WARNING, logger="psycopg.pool")
@@ -802,6 +1127,208 @@ def test_uniform_use(dsn, retries):
             assert set(counts.values()) == set([2])
 
 
+def test_policy(dsn):
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        assert p.policy == "fifo"
+
+    with pool.ConnectionPool(dsn, min_size=2, policy="lifo") as p:
+        assert p.policy == "lifo"
+
+    with pytest.raises(ValueError):
+        pool.ConnectionPool(dsn, min_size=2, policy="random")
+
+
+def set_threshold_2(conn):
+    conn.prepare_threshold = 2
+
+
+def set_threshold_0(conn):
+    conn.prepare_threshold = 0
+
+
+def test_prepared_warmup(dsn):
+    with pool.ConnectionPool(
+        dsn, min_size=1, prepared_warmup=2, configure=set_threshold_2
+    ) as p:
+        with p.connection() as conn:
+            pid1 = conn.pgconn.backend_pid
+            for i in range(3):
+                conn.execute("select %s::int", [i])
+            for i in range(4):
+                conn.execute("select %s::text", [str(i)])
+            conn.execute("select 1")
+            conn.close()
+
+        with p.connection() as conn:
+            assert conn.pgconn.backend_pid != pid1
+            cur = conn.execute(
+                "select statement from pg_prepared_statements order by 1"
+            )
+            assert [r[0] for r in cur] == ["select $1::int", "select $1::text"]
+
+            n = len(conn._prepared._prepared)
+            conn.execute("select %s::int", [10])
+            assert len(conn._prepared._prepared) == n
+
+    with pytest.raises(ValueError):
+        pool.ConnectionPool(dsn, min_size=1, prepared_warmup=-1)
+
+
+def test_prepared_warmup_no_ref(dsn):
+    p = pool.ConnectionPool(dsn, min_size=1, prepared_warmup=2)
+    p.wait()
+    with p.connection() as conn:
+        for i in range(3):
+            conn.execute("select %s::int", [i])
+
+    # The connections don't keep the pool alive
+    ref = weakref.ref(p)
+    del p, conn
+    assert not ref()
+
+
+def test_prepared_stats_concurrent(dsn, monkeypatch):
+    monkeypatch.setattr(pool.ConnectionPool, "_PREPARED_STATS_MAX", 100)
+    errors = []
+
+    with pool.ConnectionPool(dsn, min_size=1, prepared_warmup=10) as p:
+        wp = weakref.ref(p)
+
+        def count(n):
+            try:
+                for i in range(20000):
+                    p._count_prepared(wp, (b"q%d" % (i % 300), n))
+            except Exception as ex:
+                errors.append(ex)
+
+        ts = [Thread(target=count, args=(i,)) for i in range(4)]
+        for t in ts:
+            t.start()
+        while any(t.is_alive() for t in ts):
+            assert len(p._prepared_to_warm_up()) <= 10
+        for t in ts:
+            t.join()
+
+    assert not errors
+
+
+def test_prepared_warmup_error(dsn):
+    with pool.ConnectionPool(
+        dsn, min_size=1, prepared_warmup=2, configure=set_threshold_0
+    ) as p:
+        with p.connection() as conn:
+            conn.execute("create temp table warmup (id int)", prepare=False)
+            conn.execute("select * from warmup where id = %s", [1])
+            conn.execute("select %s::int", [1])
+            conn.close()
+
+        with p.connection() as conn:
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+            cur = conn.execute(
+                "select statement from pg_prepared_statements", prepare=False
+            )
+            assert [r[0] for r in cur] == ["select $1::int"]
+
+
+def test_warmup(dsn, svcconn):
+    svcconn.execute(
+        """
+        drop type if exists warmup_comp cascade;
+        create type warmup_comp as (a int, b text);
+        """
+    )
+
+    registered = []
+
+    def register(info, context):
+        registered.append(info)
+        info.register(context)
+
+    warmup = pool.Warmup(
+        settings={"application_name": "warmed", "lock_timeout": "5s"},
+        types=[
+            (CompositeInfo, "warmup_comp"),
+            (RangeInfo, "int4range"),
+            (TypeInfo, "hstore_missing"),
+            (TypeInfo, "text", register),
+        ],
+        statements=["select 1", ("select %s::int", [1])],
+    )
+    with pool.ConnectionPool(
+        dsn, min_size=2, kwargs={"autocommit": True}, warmup=warmup
+    ) as p:
+        p.wait()
+        conns = [p.getconn() for i in range(2)]
+        for conn in conns:
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+            cur = conn.execute("show application_name", prepare=False)
+            assert cur.fetchone()[0] == "warmed"
+            cur = conn.execute("show lock_timeout", prepare=False)
+            assert cur.fetchone()[0] == "5s"
+
+            cur = conn.execute(
+                "select statement from pg_prepared_statements order by 1",
+                prepare=False,
+            )
+            assert [r[0] for r in cur] == ["select $1::int", "select 1"]
+
+            n = len(conn._prepared._prepared)
+            conn.execute("select %s::int", [10])
+            assert len(conn._prepared._prepared) == n
+
+        types = []
+        for conn in conns:
+            cur = conn.execute("select (1, 'x')::warmup_comp")
+            rec = cur.fetchone()[0]
+            assert (rec.a, rec.b) == (1, "x")
+            types.append(type(rec))
+            p.putconn(conn)
+
+    assert types[0] is types[1]
+    assert len(registered) == 2
+    assert registered[0] is registered[1]
+
+
+@pytest.mark.slow
+def test_lifo_use(dsn):
+    with pool.ConnectionPool(dsn, min_size=4, policy="lifo") as p:
+        p.wait()
+        counts = Counter()
+        for i in range(8):
+            with p.connection() as conn:
+                sleep(0.01)
+                counts[id(conn)] += 1
+
+    assert len(counts) == 1
+
+
+@pytest.mark.slow
+def test_lifo_shrink(dsn):
+    def worker(n):
+        with p.connection() as conn:
+            conn.execute("select pg_sleep(0.1)")
+
+    with pool.ConnectionPool(
+        dsn, min_size=2, max_size=4, max_idle=0.2, policy="lifo"
+    ) as p:
+        p.wait(5.0)
+        ts = [Thread(target=worker, args=(i,)) for i in range(4)]
+        [t.start() for t in ts]
+        [t.join() for t in ts]
+        assert p.get_stats()["pool_size"] == 4
+
+        # Using the pool continuously, the cold connections are dropped
+        ids = set()
+        t0 = time()
+        while time() - t0 < 1.0:
+            with p.connection() as conn:
+                ids.add(id(conn))
+                sleep(0.01)
+
+        assert len(ids) == 1
+        assert p.get_stats()["pool_size"] == 2
+
+
 @pytest.mark.slow
 @pytest.mark.timing
 def test_resize(dsn):
@@ -885,6 +1412,77 @@ def test_check(dsn, caplog):
         assert pid not in pids2
 
 
+def test_probe(dsn):
+    with psycopg.connect(dsn) as conn:
+        conn.wait(pool.base.probe(conn.pgconn))
+        assert conn.info.transaction_status == TransactionStatus.IDLE
+
+        kill_backend(dsn, conn.pgconn.backend_pid)
+        with pytest.raises(psycopg.OperationalError):
+            conn.wait(pool.base.probe(conn.pgconn))
+
+
+@pytest.mark.skipif("sys.platform == 'win32'")
+def test_probe_high_fd(dsn):
+    # Push the connection socket beyond FD_SETSIZE
+    fds = []
+    try:
+        while not fds or fds[-1] < 1024:
+            fds.append(os.dup(0))
+    except OSError:
+        pytest.skip("can't open enough file descriptors")
+
+    try:
+        with psycopg.connect(dsn) as conn:
+            assert conn.pgconn.socket >= 1024
+            conn.wait(pool.base.probe(conn.pgconn))
+    finally:
+        for fd in fds:
+            os.close(fd)
+
+
+@pytest.mark.slow
+def test_check_interval(dsn):
+    with pool.ConnectionPool(dsn, min_size=4, check_interval=0.2) as p:
+        p.wait(1.0)
+        assert p.check_interval == 0.2
+        pids = set(conn.pgconn.backend_pid for conn in p._pool)
+        killed = list(pids)[:2]
+        for pid in killed:
+            kill_backend(dsn, pid)
+
+        sleep(0.9)
+        p.wait(1.0)
+        pids2 = set(conn.pgconn.backend_pid for conn in p._pool)
+        assert len(pids2) == 4
+        assert pids & pids2 == pids - set(killed)
+        assert p.get_stats()["connections_lost"] == 2
+
+
+@pytest.mark.slow
+def test_check_idle(dsn):
+    with pool.ConnectionPool(dsn, min_size=2, check_idle=0.1) as p:
+        p.wait(1.0)
+        with p.connection() as conn:
+            pid = conn.pgconn.backend_pid
+        kill_backend(dsn, pid)
+
+        # Recently used: not checked
+        with p.connection() as conn:
+            assert conn.pgconn.backend_pid != pid
+        assert p.get_stats().get("connections_lost", 0) == 0
+
+        sleep(0.2)
+        pids = set()
+        for i in range(2):
+            with p.connection() as conn:
+                conn.execute("select 1")
+                pids.add(conn.pgconn.backend_pid)
+
+        assert pid not in pids
+        assert p.get_stats()["connections_lost"] == 1
+
+
 @pytest.mark.skipif(
     sys.version_info >= (3, 7), reason="async pool supported from Python 3.7"
 )
@@ -973,6 +1571,56 @@ def test_stats_usage(dsn, retries):
                 assert p.get_stats()["requests_num"] == 1
 
 
+def test_histogram():
+    h = pool.Histogram()
+    assert h.count == h.sum == h.max == 0
+    assert h.percentile(99) == 0
+    for v in [0, 1, 2, 3, 100, 1000, -1]:
+        h.add(v)
+
+    assert h.count == 7
+    assert h.sum == 1106
+    assert h.max == 1000
+    assert list(h.buckets()) == [(0, 2), (1, 1), (3, 2), (127, 1), (1023, 1)]
+    assert h.percentile(0) == 0
+    assert h.percentile(50) == 3
+    assert h.percentile(80) == 127
+    assert h.percentile(100) == 1000
+    with pytest.raises(ValueError):
+        h.percentile(101)
+
+    h2 = h.copy()
+    h2.add(10 ** 12)
+    assert h.count == 7
+    assert h2.max == 10 ** 12
+    assert h2.percentile(100) == 10 ** 12
+
+
+@pytest.mark.slow
+def test_histograms(dsn):
+    def worker(n):
+        with p.connection() as conn:
+            conn.execute("select pg_sleep(0.1)")
+
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        p.wait()
+        ts = [Thread(target=worker, args=(i,)) for i in range(4)]
+        [t.start() for t in ts]
+        [t.join() for t in ts]
+
+        hs = p.get_histograms()
+        assert hs["connections_ms"].count == 2
+        assert hs["requests_wait_ms"].count == 4
+        assert hs["requests_wait_ms"].percentile(25) == 0
+        assert hs["requests_wait_ms"].max >= 80
+        assert hs["usage_ms"].count == 4
+        assert hs["usage_ms"].percentile(0) >= 64
+
+        hs = p.pop_histograms()
+        assert hs["usage_ms"].count == 4
+        assert p.get_histograms()["usage_ms"].count == 0
+
+
 @pytest.mark.slow
 def test_stats_connect(dsn, proxy, monkeypatch):
     proxy.start()
@@ -1015,6 +1663,89 @@ def test_spike(dsn, monkeypatch):
         assert len(p._pool) < 7
 
 
+def kill_backend(dsn, pid):
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("select pg_terminate_backend(%s)", [pid])
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "register_at_fork"), reason="fork() not supported"
+)
+def test_fork(dsn):
+    with pool.ConnectionPool(dsn, min_size=2) as p:
+        p.wait()
+        pids = set()
+        for i in range(2):
+            with p.connection() as conn:
+                pids.add(conn.pgconn.backend_pid)
+
+        rfd, wfd = os.pipe()
+        child = os.fork()
+        if not child:  # pragma: no cover
+            rv = 1
+            try:
+                assert p._restart_needed
+                assert not p._pool
+                p.wait(5.0)
+                with p.connection() as conn:
+                    conn.execute("select 1")
+                    if conn.pgconn.backend_pid not in pids:
+                        rv = 0
+                p.close()
+            finally:
+                os.write(wfd, bytes([rv]))
+                os._exit(0)
+
+        os.close(wfd)
+        with open(rfd, "rb") as f:
+            assert f.read() == b"\x00"
+        os.waitpid(child, 0)
+
+        # The connections in the parent are still good
+        got = set()
+        for i in range(2):
+            with p.connection() as conn:
+                conn.execute("select 1")
+                got.add(conn.pgconn.backend_pid)
+        assert got == pids
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "register_at_fork"), reason="fork() not supported"
+)
+def test_fork_connection_in_use(dsn):
+    with pool.ConnectionPool(dsn, min_size=1) as p:
+        p.wait()
+        rfd, wfd = os.pipe()
+        with p.connection() as conn:
+            pid = conn.pgconn.backend_pid
+            child = os.fork()
+
+        if not child:  # pragma: no cover
+            rv = 1
+            try:
+                # The connection returned in the child is discarded
+                assert conn.closed
+                with p.connection() as conn:
+                    conn.execute("select 1")
+                    if conn.pgconn.backend_pid != pid:
+                        rv = 0
+                p.close()
+            finally:
+                os.write(wfd, bytes([rv]))
+                os._exit(0)
+
+        os.close(wfd)
+        with open(rfd, "rb") as f:
+            assert f.read() == b"\x00"
+        os.waitpid(child, 0)
+
+        # The connection in the parent is still good
+        with p.connection() as conn:
+            conn.execute("select 1")
+            assert conn.pgconn.backend_pid == pid
+
+
 def delay_connection(monkeypatch, sec):
     """
     Return a _connect_gen function delayed by the amount of seconds
@@ -3,11 +3,15 @@ import asyncio
 import logging
 from time import time
 from collections import Counter
+from unittest.mock import Mock
 
 import pytest
 
 import psycopg
 from psycopg.pq import TransactionStatus
+from psycopg.types import TypeInfo
+from psycopg.types.range import RangeInfo
+from psycopg.types.composite import CompositeInfo
 from psycopg._compat import create_task
 
 pytestmark = [
@@ -124,6 +128,52 @@ async def test_concurrent_filling(dsn, monkeypatch, retries):
                     assert got == pytest.approx(want, 0.1), times
 
 
+@pytest.mark.slow
+@pytest.mark.timing
+async def test_connect_concurrency(dsn, monkeypatch, retries):
+    delay_connection(monkeypatch, 0.1)
+
+    async def add_time(self, conn):
+        times.append(time() - t0)
+        await add_orig(self, conn)
+
+    add_orig = pool.AsyncConnectionPool._add_to_pool
+    monkeypatch.setattr(pool.AsyncConnectionPool, "_add_to_pool", add_time)
+
+    async for retry in retries:
+        with retry:
+            times = []
+            t0 = time()
+
+            async with pool.AsyncConnectionPool(
+                dsn, min_size=6, num_workers=1, connect_concurrency=3
+            ) as p:
+                await p.wait(1.0)
+                want_times = [0.1, 0.1, 0.1, 0.2, 0.2, 0.2]
+                assert len(times) == len(want_times)
+                for got, want in zip(times, want_times):
+                    assert got == pytest.approx(want, 0.1), times
+
+    with pytest.raises(ValueError):
+        pool.AsyncConnectionPool(dsn, connect_concurrency=0)
+
+
+@pytest.mark.slow
+@pytest.mark.timing
+async def test_wait_progress(dsn, monkeypatch, caplog):
+    caplog.set_level(logging.INFO, logger="psycopg.pool")
+    delay_connection(monkeypatch, 0.1)
+    with pytest.raises(pool.PoolTimeout) as exc:
+        async with pool.AsyncConnectionPool(
+            dsn, min_size=4, num_workers=1, name="progress"
+        ) as p:
+            await p.wait(0.25)
+
+    assert "2 connections ready out of 4" in str(exc.value)
+    msgs = [r.message for r in caplog.records]
+    assert "pool 'progress': 1 connections ready out of 4" in msgs
+
+
 @pytest.mark.slow
 @pytest.mark.timing
 async def test_wait_ready(dsn, monkeypatch):
@@ -255,6 +305,131 @@ async def test_reset(dsn):
         assert resets == 2
 
 
+async def test_reset_command(dsn):
+    reset = "set application_name to 'reset'"
+    async with pool.AsyncConnectionPool(dsn, min_size=1, reset=reset) as p:
+        async with p.connection() as conn:
+            await conn.execute("select 1")
+            assert conn._session_changed is False
+
+        async with p.connection() as conn:
+            # The session wasn't changed: reset skipped
+            cur = await conn.execute("show application_name")
+            assert await cur.fetchone() != ("reset",)
+            await conn.execute("set timezone to '+2:00'")
+            assert conn._session_changed is True
+
+        await p.wait()
+        async with p.connection() as conn:
+            cur = await conn.execute("show application_name")
+            assert await cur.fetchone() == ("reset",)
+            assert conn._session_changed is False
+
+
+@pytest.mark.parametrize(
+    "query, changed",
+    [
+        ("select 1", False),
+        ("insert into tmp values (1)", False),
+        ("begin; update tmp set id = 2; commit", False),
+        ("set timezone to utc", True),
+        ("create temp table tmp2 (id int)", True),
+        ("create temp table tmp2 as select 1", True),
+        ("select 1 into temp tmp2", True),
+        ("select set_config('application_name', 'x', false)", True),
+        ("select pg_advisory_lock(42)", True),
+        ("select * from pg_try_advisory_lock_shared(42)", True),
+        ("listen chan", True),
+    ],
+)
+async def test_reset_command_changes(dsn, query, changed):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=1, reset="discard all"
+    ) as p:
+        async with p.connection() as conn:
+            await conn.execute("create temp table tmp (id int)")
+            assert conn._session_changed is True
+            conn._session_changed = False
+            await conn.execute(query)
+            assert conn._session_changed is changed
+
+
+async def test_reset_command_stream(dsn):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=1, reset="reset all"
+    ) as p:
+        async with p.connection() as conn:
+            async for rec in conn.cursor().stream("select 1"):
+                pass
+            assert conn._session_changed is False
+            async for rec in conn.cursor().stream(
+                "select set_config('application_name', 'x', false)"
+            ):
+                pass
+            assert conn._session_changed is True
+
+
+async def test_reset_command_rollback(dsn):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=1, reset="reset all"
+    ) as p:
+        conn = await p.getconn()
+        pid1 = conn.pgconn.backend_pid
+        await conn.execute("set timezone to '+2:00'")
+        await conn.execute("set datestyle to 'SQL, DMY'")
+        await conn.commit()
+        await conn.execute("select 1")
+        await p.putconn(conn)
+
+        async with p.connection() as conn:
+            assert conn.pgconn.backend_pid == pid1
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+            cur = await conn.execute("show datestyle")
+            assert await cur.fetchone() == ("ISO, MDY",)
+
+
+async def test_reset_command_discard(dsn):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=1, reset="discard all"
+    ) as p:
+        conn = await p.getconn()
+        pid1 = conn.pgconn.backend_pid
+        await conn.execute("select %s::int", [1], prepare=True)
+        await conn.execute("listen foo")
+        await p.putconn(conn)
+
+        async with p.connection() as conn:
+            assert conn.pgconn.backend_pid == pid1
+            cur = await conn.execute("select pg_listening_channels()")
+            assert await cur.fetchall() == []
+            cur = await conn.execute("select %s::int", [1], prepare=True)
+            assert await cur.fetchone() == (1,)
+
+
+async def test_reset_command_discard_temp(dsn):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=1, reset="discard temp"
+    ) as p:
+        conn = await p.getconn()
+        pid1 = conn.pgconn.backend_pid
+        await conn.execute("select %s::int", [1], prepare=True)
+        await conn.execute("create temp table tmp (id int)")
+        await p.putconn(conn)
+
+        # The prepared statements are not dropped: the connection remembers
+        async with p.connection() as conn:
+            assert conn.pgconn.backend_pid == pid1
+            assert b"select $1::int" in [
+                k[0] for k in conn._prepared._prepared
+            ]
+            cur = await conn.execute("select %s::int", [1], prepare=True)
+            assert (await cur.fetchone()) == (1,)
+            cur = await conn.execute(
+                "select count(*) from pg_prepared_statements", prepare=False
+            )
+            assert (await cur.fetchone()) == (1,)
+
+
 async def test_reset_badstate(dsn, caplog):
     caplog.set_level(logging.WARNING, logger="psycopg.pool")
 
@@ -324,6 +499,39 @@ async def test_queue(dsn, retries):
             assert len(set(r[2] for r in results)) == 2, results
 
 
+@pytest.mark.slow
+async def test_queue_priority(dsn):
+    async def worker(n, priority):
+        async with p.connection(priority=priority):
+            order.append(n)
+
+    order = []
+    async with pool.AsyncConnectionPool(dsn, min_size=1) as p:
+        await p.wait()
+        async with p.connection():
+            ts = []
+            for n, priority in enumerate([0, 0, 10, 5, 10]):
+                ts.append(create_task(worker(n, priority)))
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(*ts)
+
+    assert order == [2, 4, 3, 0, 1]
+
+
+async def test_queue_expired():
+    pos = pool.pool_async.AsyncClient(0.05)
+    await asyncio.sleep(0.1)
+    assert not await pos.set(Mock())
+    with pytest.raises(pool.PoolTimeout):
+        await pos.wait()
+
+    pos = pool.pool_async.AsyncClient(1.0)
+    conn = Mock()
+    assert await pos.set(conn)
+    assert await pos.wait() is conn
+
+
 @pytest.mark.slow
 async def test_queue_size(dsn):
     async def worker(t, ev=None):
@@ -683,6 +891,36 @@ async def test_grow(dsn, monkeypatch, retries):
                 assert got == pytest.approx(want, 0.1), times
 
 
+@pytest.mark.slow
+@pytest.mark.timing
+async def test_grow_adaptive(dsn, monkeypatch, retries):
+    delay_connection(monkeypatch, 0.1)
+
+    async def worker(n):
+        t0 = time()
+        async with p.connection() as conn:
+            await conn.execute("select 1 from pg_sleep(0.2)")
+        t1 = time()
+        results.append((n, t1 - t0))
+
+    async for retry in retries:
+        with retry:
+            async with pool.AsyncConnectionPool(
+                dsn, min_size=2, max_size=4, num_workers=3, adaptive=True
+            ) as p:
+                await p.wait(1.0)
+                ts = []
+                results = []
+
+                ts = [create_task(worker(i)) for i in range(6)]
+                await asyncio.gather(*ts)
+
+            want_times = [0.2, 0.2, 0.3, 0.3, 0.4, 0.4]
+            times = [item[1] for item in results]
+            for got, want in zip(times, want_times):
+                assert got == pytest.approx(want, 0.1), times
+
+
 @pytest.mark.slow
 @pytest.mark.timing
 async def test_shrink(dsn, monkeypatch):
@@ -820,6 +1058,148 @@ async def test_uniform_use(dsn, retries):
             assert set(counts.values()) == set([2])
 
 
+async def test_policy(dsn):
+    async with pool.AsyncConnectionPool(dsn, min_size=2) as p:
+        assert p.policy == "fifo"
+
+    async with pool.AsyncConnectionPool(dsn, min_size=2, policy="lifo") as p:
+        assert p.policy == "lifo"
+
+    with pytest.raises(ValueError):
+        pool.AsyncConnectionPool(dsn, min_size=2, policy="random")
+
+
+async def set_threshold_2(conn):
+    conn.prepare_threshold = 2
+
+
+async def set_threshold_0(conn):
+    conn.prepare_threshold = 0
+
+
+async def test_prepared_warmup(dsn):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=1, prepared_warmup=2, configure=set_threshold_2
+    ) as p:
+        async with p.connection() as conn:
+            pid1 = conn.pgconn.backend_pid
+            for i in range(3):
+                await conn.execute("select %s::int", [i])
+            for i in range(4):
+                await conn.execute("select %s::text", [str(i)])
+            await conn.execute("select 1")
+            await conn.close()
+
+        async with p.connection() as conn:
+            assert conn.pgconn.backend_pid != pid1
+            cur = await conn.execute(
+                "select statement from pg_prepared_statements order by 1"
+            )
+            assert [r[0] async for r in cur] == [
+                "select $1::int",
+                "select $1::text",
+            ]
+
+            n = len(conn._prepared._prepared)
+            await conn.execute("select %s::int", [10])
+            assert len(conn._prepared._prepared) == n
+
+    with pytest.raises(ValueError):
+        pool.AsyncConnectionPool(dsn, min_size=1, prepared_warmup=-1)
+
+
+async def test_prepared_warmup_error(dsn):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=1, prepared_warmup=2, configure=set_threshold_0
+    ) as p:
+        async with p.connection() as conn:
+            await conn.execute(
+                "create temp table warmup (id int)", prepare=False
+            )
+            await conn.execute("select * from warmup where id = %s", [1])
+            await conn.execute("select %s::int", [1])
+            await conn.close()
+
+        async with p.connection() as conn:
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+            cur = await conn.execute(
+                "select statement from pg_prepared_statements", prepare=False
+            )
+            assert [r[0] async for r in cur] == ["select $1::int"]
+
+
+async def test_warmup(dsn, svcconn):
+    svcconn.execute(
+        """
+        drop type if exists warmup_comp cascade;
+        create type warmup_comp as (a int, b text);
+        """
+    )
+
+    registered = []
+
+    def register(info, context):
+        registered.append(info)
+        info.register(context)
+
+    warmup = pool.Warmup(
+        settings={"application_name": "warmed", "lock_timeout": "5s"},
+        types=[
+            (CompositeInfo, "warmup_comp"),
+            (RangeInfo, "int4range"),
+            (TypeInfo, "hstore_missing"),
+            (TypeInfo, "text", register),
+        ],
+        statements=["select 1", ("select %s::int", [1])],
+    )
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=2, kwargs={"autocommit": True}, warmup=warmup
+    ) as p:
+        await p.wait()
+        conns = [await p.getconn() for i in range(2)]
+        for conn in conns:
+            assert conn.pgconn.transaction_status == TransactionStatus.IDLE
+            cur = await conn.execute("show application_name", prepare=False)
+            assert (await cur.fetchone())[0] == "warmed"
+            cur = await conn.execute("show lock_timeout", prepare=False)
+            assert (await cur.fetchone())[0] == "5s"
+
+            cur = await conn.execute(
+                "select statement from pg_prepared_statements order by 1",
+                prepare=False,
+            )
+            assert [r[0] async for r in cur] == ["select $1::int", "select 1"]
+
+            n = len(conn._prepared._prepared)
+            await conn.execute("select %s::int", [10])
+            assert len(conn._prepared._prepared) == n
+
+        types = []
+        for conn in conns:
+            cur = await conn.execute("select (1, 'x')::warmup_comp")
+            rec = (await cur.fetchone())[0]
+            assert (rec.a, rec.b) == (1, "x")
+            types.append(type(rec))
+            await p.putconn(conn)
+
+    assert types[0] is types[1]
+    assert len(registered) == 2
+    assert registered[0] is registered[1]
+
+
+@pytest.mark.slow
+async def test_lifo_use(dsn):
+    async with pool.AsyncConnectionPool(dsn, min_size=4, policy="lifo") as p:
+        await p.wait()
+        counts = Counter()
+        for i in range(8):
+            async with p.connection() as conn:
+                await asyncio.sleep(0.01)
+                counts[id(conn)] += 1
+
+    assert len(counts) == 1
+
+
 @pytest.mark.slow
 @pytest.mark.timing
 async def test_resize(dsn):
@@ -906,6 +1286,49 @@ async def test_check(dsn, caplog):
         assert pid not in pids2
 
 
+@pytest.mark.slow
+async def test_check_interval(dsn):
+    async with pool.AsyncConnectionPool(
+        dsn, min_size=4, check_interval=0.2
+    ) as p:
+        await p.wait(1.0)
+        pids = set(conn.pgconn.backend_pid for conn in p._pool)
+        killed = list(pids)[:2]
+        for pid in killed:
+            await kill_backend(dsn, pid)
+
+        await asyncio.sleep(0.9)
+        await p.wait(1.0)
+        pids2 = set(conn.pgconn.backend_pid for conn in p._pool)
+        assert len(pids2) == 4
+        assert pids & pids2 == pids - set(killed)
+        assert p.get_stats()["connections_lost"] == 2
+
+
+@pytest.mark.slow
+async def test_check_idle(dsn):
+    async with pool.AsyncConnectionPool(dsn, min_size=2, check_idle=0.1) as p:
+        await p.wait(1.0)
+        async with p.connection() as conn:
+            pid = conn.pgconn.backend_pid
+        await kill_backend(dsn, pid)
+
+        # Recently used: not checked
+        async with p.connection() as conn:
+            assert conn.pgconn.backend_pid != pid
+        assert p.get_stats().get("connections_lost", 0) == 0
+
+        await asyncio.sleep(0.2)
+        pids = set()
+        for i in range(2):
+            async with p.connection() as conn:
+                await conn.execute("select 1")
+                pids.add(conn.pgconn.backend_pid)
+
+        assert pid not in pids
+        assert p.get_stats()["connections_lost"] == 1
+
+
 @pytest.mark.slow
 @pytest.mark.timing
 async def test_stats_measures(dsn):
@@ -981,6 +1404,29 @@ async def test_stats_usage(dsn, retries):
                 assert p.get_stats()["requests_num"] == 1
 
 
+@pytest.mark.slow
+async def test_histograms(dsn):
+    async def worker(n):
+        async with p.connection() as conn:
+            await conn.execute("select pg_sleep(0.1)")
+
+    async with pool.AsyncConnectionPool(dsn, min_size=2) as p:
+        await p.wait()
+        await asyncio.gather(*(worker(i) for i in range(4)))
+
+        hs = p.get_histograms()
+        assert hs["connections_ms"].count == 2
+        assert hs["requests_wait_ms"].count == 4
+        assert hs["requests_wait_ms"].percentile(25) == 0
+        assert hs["requests_wait_ms"].max >= 80
+        assert hs["usage_ms"].count == 4
+        assert hs["usage_ms"].percentile(0) >= 64
+
+        hs = p.pop_histograms()
+        assert hs["usage_ms"].count == 4
+        assert p.get_histograms()["usage_ms"].count == 0
+
+
 @pytest.mark.slow
 async def test_stats_connect(dsn, proxy, monkeypatch):
     proxy.start()
@@ -1022,6 +1468,13 @@ async def test_spike(dsn, monkeypatch):
         assert len(p._pool) < 7
 
 
+async def kill_backend(dsn, pid):
+    async with await psycopg.AsyncConnection.connect(
+        dsn, autocommit=True
+    ) as conn:
+        await conn.execute("select pg_terminate_backend(%s)", [pid])
+
+
 def delay_connection(monkeypatch, sec):
     """
     Return a _connect_gen function delayed by the amount of seconds
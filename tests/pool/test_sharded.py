@@ -0,0 +1,115 @@
+from collections import Counter
+
+import pytest
+
+import psycopg
+
+try:
+    from psycopg_pool import ShardedPool  # noqa: F401
+except ImportError as ex:
+    pytestmark = pytest.mark.skip(reason=str(ex))
+else:
+    import psycopg_pool as pool
+    from psycopg_pool.sharded import HashRing
+
+
+def test_ring_stable():
+    ring = HashRing(["a", "b", "c"])
+    keys = range(1000)
+    shards = [ring.get(k) for k in keys]
+    assert shards == [HashRing(["a", "b", "c"]).get(k) for k in keys]
+    assert ring.get(42) == ring.get("42") == ring.get(b"42")
+
+
+def test_ring_balance():
+    ring = HashRing([str(i) for i in range(4)])
+    counts = Counter(ring.get(f"tenant-{i}") for i in range(10000))
+    assert len(counts) == 4
+    for n in counts.values():
+        assert 1500 < n < 3500
+
+
+def test_ring_add_shard():
+    ring1 = HashRing(["a", "b", "c"])
+    ring2 = HashRing(["a", "b", "c", "d"])
+    moved = 0
+    for i in range(10000):
+        s1 = ring1.get(i)
+        s2 = ring2.get(i)
+        if s1 != s2:
+            assert s2 == "d"
+            moved += 1
+
+    assert 1000 < moved < 4000
+
+
+def test_ring_errors():
+    with pytest.raises(ValueError):
+        HashRing([])
+    with pytest.raises(ValueError):
+        HashRing(["a", "a"])
+    with pytest.raises(ValueError):
+        HashRing(["a"], vnodes=0)
+
+
+def test_bad_names(dsn):
+    with pytest.raises(ValueError):
+        pool.ShardedPool([])
+    with pytest.raises(ValueError):
+        pool.ShardedPool([dsn, dsn], names=["a"])
+
+
+def test_route(dsn):
+    with pool.ShardedPool([dsn, dsn, dsn], min_size=1) as p:
+        assert list(p.shards) == ["0", "1", "2"]
+        for key in ["foo", "bar", 42]:
+            with p.connection(key) as conn:
+                assert conn._pool is p.shards[p.ring.get(key)]
+                assert conn._pool is p.get_pool(key)
+                conn.execute("select 1")
+
+
+def test_names(dsn):
+    with pool.ShardedPool(
+        [dsn, dsn], names=["eu", "us"], name="tenants", min_size=1
+    ) as p:
+        assert p.shards["eu"].name == "tenants-eu"
+        assert p.shards["us"].name == "tenants-us"
+        assert set(p.get_stats()) == {"eu", "us"}
+
+
+def test_map(dsn):
+    def pid(conn):
+        return conn.execute("select pg_backend_pid()").fetchone()[0]
+
+    with pool.ShardedPool([dsn, dsn], names=["a", "b"], min_size=1) as p:
+        rv = p.map(pid)
+        assert list(rv) == ["a", "b"]
+        assert rv["a"] != rv["b"]
+
+        stats = p.get_stats()
+        assert stats["a"]["requests_num"] == 1
+        assert stats["b"]["requests_num"] == 1
+
+
+def test_map_error(dsn):
+    def fail(conn):
+        if conn._pool.name.endswith("-b"):
+            conn.execute("wat")
+        return 1
+
+    with pool.ShardedPool([dsn, dsn], names=["a", "b"], min_size=1) as p:
+        with pytest.raises(psycopg.errors.SyntaxError):
+            p.map(fail)
+
+
+def test_closed(dsn):
+    p = pool.ShardedPool([dsn], min_size=1)
+    p.close()
+    assert p.closed
+    assert p.shards["0"].closed
+    with pytest.raises(pool.PoolClosed):
+        with p.connection("foo"):
+            pass
+    with pytest.raises(pool.PoolClosed):
+        p.map(lambda conn: None)
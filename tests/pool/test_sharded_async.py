@@ -0,0 +1,86 @@
+import sys
+
+import pytest
+
+import psycopg
+
+pytestmark = [
+    pytest.mark.asyncio,
+    pytest.mark.skipif(
+        sys.version_info < (3, 7),
+        reason="async pool not supported before Python 3.7",
+    ),
+]
+
+try:
+    from psycopg_pool import AsyncShardedPool  # noqa: F401
+except ImportError as ex:
+    pytestmark.append(pytest.mark.skip(reason=str(ex)))
+else:
+    import psycopg_pool as pool
+
+
+async def test_bad_names(dsn):
+    with pytest.raises(ValueError):
+        pool.AsyncShardedPool([])
+    with pytest.raises(ValueError):
+        pool.AsyncShardedPool([dsn, dsn], names=["a"])
+
+
+async def test_route(dsn):
+    async with pool.AsyncShardedPool([dsn, dsn, dsn], min_size=1) as p:
+        assert list(p.shards) == ["0", "1", "2"]
+        for key in ["foo", "bar", 42]:
+            async with p.connection(key) as conn:
+                assert conn._pool is p.shards[p.ring.get(key)]
+                assert conn._pool is p.get_pool(key)
+                await conn.execute("select 1")
+
+
+async def test_names(dsn):
+    async with pool.AsyncShardedPool(
+        [dsn, dsn], names=["eu", "us"], name="tenants", min_size=1
+    ) as p:
+        assert p.shards["eu"].name == "tenants-eu"
+        assert p.shards["us"].name == "tenants-us"
+        assert set(p.get_stats()) == {"eu", "us"}
+
+
+async def test_map(dsn):
+    async def pid(conn):
+        cur = await conn.execute("select pg_backend_pid()")
+        return (await cur.fetchone())[0]
+
+    async with pool.AsyncShardedPool(
+        [dsn, dsn], names=["a", "b"], min_size=1
+    ) as p:
+        rv = await p.map(pid)
+        assert list(rv) == ["a", "b"]
+        assert rv["a"] != rv["b"]
+
+        stats = p.get_stats()
+        assert stats["a"]["requests_num"] == 1
+        assert stats["b"]["requests_num"] == 1
+
+
+async def test_map_error(dsn):
+    async def fail(conn):
+        if conn._pool.name.endswith("-b"):
+            await conn.execute("wat")
+        return 1
+
+    async with pool.AsyncShardedPool(
+        [dsn, dsn], names=["a", "b"], min_size=1
+    ) as p:
+        with pytest.raises(psycopg.errors.SyntaxError):
+            await p.map(fail)
+
+
+async def test_closed(dsn):
+    p = pool.AsyncShardedPool([dsn], min_size=1)
+    await p.close()
+    assert p.closed
+    assert p.shards["0"].closed
+    with pytest.raises(pool.PoolClosed):
+        async with p.connection("foo"):
+            pass
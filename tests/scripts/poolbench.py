@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Measure the throughput of a connection pool with an increasing number of threads.
+
+Every thread takes a connection from the pool and returns it immediately, in
+a loop: the test measures the overhead of the pool, not the database.
+"""
+
+import sys
+import time
+import threading
+
+import psycopg_pool
+
+import logging
+
+
+def main():
+    opt = parse_cmdline()
+    if opt.loglevel:
+        loglevel = getattr(logging, opt.loglevel.upper())
+        logging.basicConfig(
+            level=loglevel, format="%(asctime)s %(levelname)s %(message)s"
+        )
+
+    with psycopg_pool.ConnectionPool(
+        opt.dsn, min_size=opt.min_size, policy=opt.policy
+    ) as pool:
+        pool.wait()
+        print("threads,ops,ops/sec,p99 wait msec")
+        for nthreads in opt.threads:
+            pool.pop_stats()
+            pool.pop_histograms()
+            ops = run(pool, nthreads, opt.duration)
+            wait = pool.pop_histograms()["requests_wait_ms"]
+            print(
+                f"{nthreads},{ops},{ops / opt.duration:.0f}"
+                f",{wait.percentile(99)}"
+            )
+
+
+def run(pool, nthreads, duration):
+    """Run *nthreads* threads for *duration* sec, return the number of ops."""
+    counts = [0] * nthreads
+    start = threading.Event()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(
+            target=worker, args=(pool, counts, i, start, stop), daemon=True
+        )
+        for i in range(nthreads)
+    ]
+    [t.start() for t in threads]
+
+    start.set()
+    time.sleep(duration)
+    stop.set()
+    [t.join() for t in threads]
+    return sum(counts)
+
+
+def worker(pool, counts, idx, start, stop):
+    start.wait()
+    n = 0
+    while not stop.is_set():
+        conn = pool.getconn()
+        pool.putconn(conn)
+        n += 1
+    counts[idx] = n
+
+
+def parse_cmdline():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--dsn", default="", help="connection string to the database"
+    )
+    parser.add_argument(
+        "--min_size",
+        default=8,
+        type=int,
+        help="number of connections in the pool",
+    )
+    parser.add_argument(
+        "--threads",
+        default=[1, 2, 4, 8, 16, 32, 64, 128, 256],
+        type=lambda s: [int(n) for n in s.split(",")],
+        help="comma-separated numbers of threads to test with",
+    )
+    parser.add_argument(
+        "--duration",
+        default=2.0,
+        type=float,
+        help="time to run each test for, in seconds",
+    )
+    parser.add_argument(
+        "--policy",
+        default="fifo",
+        choices=("fifo", "lifo"),
+        help="policy of the pool",
+    )
+    parser.add_argument(
+        "--loglevel",
+        default=None,
+        choices=("DEBUG", "INFO", "WARNING", "ERROR"),
+        help="level to log at [default: no log]",
+    )
+
+    opt = parser.parse_args()
+
+    return opt
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -33,6 +33,7 @@ def main():
         opt.dsn,
         min_size=opt.min_size,
         max_size=opt.max_size,
+        adaptive=opt.adaptive,
         connection_class=DelayedConnection,
         kwargs={"conn_delay": 0.150},
     ) as pool:
@@ -43,7 +44,7 @@ def main():
         ev = threading.Event()
         threads = [
             threading.Thread(
-                target=worker, args=(pool, 0.002, ev), daemon=True
+                target=worker, args=(pool, opt.usage_time, ev), daemon=True
             )
             for i in range(opt.num_clients)
         ]
@@ -142,6 +143,17 @@ def parse_cmdline():
         type=int,
         help="number of threads making a request",
     )
+    parser.add_argument(
+        "--usage-time",
+        default=0.002,
+        type=float,
+        help="time each client holds its connection, in seconds",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="use the adaptive pool sizing",
+    )
     parser.add_argument(
         "--loglevel",
         default=None,
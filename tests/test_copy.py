@@ -119,6 +119,58 @@ def test_rows(conn, format):
     assert conn.pgconn.transaction_status == conn.TransactionStatus.INTRANS
 
 
+@pytest.mark.parametrize("format", [Format.TEXT, Format.BINARY])
+def test_read_rows_batch(conn, format):
+    cur = conn.cursor()
+    with cur.copy(
+        f"""copy (
+            select x, 'hello ' || x from generate_series(1, 1000) x
+        ) to stdout (format {format.name})"""
+    ) as copy:
+        copy.set_types(["int4", "text"])
+        rows = []
+        while True:
+            batch = copy.read_rows_batch(100)
+            assert len(batch) <= 100
+            if not batch:
+                break
+            rows.extend(batch)
+
+        assert copy.read_rows_batch() == []
+
+    assert rows == [(x, f"hello {x}") for x in range(1, 1001)]
+    assert cur.rowcount == 1000
+    assert conn.pgconn.transaction_status == conn.TransactionStatus.INTRANS
+
+
+@pytest.mark.parametrize("format", [Format.TEXT, Format.BINARY])
+def test_read_rows_batch_empty(conn, format):
+    cur = conn.cursor()
+    with cur.copy(
+        f"copy (select 1 where false) to stdout (format {format.name})"
+    ) as copy:
+        assert copy.read_rows_batch() == []
+        assert copy.read_rows_batch() == []
+
+    assert cur.rowcount == 0
+    assert conn.pgconn.transaction_status == conn.TransactionStatus.INTRANS
+
+
+@pytest.mark.parametrize("format", [Format.TEXT, Format.BINARY])
+def test_rows_batch_size(conn, format):
+    cur = conn.cursor()
+    with cur.copy(
+        f"""copy (
+            select x from generate_series(1, 100) x
+        ) to stdout (format {format.name})"""
+    ) as copy:
+        copy.set_types(["int4"])
+        rows = list(copy.rows(batch_size=7))
+
+    assert rows == [(x,) for x in range(1, 101)]
+    assert conn.pgconn.transaction_status == conn.TransactionStatus.INTRANS
+
+
 def test_set_custom_type(conn, hstore):
     command = """copy (select '"a"=>"1", "b"=>"2"'::hstore) to stdout"""
     cur = conn.cursor()
@@ -528,6 +580,46 @@ def test_worker_life(conn, format, buffer):
     assert data == sample_records
 
 
+def test_worker_merge_buffers(conn):
+    cur = conn.cursor()
+    ensure_table(cur, sample_tabledef)
+    with cur.copy("copy copy_in (col2) from stdin") as copy:
+        copy.QUEUE_SIZE = 1000
+        copy.SEND_SIZE = 100
+        for i in range(1000):
+            copy.write(f"{i}\n")
+
+    stats = copy.get_stats()
+    nbytes = sum(len(f"{i}\n") for i in range(1000))
+    assert stats["write_bytes"] == stats["send_bytes"] == nbytes
+    assert nbytes // 100 <= stats["send_num"] < 1000
+    data = cur.execute("select col2 from copy_in order by 1").fetchall()
+    assert data == [(i,) for i in range(1000)]
+
+
+def test_worker_error(conn, monkeypatch):
+    def copy_to_broken(pgconn, buffer):
+        raise ZeroDivisionError
+        yield
+
+    monkeypatch.setattr(psycopg.copy, "copy_to", copy_to_broken)
+    cur = conn.cursor()
+    ensure_table(cur, sample_tabledef)
+    with pytest.raises(ZeroDivisionError):
+        with cur.copy("copy copy_in (col2) from stdin") as copy:
+            copy.QUEUE_SIZE = 10
+            for i in range(1000):
+                copy.write(f"{i}\n")
+
+    assert copy._worker_error
+    assert not copy._worker
+
+    # The copy was terminated: the connection can be used again
+    conn.rollback()
+    cur.execute("select 1")
+    assert cur.fetchone() == (1,)
+
+
 @pytest.mark.slow
 @pytest.mark.parametrize("fmt", [Format.TEXT, Format.BINARY])
 @pytest.mark.parametrize("method", ["read", "iter", "row", "rows"])
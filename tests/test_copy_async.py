@@ -96,6 +96,45 @@ async def test_rows(aconn, format):
     assert aconn.pgconn.transaction_status == aconn.TransactionStatus.INTRANS
 
 
+@pytest.mark.parametrize("format", [Format.TEXT, Format.BINARY])
+async def test_read_rows_batch(aconn, format):
+    cur = aconn.cursor()
+    async with cur.copy(
+        f"""copy (
+            select x, 'hello ' || x from generate_series(1, 1000) x
+        ) to stdout (format {format.name})"""
+    ) as copy:
+        copy.set_types(["int4", "text"])
+        rows = []
+        while True:
+            batch = await copy.read_rows_batch(100)
+            assert len(batch) <= 100
+            if not batch:
+                break
+            rows.extend(batch)
+
+        assert await copy.read_rows_batch() == []
+
+    assert rows == [(x, f"hello {x}") for x in range(1, 1001)]
+    assert cur.rowcount == 1000
+    assert aconn.pgconn.transaction_status == aconn.TransactionStatus.INTRANS
+
+
+@pytest.mark.parametrize("format", [Format.TEXT, Format.BINARY])
+async def test_rows_batch_size(aconn, format):
+    cur = aconn.cursor()
+    async with cur.copy(
+        f"""copy (
+            select x from generate_series(1, 100) x
+        ) to stdout (format {format.name})"""
+    ) as copy:
+        copy.set_types(["int4"])
+        rows = [row async for row in copy.rows(batch_size=7)]
+
+    assert rows == [(x,) for x in range(1, 101)]
+    assert aconn.pgconn.transaction_status == aconn.TransactionStatus.INTRANS
+
+
 async def test_set_custom_type(aconn, hstore):
     command = """copy (select '"a"=>"1", "b"=>"2"'::hstore) to stdout"""
     cur = aconn.cursor()
@@ -525,6 +564,47 @@ async def test_worker_life(aconn, format, buffer):
     assert data == sample_records
 
 
+async def test_worker_merge_buffers(aconn):
+    cur = aconn.cursor()
+    await ensure_table(cur, sample_tabledef)
+    async with cur.copy("copy copy_in (col2) from stdin") as copy:
+        copy.QUEUE_SIZE = 1000
+        copy.SEND_SIZE = 100
+        for i in range(1000):
+            await copy.write(f"{i}\n")
+
+    stats = copy.get_stats()
+    nbytes = sum(len(f"{i}\n") for i in range(1000))
+    assert stats["write_bytes"] == stats["send_bytes"] == nbytes
+    assert nbytes // 100 <= stats["send_num"] < 1000
+    await cur.execute("select col2 from copy_in order by 1")
+    data = await cur.fetchall()
+    assert data == [(i,) for i in range(1000)]
+
+
+async def test_worker_error(aconn, monkeypatch):
+    def copy_to_broken(pgconn, buffer):
+        raise ZeroDivisionError
+        yield
+
+    monkeypatch.setattr(psycopg.copy, "copy_to", copy_to_broken)
+    cur = aconn.cursor()
+    await ensure_table(cur, sample_tabledef)
+    with pytest.raises(ZeroDivisionError):
+        async with cur.copy("copy copy_in (col2) from stdin") as copy:
+            copy.QUEUE_SIZE = 10
+            for i in range(1000):
+                await copy.write(f"{i}\n")
+
+    assert copy._worker_error
+    assert not copy._worker
+
+    # The copy was terminated: the connection can be used again
+    await aconn.rollback()
+    await cur.execute("select 1")
+    assert await cur.fetchone() == (1,)
+
+
 @pytest.mark.slow
 @pytest.mark.parametrize("fmt", [Format.TEXT, Format.BINARY])
 @pytest.mark.parametrize("method", ["read", "iter", "row", "rows"])
@@ -237,6 +237,76 @@ def test_executemany_null_first(conn, fmt_in):
         )
 
 
+def test_copy_upsert(conn, execmany):
+    cur = conn.cursor()
+    cur.execute(
+        "insert into execmany (id, num, data) values (1, 10, 'a'), (2, 20, 'b')"
+    )
+    nrows = cur.copy_upsert(
+        "execmany",
+        [(2, 21, "bb"), (3, 30, "c")],
+        ["id"],
+        ["num", "data"],
+    )
+    assert nrows == 2
+    cur.execute("select id, num, data from execmany order by id")
+    assert cur.fetchall() == [(1, 10, "a"), (2, 21, "bb"), (3, 30, "c")]
+
+
+def test_copy_upsert_do_nothing(conn, execmany):
+    cur = conn.cursor()
+    cur.execute("insert into execmany (id, num) values (1, 10)")
+    nrows = cur.copy_upsert(
+        sql.Identifier("execmany"), iter([(1,), (2,)]), ["id"]
+    )
+    assert nrows == 1
+    cur.execute("select id, num from execmany order by id")
+    assert cur.fetchall() == [(1, 10), (2, None)]
+
+
+def test_copy_upsert_repeat(conn, execmany):
+    cur = conn.cursor()
+    for i in range(3):
+        nrows = cur.copy_upsert("execmany", [(1, i)], ["id"], ["num"])
+        assert nrows == 1
+    cur.execute("select id, num from execmany")
+    assert cur.fetchall() == [(1, 2)]
+
+
+def test_copy_upsert_duplicate_keys(conn, execmany):
+    cur = conn.cursor()
+    with pytest.raises(psycopg.errors.CardinalityViolation):
+        cur.copy_upsert("execmany", [(1, 1), (2, 2), (1, 3)], ["id"], ["num"])
+    cur.execute("select count(*) from execmany")
+    assert cur.fetchone()[0] == 0
+
+    # Without update columns, only the first record with the same key counts
+    nrows = cur.copy_upsert("execmany", [(1,), (1,)], ["id"])
+    assert nrows == 1
+    cur.execute("select id, num from execmany")
+    assert cur.fetchall() == [(1, None)]
+
+
+def test_copy_upsert_in_transaction(conn, execmany):
+    cur = conn.cursor()
+    cur.execute("create temp table psycopg_upsert (id int)")
+    with conn.transaction():
+        for i in range(3):
+            cur.copy_upsert("execmany", [(i, i)], ["id"], ["num"])
+    cur.execute("select id, num from execmany order by id")
+    assert cur.fetchall() == [(0, 0), (1, 1), (2, 2)]
+
+
+def test_copy_upsert_error(conn, execmany):
+    cur = conn.cursor()
+    with pytest.raises(psycopg.errors.CardinalityViolation):
+        cur.copy_upsert("execmany", [(1, 1), (1, 2)], ["id"], ["num"])
+    assert conn.info.transaction_status == pq.TransactionStatus.IDLE
+
+    with pytest.raises(psycopg.ProgrammingError):
+        cur.copy_upsert("execmany", [(1, 1)], [], ["num"])
+
+
 def test_rowcount(conn):
     cur = conn.cursor()
 
@@ -237,6 +237,78 @@ async def test_executemany_null_first(aconn, fmt_in):
         )
 
 
+async def test_copy_upsert(aconn, execmany):
+    cur = aconn.cursor()
+    await cur.execute(
+        "insert into execmany (id, num, data) values (1, 10, 'a'), (2, 20, 'b')"
+    )
+    nrows = await cur.copy_upsert(
+        "execmany",
+        [(2, 21, "bb"), (3, 30, "c")],
+        ["id"],
+        ["num", "data"],
+    )
+    assert nrows == 2
+    await cur.execute("select id, num, data from execmany order by id")
+    assert await cur.fetchall() == [(1, 10, "a"), (2, 21, "bb"), (3, 30, "c")]
+
+
+async def test_copy_upsert_do_nothing(aconn, execmany):
+    cur = aconn.cursor()
+    await cur.execute("insert into execmany (id, num) values (1, 10)")
+    nrows = await cur.copy_upsert(
+        sql.Identifier("execmany"), iter([(1,), (2,)]), ["id"]
+    )
+    assert nrows == 1
+    await cur.execute("select id, num from execmany order by id")
+    assert await cur.fetchall() == [(1, 10), (2, None)]
+
+
+async def test_copy_upsert_repeat(aconn, execmany):
+    cur = aconn.cursor()
+    for i in range(3):
+        nrows = await cur.copy_upsert("execmany", [(1, i)], ["id"], ["num"])
+        assert nrows == 1
+    await cur.execute("select id, num from execmany")
+    assert await cur.fetchall() == [(1, 2)]
+
+
+async def test_copy_upsert_duplicate_keys(aconn, execmany):
+    cur = aconn.cursor()
+    with pytest.raises(psycopg.errors.CardinalityViolation):
+        await cur.copy_upsert(
+            "execmany", [(1, 1), (2, 2), (1, 3)], ["id"], ["num"]
+        )
+    await cur.execute("select count(*) from execmany")
+    assert (await cur.fetchone())[0] == 0
+
+    # Without update columns, only the first record with the same key counts
+    nrows = await cur.copy_upsert("execmany", [(1,), (1,)], ["id"])
+    assert nrows == 1
+    await cur.execute("select id, num from execmany")
+    assert (await cur.fetchall()) == [(1, None)]
+
+
+async def test_copy_upsert_in_transaction(aconn, execmany):
+    cur = aconn.cursor()
+    await cur.execute("create temp table psycopg_upsert (id int)")
+    async with aconn.transaction():
+        for i in range(3):
+            await cur.copy_upsert("execmany", [(i, i)], ["id"], ["num"])
+    await cur.execute("select id, num from execmany order by id")
+    assert (await cur.fetchall()) == [(0, 0), (1, 1), (2, 2)]
+
+
+async def test_copy_upsert_error(aconn, execmany):
+    cur = aconn.cursor()
+    with pytest.raises(psycopg.errors.CardinalityViolation):
+        await cur.copy_upsert("execmany", [(1, 1), (1, 2)], ["id"], ["num"])
+    assert aconn.info.transaction_status == pq.TransactionStatus.IDLE
+
+    with pytest.raises(psycopg.ProgrammingError):
+        await cur.copy_upsert("execmany", [(1, 1)], [], ["num"])
+
+
 async def test_rowcount(aconn):
     cur = aconn.cursor()
 
@@ -1,6 +1,7 @@
 import pytest
 
-from psycopg import Connection, ProgrammingError, Rollback
+from psycopg import Connection, IsolationLevel, ProgrammingError
+from psycopg import Rollback, Transaction
 
 
 @pytest.fixture(autouse=True)
@@ -607,3 +608,45 @@ def test_str(conn):
 
     assert "[IDLE]" in str(tx)
     assert "(terminated)" in str(tx)
+
+
+def test_export_snapshot(conn, dsn, svcconn):
+    insert_row(svcconn, "before")
+    conn.isolation_level = IsolationLevel.REPEATABLE_READ
+    with conn.transaction() as tx:
+        snapshot = tx.export_snapshot()
+        assert isinstance(snapshot, str)
+        insert_row(svcconn, "after")
+
+        with Connection.connect(dsn) as conn2:
+            with conn2.transaction(snapshot=snapshot):
+                assert inserted(conn2) == {"before"}
+                cur = conn2.execute("show transaction_isolation")
+                assert cur.fetchone()[0] == "repeatable read"
+
+            assert inserted(conn2) == {"before", "after"}
+
+
+def test_import_snapshot_isolation(conn, dsn):
+    conn.isolation_level = IsolationLevel.SERIALIZABLE
+    with Connection.connect(dsn) as conn2:
+        conn2.isolation_level = IsolationLevel.SERIALIZABLE
+        with conn2.transaction() as tx:
+            snapshot = tx.export_snapshot()
+            with conn.transaction(snapshot=snapshot):
+                cur = conn.execute("show transaction_isolation")
+                assert cur.fetchone()[0] == "serializable"
+
+
+def test_snapshot_errors(conn):
+    with pytest.raises(ProgrammingError):
+        Transaction(conn).export_snapshot()
+
+    with conn.transaction() as tx:
+        snapshot = tx.export_snapshot()
+        with pytest.raises(ProgrammingError):
+            with conn.transaction(snapshot=snapshot):
+                pass
+
+    with pytest.raises(ProgrammingError):
+        tx.export_snapshot()
@@ -1,6 +1,7 @@
 import pytest
 
-from psycopg import ProgrammingError, Rollback
+from psycopg import AsyncConnection, AsyncTransaction, ProgrammingError
+from psycopg import IsolationLevel, Rollback
 
 from .test_transaction import in_transaction, insert_row, inserted
 from .test_transaction import ExpectedException
@@ -574,3 +575,34 @@ async def test_str(aconn):
 
     assert "[IDLE]" in str(tx)
     assert "(terminated)" in str(tx)
+
+
+async def test_export_snapshot(aconn, dsn, svcconn):
+    insert_row(svcconn, "before")
+    await aconn.set_isolation_level(IsolationLevel.REPEATABLE_READ)
+    async with aconn.transaction() as tx:
+        snapshot = await tx.export_snapshot()
+        assert isinstance(snapshot, str)
+        insert_row(svcconn, "after")
+
+        async with await AsyncConnection.connect(dsn) as aconn2:
+            async with aconn2.transaction(snapshot=snapshot):
+                assert await inserted(aconn2) == {"before"}
+                cur = await aconn2.execute("show transaction_isolation")
+                assert (await cur.fetchone())[0] == "repeatable read"
+
+            assert await inserted(aconn2) == {"before", "after"}
+
+
+async def test_snapshot_errors(aconn):
+    with pytest.raises(ProgrammingError):
+        await AsyncTransaction(aconn).export_snapshot()
+
+    async with aconn.transaction() as tx:
+        snapshot = await tx.export_snapshot()
+        with pytest.raises(ProgrammingError):
+            async with aconn.transaction(snapshot=snapshot):
+                pass
+
+    with pytest.raises(ProgrammingError):
+        await tx.export_snapshot()
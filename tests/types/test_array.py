@@ -96,6 +96,14 @@ def test_bad_binary_array(input):
         tx.get_dumper(input, Format.BINARY).dump(input)
 
 
+@pytest.mark.parametrize("data", [b"}", b"1,2}", b"{1}}", b"{{1},2}}"])
+def test_load_bad_text_array(data):
+    tx = Transformer()
+    loader = tx.get_loader(builtins["int4"].array_oid, pq.Format.TEXT)
+    with pytest.raises(psycopg.DataError):
+        loader.load(data)
+
+
 @pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
 @pytest.mark.parametrize("want, obj", tests_int)
 def test_load_list_int(conn, obj, want, fmt_out):
@@ -262,6 +262,96 @@ def test_load_composite_factory(conn, testcomp, fmt_out):
     assert isinstance(res[0].baz, float)
 
 
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_composite_nested(conn, testcomp, fmt_out):
+    conn.execute(
+        """
+        drop type if exists testnest;
+        create type testnest as (name text, comp testcomp, comps testcomp[]);
+        """
+    )
+    info = CompositeInfo.fetch(conn, "testcomp")
+    register_composite(info, conn)
+    ninfo = CompositeInfo.fetch(conn, "testnest")
+    register_composite(ninfo, conn)
+
+    cur = conn.cursor(binary=fmt_out)
+    cur.execute(
+        """
+        select row(
+            'a "quoted", (parens) \\ name',
+            row('hello', 10, 20)::testcomp,
+            array[row('a,b', null, 1.5), null]::testcomp[]
+        )::testnest
+        from generate_series(1, 3)
+        """
+    )
+    for res in cur:
+        res = res[0]
+        assert isinstance(res, ninfo.python_type)
+        assert res.name == 'a "quoted", (parens) \\ name'
+        assert res.comp == info.python_type("hello", 10, 20.0)
+        assert res.comps == [info.python_type("a,b", None, 1.5), None]
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"(", b"foo", b'("foo)', b"(\\", b"(a,b,c,d)", b"(a,b,c,)"],
+)
+def test_load_composite_bad(conn, testcomp, data):
+    info = CompositeInfo.fetch(conn, "testcomp")
+    register_composite(info, conn)
+    loader = conn.adapters.get_loader(info.oid, pq.Format.TEXT)(info.oid, conn)
+    with pytest.raises(Exception):
+        loader.load(data)
+
+
+def test_load_record_binary_types_change(conn):
+    cur = conn.cursor(binary=True)
+    cur.execute(
+        """
+        select row(10, 'foo'::text) union all
+        select row('bar'::text, 20) union all
+        select row(null::int, 30) union all
+        select row(30, 40, 50)
+        """
+    )
+    assert cur.fetchall() == [
+        ((10, "foo"),),
+        (("bar", 20),),
+        ((None, 30),),
+        ((30, 40, 50),),
+    ]
+
+
+def test_load_record_binary_null_first(conn):
+    cur = conn.cursor(binary=True)
+    cur.execute(
+        """
+        select row(case when i = 0 then null else i end, i)
+        from generate_series(0, 2) i
+        """
+    )
+    assert cur.fetchall() == [((None, 0),), ((1, 1),), ((2, 2),)]
+
+
+def test_load_composite_binary_null_first(conn, testcomp):
+    info = CompositeInfo.fetch(conn, "testcomp")
+    register_composite(info, conn)
+    cur = conn.cursor(binary=True)
+    cur.execute(
+        """
+        select row(null, i, i)::testcomp from generate_series(0, 1) i
+        union all select row('x', 2, 2)::testcomp
+        """
+    )
+    assert [rec[0] for rec in cur] == [
+        info.python_type(None, 0, 0.0),
+        info.python_type(None, 1, 1.0),
+        info.python_type("x", 2, 2.0),
+    ]
+
+
 def test_register_scope(conn, testcomp):
     info = CompositeInfo.fetch(conn, "testcomp")
     register_composite(info)
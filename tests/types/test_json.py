@@ -138,6 +138,30 @@ def test_json_load_customise_context(conn, binary, pgtype):
     assert got["answer"] == 42
 
 
+@pytest.mark.parametrize("fmt_out", pq.Format)
+@pytest.mark.parametrize("pgtype", ["json", "jsonb"])
+def test_json_load_zero_copy(conn, fmt_out, pgtype):
+    got = []
+
+    def loads(data):
+        got.append(type(data))
+        return json.loads(bytes(data))
+
+    set_json_loads(loads, conn)
+    oid = conn.adapters.types[pgtype].oid
+    loader = conn.adapters.get_loader(oid, fmt_out)(oid, conn)
+    data = b'{"foo": "bar"}'
+    if pgtype == "jsonb" and fmt_out == pq.Format.BINARY:
+        data = b"\x01" + data
+    del got[:]
+    assert loader.load(memoryview(data)) == {"foo": "bar"}
+    assert got == [memoryview]
+
+    cur = conn.cursor(binary=fmt_out)
+    cur.execute(f"""select '{{"foo": "bar"}}'::{pgtype}""")
+    assert cur.fetchone()[0] == {"foo": "bar"}
+
+
 def my_dumps(obj):
     obj = deepcopy(obj)
     obj["baz"] = "qux"
@@ -0,0 +1,295 @@
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+
+from psycopg import pq
+from psycopg import errors as e
+from psycopg.sql import Identifier
+from psycopg.adapt import PyFormat as Format
+from psycopg.types.range import Range
+from psycopg.types.multirange import Multirange, MultirangeInfo
+from psycopg.types.multirange import register_multirange
+from psycopg.types.multirange import Int4Multirange, DateMultirange
+
+tzinfo = dt.timezone(dt.timedelta(hours=2))
+
+samples = [
+    ("int4multirange", [Range(None, None, "()")]),
+    ("int4multirange", [Range(10, 20), Range(30, 40)]),
+    ("int8multirange", [Range(-(2 ** 63), (2 ** 63) - 1)]),
+    ("nummultirange", [Range(Decimal(-100), Decimal("100.123"), "(]")]),
+    (
+        "nummultirange",
+        [Range(None, Decimal(-100), "()"), Range(Decimal(100), None, "()")],
+    ),
+    (
+        "datemultirange",
+        [Range(dt.date(2000, 1, 1), dt.date(2020, 1, 1), "[)")],
+    ),
+    (
+        "tsmultirange",
+        [
+            Range(
+                dt.datetime(2000, 1, 1, 00, 00),
+                dt.datetime(2020, 1, 1, 23, 59, 59, 999999),
+                "[]",
+            )
+        ],
+    ),
+    (
+        "tstzmultirange",
+        [
+            Range(
+                dt.datetime(2000, 1, 1, 00, 00, tzinfo=tzinfo),
+                dt.datetime(2020, 1, 1, 23, 59, 59, 999999, tzinfo=tzinfo),
+                "()",
+            ),
+            Range(
+                dt.datetime(2021, 1, 1, 00, 00, tzinfo=tzinfo),
+                None,
+                "[)",
+            ),
+        ],
+    ),
+]
+
+mr_names = """int4multirange int8multirange nummultirange
+    datemultirange tsmultirange tstzmultirange""".split()
+
+
+@pytest.mark.pg(">= 14")
+@pytest.mark.parametrize("pgtype", mr_names)
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_builtin_empty(conn, pgtype, fmt_in):
+    mr = Multirange()
+    cur = conn.execute(f"select '{{}}'::{pgtype} = %{fmt_in}", (mr,))
+    assert cur.fetchone()[0] is True
+
+
+@pytest.mark.pg(">= 14")
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_builtin_wrapper(conn, fmt_in):
+    mr = Int4Multirange()
+    cur = conn.execute(f"select pg_typeof(%{fmt_in})", (mr,))
+    assert cur.fetchone()[0] == "int4multirange"
+
+    mr = DateMultirange([Range(dt.date(2000, 1, 1), dt.date(2000, 2, 1))])
+    cur = conn.execute(f"select pg_typeof(%{fmt_in}), %{fmt_in}", (mr, mr))
+    assert cur.fetchone() == ("datemultirange", mr)
+
+
+@pytest.mark.pg(">= 14")
+@pytest.mark.parametrize("pgtype, ranges", samples)
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_builtin(conn, pgtype, ranges, fmt_in):
+    mr = Multirange(ranges)
+    rname = pgtype.replace("multi", "")
+    phs = ", ".join([f"%s::{rname}"] * len(ranges))
+    cur = conn.execute(f"select {pgtype}({phs}) = %{fmt_in}", ranges + [mr])
+    assert cur.fetchone()[0] is True
+
+
+@pytest.mark.pg(">= 14")
+@pytest.mark.parametrize("pgtype", mr_names)
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_builtin_empty(conn, pgtype, fmt_out):
+    cur = conn.cursor(binary=fmt_out)
+    (got,) = cur.execute(f"select '{{}}'::{pgtype}").fetchone()
+    assert type(got) is Multirange
+    assert got == Multirange()
+    assert not got
+
+
+@pytest.mark.pg(">= 14")
+@pytest.mark.parametrize("pgtype", mr_names)
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_builtin_array(conn, pgtype, fmt_out):
+    mr1 = Multirange()
+    mr2 = Multirange([Range(bounds="()")])
+    cur = conn.cursor(binary=fmt_out)
+    (got,) = cur.execute(
+        f"select array['{{}}'::{pgtype}, '{{(,)}}'::{pgtype}]"
+    ).fetchone()
+    assert got == [mr1, mr2]
+
+
+@pytest.mark.pg(">= 14")
+@pytest.mark.parametrize("pgtype, ranges", samples)
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_builtin(conn, pgtype, ranges, fmt_out):
+    rname = pgtype.replace("multi", "")
+    phs = ", ".join([f"%s::{rname}"] * len(ranges))
+    cur = conn.cursor(binary=fmt_out)
+    cur.execute(f"select {pgtype}({phs})", ranges)
+    got = cur.fetchone()[0]
+    assert type(got) is Multirange
+    assert got == Multirange(ranges)
+
+
+@pytest.fixture(scope="session")
+def testmr(svcconn):
+    if svcconn.info.server_version < 140000:
+        pytest.skip("multiranges not supported")
+
+    svcconn.execute(
+        """
+        create schema if not exists testschema;
+
+        drop type if exists testrange cascade;
+        drop type if exists testschema.testrange cascade;
+
+        create type testrange as range (subtype = text, collation = "C");
+        create type testschema.testrange as range (subtype = float8);
+        """
+    )
+
+
+fetch_cases = [
+    ("testmultirange", "text"),
+    ("testschema.testmultirange", "float8"),
+    (Identifier("testmultirange"), "text"),
+    (Identifier("testschema", "testmultirange"), "float8"),
+]
+
+
+@pytest.mark.parametrize("name, subtype", fetch_cases)
+def test_fetch_info(conn, testmr, name, subtype):
+    info = MultirangeInfo.fetch(conn, name)
+    assert info.name == "testmultirange"
+    assert info.oid > 0
+    assert info.oid != info.array_oid > 0
+    assert info.subtype_oid == conn.adapters.types[subtype].oid
+    assert info.range_oid > 0
+
+
+def test_fetch_info_not_found(conn, testmr):
+    assert MultirangeInfo.fetch(conn, "nosuchrange") is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name, subtype", fetch_cases)
+async def test_fetch_info_async(aconn, testmr, name, subtype):
+    info = await MultirangeInfo.fetch(aconn, name)
+    assert info.name == "testmultirange"
+    assert info.oid > 0
+    assert info.oid != info.array_oid > 0
+    assert info.subtype_oid == aconn.adapters.types[subtype].oid
+
+
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_custom(conn, testmr, fmt_in):
+    info = MultirangeInfo.fetch(conn, "testmultirange")
+    register_multirange(info, conn)
+
+    mr = Multirange([Range("a", "b"), Range("c", None)])
+    cur = conn.execute(
+        f"select pg_typeof(%{fmt_in}), %{fmt_in}::text", (mr, mr)
+    )
+    assert cur.fetchone() == ("testmultirange", "{[a,b),[c,)}")
+
+
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_quoting(conn, testmr, fmt_out):
+    info = MultirangeInfo.fetch(conn, "testmultirange")
+    register_multirange(info, conn)
+    cur = conn.cursor(binary=fmt_out)
+    for i in range(1, 254, 2):
+        cur.execute(
+            """
+            select testmultirange(
+                testrange(chr(%(low)s::int), chr(%(up)s::int)),
+                testrange(chr(%(up)s::int + 1), null))
+            """,
+            {"low": i, "up": i + 1},
+        )
+        got = cur.fetchone()[0]
+        assert isinstance(got, Multirange)
+        assert got == Multirange(
+            [Range(chr(i), chr(i + 1)), Range(chr(i + 2), None)]
+        )
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        b"[1,2)",
+        b"{",
+        b"{[1,2)",
+        b"{[1,2),}",
+        b"{[1,2)[3,4)}",
+        b"{[1,2)}x",
+        b"{(1}",
+        b"{empty}x",
+    ],
+)
+def test_load_bad(conn, data):
+    oid = conn.adapters.types["int4multirange"].oid
+    loader = conn.adapters.get_loader(oid, pq.Format.TEXT)(oid, conn)
+    with pytest.raises(e.DataError):
+        loader.load(data)
+
+
+class TestMultirangeObject:
+    def test_empty(self):
+        mr = Multirange[int]()
+        assert not mr
+        assert len(mr) == 0
+
+    def test_sequence(self):
+        mr = Multirange([Range(10, 20), Range(30, 40), Range(50, 60)])
+        assert mr
+        assert len(mr) == 3
+        assert mr[2] == Range(50, 60)
+        assert mr[-2] == Range(30, 40)
+        assert mr[1:] == Multirange([Range(30, 40), Range(50, 60)])
+
+    def test_bad_type(self):
+        with pytest.raises(TypeError):
+            Multirange([Range(10, 20), [30, 40]])
+
+        mr = Multirange([Range(10, 20)])
+        with pytest.raises(TypeError):
+            mr.append([30, 40])
+        with pytest.raises(TypeError):
+            mr[0] = [30, 40]
+        with pytest.raises(TypeError):
+            mr[0:] = [Range(30, 40), [50, 60]]
+        assert mr == Multirange([Range(10, 20)])
+
+    def test_setitem(self):
+        mr = Multirange([Range(10, 20), Range(30, 40), Range(50, 60)])
+        mr[1] = Range(31, 41)
+        assert mr == Multirange([Range(10, 20), Range(31, 41), Range(50, 60)])
+        mr[1:] = [Range(0, 1)]
+        assert mr == Multirange([Range(10, 20), Range(0, 1)])
+
+    def test_delitem(self):
+        mr = Multirange([Range(10, 20), Range(30, 40), Range(50, 60)])
+        del mr[1]
+        assert mr == Multirange([Range(10, 20), Range(50, 60)])
+        del mr[-2]
+        assert mr == Multirange([Range(50, 60)])
+
+    def test_insert(self):
+        mr = Multirange([Range(10, 20), Range(50, 60)])
+        mr.insert(1, Range(31, 41))
+        assert mr == Multirange([Range(10, 20), Range(31, 41), Range(50, 60)])
+
+    def test_eq(self):
+        assert Multirange([Range(10, 20)]) == Multirange([Range(10, 20)])
+        assert Multirange([Range(10, 20)]) != Multirange([Range(10, 21)])
+        assert Multirange([Range(10, 20)]) != [Range(10, 20)]
+
+    def test_unhashable(self):
+        with pytest.raises(TypeError):
+            hash(Multirange())
+
+    def test_repr_str(self):
+        mr = Multirange([Range(10, 20), Range(30, None, "()")])
+        assert (
+            repr(mr)
+            == "Multirange([Range(10, 20, '[)'), Range(30, None, '()')])"
+        )
+        assert str(mr) == "{[10, 20), (30, None)}"
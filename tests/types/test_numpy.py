@@ -0,0 +1,173 @@
+import pytest
+
+import psycopg
+from psycopg import pq
+from psycopg.adapt import PyFormat as Format
+
+np = pytest.importorskip("numpy")
+
+from psycopg.types.numpy import register_numpy  # noqa: E402
+from psycopg.types.numpy import register_numpy_loaders  # noqa: E402
+
+
+@pytest.fixture
+def nconn(conn):
+    register_numpy(conn)
+    return conn
+
+
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+@pytest.mark.parametrize(
+    "dtype, pgtype",
+    [
+        ("bool", "boolean[]"),
+        ("int8", "smallint[]"),
+        ("int16", "smallint[]"),
+        ("int32", "integer[]"),
+        ("int64", "bigint[]"),
+        ("uint8", "smallint[]"),
+        ("uint16", "integer[]"),
+        ("uint32", "bigint[]"),
+        ("float16", "real[]"),
+        ("float32", "real[]"),
+        ("float64", "double precision[]"),
+        (">f8", "double precision[]"),
+        (">i4", "integer[]"),
+    ],
+)
+def test_dump_array(nconn, dtype, pgtype, fmt_in):
+    obj = np.array([[0, 1, 2], [3, 4, 5]], dtype=dtype)
+    cur = nconn.execute(
+        f"select pg_typeof(%{fmt_in}), %{fmt_in} = %s::{pgtype}",
+        [obj, obj, obj.tolist()],
+    )
+    assert cur.fetchone() == (pgtype, True)
+
+
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_float_values(nconn, fmt_in):
+    obj = np.array([0.1, -1e300, float("inf"), float("-inf")])
+    cur = nconn.execute(
+        f"select %{fmt_in} = %s::float8[]", [obj, obj.tolist()]
+    )
+    assert cur.fetchone()[0] is True
+
+    cur = nconn.execute(f"select 'NaN' = any(%{fmt_in})", [np.array([np.nan])])
+    assert cur.fetchone()[0] is True
+
+
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_non_contiguous(nconn, fmt_in):
+    obj = np.arange(12, dtype="int32").reshape(3, 4)[:, ::2]
+    assert not obj.flags.c_contiguous
+    cur = nconn.execute(f"select %{fmt_in}", [obj])
+    assert cur.fetchone()[0] == obj.tolist()
+
+
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_empty(nconn, fmt_in):
+    obj = np.array([], dtype="float64")
+    cur = nconn.execute(f"select %{fmt_in}::float8[]", [obj])
+    assert cur.fetchone()[0] == []
+
+
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+def test_dump_bad(nconn, fmt_in):
+    with pytest.raises(psycopg.ProgrammingError):
+        nconn.execute(f"select %{fmt_in}", [np.array(["a"])])
+    nconn.rollback()
+    with pytest.raises(psycopg.DataError):
+        nconn.execute(f"select %{fmt_in}", [np.array(1.0)])
+
+
+@pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
+@pytest.mark.parametrize(
+    "val, pgtype, want",
+    [
+        ("bool_(True)", "boolean", True),
+        ("int8(-1)", "smallint", -1),
+        ("int16(-1)", "smallint", -1),
+        ("int32(-1)", "integer", -1),
+        ("int64(-1)", "bigint", -1),
+        ("uint8(255)", "smallint", 255),
+        ("uint16(65535)", "integer", 65535),
+        ("uint32(4294967295)", "bigint", 4294967295),
+        ("uint64(18446744073709551615)", "numeric", 18446744073709551615),
+        ("float16(0.5)", "real", 0.5),
+        ("float32(0.5)", "real", 0.5),
+        ("float64(0.5)", "double precision", 0.5),
+    ],
+)
+def test_dump_scalar(nconn, val, pgtype, want, fmt_in):
+    obj = eval(f"np.{val}")
+    cur = nconn.execute(f"select pg_typeof(%{fmt_in}), %{fmt_in}", [obj, obj])
+    assert cur.fetchone() == (pgtype, want)
+
+
+@pytest.mark.parametrize(
+    "pgtype, dtype",
+    [
+        ("bool", "bool"),
+        ("int2", "int16"),
+        ("int4", "int32"),
+        ("int8", "int64"),
+        ("float4", "float32"),
+        ("float8", "float64"),
+    ],
+)
+def test_load_array(conn, pgtype, dtype):
+    register_numpy_loaders(conn)
+    cur = conn.cursor(binary=True)
+    cur.execute(f"select '{{{{1,0,1}},{{0,1,1}}}}'::{pgtype}[]")
+    got = cur.fetchone()[0]
+    assert isinstance(got, np.ndarray)
+    assert got.dtype == np.dtype(dtype)
+    assert got.flags.c_contiguous
+    assert got.tolist() == [[1, 0, 1], [0, 1, 1]]
+
+
+def test_load_array_text(conn):
+    register_numpy_loaders(conn)
+    cur = conn.execute("select '{1,2}'::int4[]")
+    assert cur.fetchone()[0] == [1, 2]
+
+
+def test_load_array_nulls(conn):
+    register_numpy_loaders(conn)
+    cur = conn.cursor(binary=True)
+    cur.execute("select '{{1,NULL},{NULL,4}}'::float8[]")
+    got = cur.fetchone()[0]
+    assert isinstance(got, np.ma.MaskedArray)
+    assert got.shape == (2, 2)
+    assert got.mask.tolist() == [[False, True], [True, False]]
+    assert got.compressed().tolist() == [1.0, 4.0]
+
+
+def test_load_array_empty(conn):
+    register_numpy_loaders(conn)
+    cur = conn.cursor(binary=True)
+    cur.execute("select '{}'::int8[]")
+    got = cur.fetchone()[0]
+    assert got.dtype == np.dtype("int64")
+    assert got.size == 0
+
+
+def test_roundtrip(nconn):
+    register_numpy_loaders(nconn)
+    obj = np.random.default_rng(42).random((4, 512))
+    cur = nconn.cursor(binary=True)
+    cur.execute("select %b", [obj])
+    got = cur.fetchone()[0]
+    assert (got == obj).all()
+
+
+def test_register_curs(conn):
+    cur = conn.cursor(binary=pq.Format.BINARY)
+    register_numpy(cur)
+    register_numpy_loaders(cur)
+    cur.execute("select %s::int4[]", [np.array([1, 2])])
+    assert isinstance(cur.fetchone()[0], np.ndarray)
+
+    cur = conn.cursor(binary=True)
+    cur.execute("select '{1,2}'::int4[]")
+    assert cur.fetchone()[0] == [1, 2]
@@ -40,6 +40,12 @@ samples = [
         dt.datetime(2020, 1, 1, 23, 59, 59, 999999),
         "[]",
     ),
+    (
+        "tsrange",
+        dt.datetime(2000, 1, 1, 00, 00, 00, 123456),
+        dt.datetime(2020, 1, 1, 23, 59, 59),
+        "[)",
+    ),
     (
         "tstzrange",
         dt.datetime(2000, 1, 1, 00, 00, tzinfo=tzinfo),
@@ -6,6 +6,8 @@ from psycopg import sql
 from psycopg import errors as e
 from psycopg.adapt import PyFormat as Format
 from psycopg import Binary
+from psycopg.types import TypeInfo
+from psycopg.types.string import InternedTextLoader, InternedTextBinaryLoader
 
 eur = "\u20ac"
 
@@ -226,6 +228,68 @@ def test_text_array_ascii(conn, fmt_in, fmt_out):
     assert res == exp
 
 
+def _register_interned(cur, typename):
+    if cur.format == pq.Format.BINARY:
+        cur.adapters.register_loader(typename, InternedTextBinaryLoader)
+    else:
+        cur.adapters.register_loader(typename, InternedTextLoader)
+
+
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+@pytest.mark.parametrize("typename", ["text", "varchar", "name", "bpchar"])
+def test_load_interned(conn, typename, fmt_out):
+    cur = conn.cursor(binary=fmt_out)
+    _register_interned(cur, typename)
+    cur.execute(
+        f"""select (array['foo', '{eur}'])[i % 2 + 1]::{typename}
+        from generate_series(1, 10) i"""
+    )
+    recs = [rec[0] for rec in cur]
+    assert recs == [eur, "foo"] * 5
+    assert all(rec is recs[i % 2] for i, rec in enumerate(recs))
+
+
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_interned_enum(conn, fmt_out):
+    cur = conn.cursor(binary=fmt_out)
+    cur.execute("create type myenum as enum ('foo', 'bar')")
+    info = TypeInfo.fetch(conn, "myenum")
+    _register_interned(cur, info.oid)
+    cur.execute(
+        """select (array['foo', 'bar'])[i % 2 + 1]::myenum
+        from generate_series(1, 10) i"""
+    )
+    recs = [rec[0] for rec in cur]
+    assert recs == ["bar", "foo"] * 5
+    assert all(rec is recs[i % 2] for i, rec in enumerate(recs))
+
+
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_interned_many(conn, fmt_out):
+    cur = conn.cursor(binary=fmt_out)
+    _register_interned(cur, "text")
+    cur.execute("select (i % 3000)::text from generate_series(1, 10000) i")
+    recs = [rec[0] for rec in cur]
+    assert recs == [str(i % 3000) for i in range(1, 10001)]
+
+    # The first max_size distinct values are shared, the following aren't
+    assert InternedTextLoader.max_size == 1024
+    assert recs[1000 - 1] is recs[4000 - 1]
+    assert recs[2000 - 1] == recs[5000 - 1]
+    assert recs[2000 - 1] is not recs[5000 - 1]
+
+
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_load_interned_ascii(conn, fmt_out):
+    conn.client_encoding = "ascii"
+    cur = conn.cursor(binary=fmt_out)
+    _register_interned(cur, "text")
+    cur.execute("select chr(8364) from generate_series(1, 2)")
+    recs = cur.fetchall()
+    assert recs == [(eur.encode(),)] * 2
+    assert recs[0][0] is recs[1][0]
+
+
 #
 # tests with bytea
 #
@@ -4,9 +4,12 @@ import subprocess as sp
 
 import pytest
 
+import psycopg
 from psycopg import pq
 from psycopg import sql
 from psycopg.adapt import PyFormat as Format
+from psycopg.types.uuid import UUIDIntLoader, UUIDIntBinaryLoader
+from psycopg.types.uuid import UUIDBytesLoader, UUIDBytesBinaryLoader
 
 
 @pytest.mark.parametrize("fmt_in", [Format.AUTO, Format.TEXT, Format.BINARY])
@@ -34,6 +37,52 @@ def test_uuid_load(conn, fmt_out):
     assert res == UUID(val)
 
 
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+def test_uuid_load_attrs(conn, fmt_out):
+    cur = conn.cursor(binary=fmt_out)
+    val = UUID("12345678-1234-5678-1234-56781234567a")
+    cur.execute("select %s::uuid", (str(val),))
+    got = cur.fetchone()[0]
+    assert got == val
+    assert got.int == val.int
+    assert got.is_safe == val.is_safe
+    assert str(got) == str(val)
+    assert hash(got) == hash(val)
+    with pytest.raises(TypeError):
+        got.int = 0
+
+
+@pytest.mark.parametrize("fmt_out", [pq.Format.TEXT, pq.Format.BINARY])
+@pytest.mark.parametrize(
+    "loaders, attr",
+    [
+        ((UUIDIntLoader, UUIDIntBinaryLoader), "int"),
+        ((UUIDBytesLoader, UUIDBytesBinaryLoader), "bytes"),
+    ],
+)
+def test_uuid_load_raw(conn, loaders, attr, fmt_out):
+    for loader in loaders:
+        conn.adapters.register_loader("uuid", loader)
+
+    cur = conn.cursor(binary=fmt_out)
+    for val in [
+        UUID(int=0),
+        UUID("12345678-1234-5678-1234-56781234567a"),
+        UUID(int=2 ** 128 - 1),
+    ]:
+        cur.execute("select %s::uuid", (val,))
+        assert cur.fetchone()[0] == getattr(val, attr)
+
+
+def test_uuid_load_bad(conn):
+    loader = conn.adapters.get_loader(
+        conn.adapters.types["uuid"].oid, pq.Format.TEXT
+    )(0, conn)
+    for data in [b"", b"123456781234567812345678123456", b"x" * 32]:
+        with pytest.raises((psycopg.DataError, ValueError)):
+            loader.load(data)
+
+
 @pytest.mark.subprocess
 def test_lazy_load(dsn):
     script = f"""\